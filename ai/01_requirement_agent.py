@@ -1,12 +1,19 @@
 import os
 import sys
+import subprocess
 import json
 import requests
+import asyncio
+import email.utils
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from llama_index.llms.openai import OpenAI
-from llama_index.core import Document, VectorStoreIndex
+from llm_provider import get_llm, configure
+from llama_index.core import Document, VectorStoreIndex, PromptTemplate
+from llama_index.core.utils import get_tokenizer
+from pydantic import BaseModel, Field, AliasChoices, ValidationError
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
+import telemetry
 
 # -------------------------------
 # Load environment
@@ -17,7 +24,9 @@ JIRA_USER = os.getenv("JIRA_USER")
 JIRA_TOKEN = os.getenv("JIRA_API_TOKEN")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-llm = OpenAI(model="gpt-4o-mini", api_key=OPENAI_API_KEY)
+llm = get_llm(model="gpt-4o-mini", api_key=OPENAI_API_KEY)
+configure(llm)
+telemetry.install("requirement_agent", llm)
 
 # -------------------------------
 # Jira Fetch
@@ -28,9 +37,116 @@ def fetch_jira_issue(issue_id: str):
     response.raise_for_status()
     return response.json()
 
+# -------------------------------
+# Batch Jira Fetch (async, pooled)
+# -------------------------------
+JIRA_CONCURRENCY = int(os.getenv("JIRA_CONCURRENCY", "10"))
+JIRA_RETRIES = 4
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before a retry: Retry-After (delta-seconds or HTTP date), else exponential backoff."""
+    backoff = 0.5 * 2 ** attempt
+    value = response.headers.get("Retry-After", "").strip()
+    if not value:
+        return backoff
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return backoff
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+async def _get_with_retry(client, url, params=None, retries=JIRA_RETRIES):
+    """GET with exponential backoff on connection errors, 429 and 5xx (honours Retry-After)."""
+    import httpx  # batch mode only
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params=params)
+            if response.status_code not in RETRY_STATUS or attempt == retries:
+                response.raise_for_status()
+                return response.json()
+            delay = _retry_delay(response, attempt)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            delay = 0.5 * 2 ** attempt
+        await asyncio.sleep(delay)
+
+async def search_jira_issue_ids(client, jql, page_size=100):
+    """Resolve a JQL query to issue keys via the search API."""
+    keys, start = [], 0
+    while True:
+        data = await _get_with_retry(client, f"{JIRA_URL}/rest/api/2/search",
+                                     params={"jql": jql, "fields": "key", "startAt": start, "maxResults": page_size})
+        issues = data.get("issues", [])
+        keys.extend(issue["key"] for issue in issues)
+        start += len(issues)
+        if not issues or start >= data.get("total", 0):
+            return keys
+
+async def fetch_jira_issues_async(issue_ids, concurrency=JIRA_CONCURRENCY):
+    """Fetch many issues concurrently over one pooled async client. Returns {issue_id: data or exception}."""
+    import httpx  # batch mode only
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(auth=(JIRA_USER, JIRA_TOKEN), limits=limits, timeout=30) as client:
+        async def fetch(issue_id):
+            async with semaphore:
+                try:
+                    return issue_id, await _get_with_retry(client, f"{JIRA_URL}/rest/api/2/issue/{issue_id}")
+                except Exception as e:
+                    return issue_id, e
+        return dict(await asyncio.gather(*(fetch(i) for i in issue_ids)))
+
+def read_issue_ids(batch_file):
+    """
+    Read issue ids from a file: ids separated by newlines/commas, or a single
+    line "jql: <query>" to resolve them through Jira search.
+    """
+    with open(batch_file, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.lower().startswith("jql:"):
+        return {"jql": content[4:].strip()}
+    ids = [part.strip() for line in content.splitlines() if not line.strip().startswith("#")
+           for part in line.split(",")]
+    return {"ids": [i for i in ids if i]}
+
 # -------------------------------
 # Process with LlamaIndex
 # -------------------------------
+# Issues up to this many tokens go straight to one structured LLM call;
+# larger ones use chunked retrieval over a vector index.
+DIRECT_TOKEN_LIMIT = int(os.getenv("BRD_DIRECT_TOKEN_LIMIT", "6000"))
+
+def _section_field(name, title):
+    return Field(default="", description=title, validation_alias=AliasChoices(name, title))
+
+class BRDSections(BaseModel):
+    """The six BRD sections extracted from a Jira issue."""
+    business_benefit: str = _section_field("business_benefit", "Business Benefit")
+    objective: str = _section_field("objective", "Objective")
+    description: str = _section_field("description", "Description")
+    scope: str = _section_field("scope", "Scope")
+    assumptions: str = _section_field("assumptions", "Assumptions")
+    constraints: str = _section_field("constraints", "Constraints")
+
+    def to_sections(self):
+        """Section title -> text, in the order used by the BRD."""
+        return {field.description: getattr(self, name) for name, field in BRDSections.model_fields.items()}
+
+def parse_sections(text):
+    """Schema-validated parse of a JSON section map embedded in an LLM response."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object in response")
+    return BRDSections.model_validate_json(text[start:end + 1]).to_sections()
+
 def extract_sections_with_llama(jira_data: dict):
     summary = jira_data["fields"].get("summary", "")
     description = jira_data["fields"].get("description", "")
@@ -44,6 +160,18 @@ def extract_sections_with_llama(jira_data: dict):
     Jira Description: {description}
     """
 
+    if len(get_tokenizer()(text)) <= DIRECT_TOKEN_LIMIT:
+        # Fits in context: one structured-output call, no embedding round trip
+        prompt = PromptTemplate(
+            "Extract the Business Benefit, Objective, Description, Scope, Assumptions and "
+            "Constraints sections from the Jira issue text below. Use an empty string for "
+            "sections that are not present.\n\n{issue_text}"
+        )
+        try:
+            return llm.structured_predict(BRDSections, prompt, issue_text=text).to_sections()
+        except (ValidationError, ValueError) as e:
+            print(f" Structured extraction failed ({e}), falling back to retrieval.")
+
     doc = Document(text=text)
     index = VectorStoreIndex.from_documents([doc])
     query_engine = index.as_query_engine(llm=llm)
@@ -71,8 +199,8 @@ def extract_sections_with_llama(jira_data: dict):
 
     response = query_engine.query(prompt)
     try:
-        return json.loads(str(response))
-    except Exception:
+        return parse_sections(str(response))
+    except (ValidationError, ValueError):
         return {"Description": str(response)}
 
 # -------------------------------
@@ -96,10 +224,88 @@ def create_brd_pdf(issue_id: str, sections: dict, output_file: str):
     doc.build(story)
     print(f" BRD created: {output_file}")
 
+# -------------------------------
+# Machine-readable BRD artifacts
+# -------------------------------
+# "background": render the PDF in a detached process, "sync": render inline, "off": skip it
+PDF_MODE = os.getenv("BRD_PDF_MODE", "background")
+
+def write_brd_artifacts(issue_id: str, sections: dict, base_path: str = "BRD"):
+    """
+    Write the section map as BRD.json (consumed directly by the builder agent)
+    and BRD.md. Returns the JSON path.
+    """
+    json_file = f"{base_path}.json"
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump({"issue_id": issue_id, "sections": sections}, f, indent=2, ensure_ascii=False)
+
+    lines = ["# Business Requirement Document", "", f"**Jira ID:** {issue_id}", ""]
+    for key, value in sections.items():
+        lines += [f"## {key}", "", value if value else "N/A", ""]
+    with open(f"{base_path}.md", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    print(f" BRD artifacts created: {json_file}, {base_path}.md")
+    return json_file
+
+def render_brd_pdf(json_file: str, output_file: str, mode: str = PDF_MODE):
+    """Render the human-facing PDF from BRD.json, off the critical path unless mode is 'sync'."""
+    if mode == "off":
+        return
+    if mode == "background":
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--render-pdf", json_file, output_file],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f" BRD PDF rendering in background: {output_file}")
+        return
+    with open(json_file, "r", encoding="utf-8") as f:
+        brd = json.load(f)
+    create_brd_pdf(brd["issue_id"], brd["sections"], output_file)
+
+# -------------------------------
+# Batch BRD generation
+# -------------------------------
+async def generate_brds_batch(batch, output_dir="brds", concurrency=JIRA_CONCURRENCY):
+    """Fetch all issues concurrently, then extract sections and build BRDs in parallel threads."""
+    import httpx  # batch mode only; single-issue mode uses requests
+    if "jql" in batch:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(auth=(JIRA_USER, JIRA_TOKEN), limits=limits, timeout=30) as client:
+            issue_ids = await search_jira_issue_ids(client, batch["jql"])
+    else:
+        issue_ids = batch["ids"]
+    print(f" Fetching {len(issue_ids)} Jira issues...")
+    issues = await fetch_jira_issues_async(issue_ids, concurrency)
+
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def build(issue_id, jira_data):
+        if isinstance(jira_data, Exception):
+            print(f" Failed to fetch {issue_id}: {jira_data}")
+            return issue_id, None
+        async with semaphore:
+            sections = await asyncio.to_thread(extract_sections_with_llama, jira_data)
+            base_path = os.path.join(output_dir, f"BRD_{issue_id}")
+            json_file = write_brd_artifacts(issue_id, sections, base_path)
+            if PDF_MODE != "off":
+                await asyncio.to_thread(create_brd_pdf, issue_id, sections, f"{base_path}.pdf")
+            return issue_id, json_file
+
+    return dict(await asyncio.gather(*(build(i, d) for i, d in issues.items())))
+
 # -------------------------------
 # Main
 # -------------------------------
 if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--render-pdf":
+        render_brd_pdf(sys.argv[2], sys.argv[3], mode="sync")
+        sys.exit(0)
+
+    if len(sys.argv) > 2 and sys.argv[1] == "--batch":
+        # Batch mode: python 01_requirement_agent.py --batch issues.txt
+        results = asyncio.run(generate_brds_batch(read_issue_ids(sys.argv[2])))
+        print(f" Generated {sum(1 for f in results.values() if f)} of {len(results)} BRDs.")
+        sys.exit(0 if all(results.values()) else 1)
+
     if len(sys.argv) > 1:
         jira_id = sys.argv[1].strip()
         #jira_id = "Neev-307"
@@ -109,4 +315,5 @@ if __name__ == "__main__":
 
     jira_data = fetch_jira_issue(jira_id)
     sections = extract_sections_with_llama(jira_data)
-    create_brd_pdf(jira_id, sections, f"BRD.pdf")
+    brd_json = write_brd_artifacts(jira_id, sections, "BRD")
+    render_brd_pdf(brd_json, "BRD.pdf")
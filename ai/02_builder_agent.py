@@ -1,8 +1,8 @@
 import os
 import json
-import re
 import requests
 from dotenv import load_dotenv
+import telemetry
 
 # -------------------------------
 # Load environment variables
@@ -13,35 +13,53 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # -------------------------------
 # LLM Setup
 # -------------------------------
-from llama_index.llms.openai import OpenAI
+from llm_provider import get_llm, configure
 
-llm = OpenAI(
+llm = get_llm(
     api_key=OPENAI_API_KEY,  # <-- API key here
     model="gpt-4o-mini",     # <-- valid model name here
     temperature=0
 )
+configure(llm)
+telemetry.install("builder_agent", llm)
 
 # -------------------------------
-# PDF Loading
+# BRD Loading
 # -------------------------------
-from llama_index.readers.file import PDFReader
+from llama_index.core import Document
 
-pdf_loader = PDFReader()
+brd_json_file = "BRD.json"  # Structured BRD written by 01_requirement_agent.py
 pdf_file = "BRD.pdf"  # Hardcoded filename
-pdf_paths = [os.path.join(os.getcwd(), pdf_file)]
 
 all_docs = []
-for path in pdf_paths:
-    all_docs.extend(pdf_loader.load_data(file=path))
+if os.path.exists(brd_json_file):
+    # Preferred: section map straight from the requirement agent, no PDF parsing
+    with open(brd_json_file, "r", encoding="utf-8") as f:
+        brd = json.load(f)
+    for section, text in brd["sections"].items():
+        all_docs.append(Document(
+            text=f"{section}\n{text or 'N/A'}",
+            metadata={"jira_id": brd["issue_id"], "section": section},
+        ))
+    print(f"Loaded {len(all_docs)} BRD sections from {brd_json_file}.")
+else:
+    from llama_index.readers.file import PDFReader
+
+    pdf_loader = PDFReader()
+    pdf_paths = [os.path.join(os.getcwd(), pdf_file)]
 
-print(f"Loaded {len(all_docs)} documents from PDFs.")
+    for path in pdf_paths:
+        all_docs.extend(pdf_loader.load_data(file=path))
+
+    print(f"Loaded {len(all_docs)} documents from PDFs.")
 
 # -------------------------------
 # Build VectorStoreIndex
 # -------------------------------
 from llama_index.core import VectorStoreIndex
 
-index = VectorStoreIndex.from_documents(all_docs)
+with telemetry.span("index_build", documents=len(all_docs)):
+    index = VectorStoreIndex.from_documents(all_docs)
 query_engine = index.as_query_engine()
 
 # -------------------------------
@@ -82,27 +100,142 @@ agent_worker = FunctionCallingAgentWorker.from_tools(
 agent = AgentRunner(agent_worker)
 
 # -------------------------------
-# Queries
+# Output schema (both artifacts from one call)
+# -------------------------------
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+class RequirementSpec(BaseModel):
+    """Content of requirement.json."""
+    model_config = ConfigDict(extra="allow")
+    functional_requirements: list = Field(default_factory=list)
+    non_functional_requirements: list = Field(default_factory=list)
+
+class PackageSpec(BaseModel):
+    """Content of requirements_pkgs.json."""
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+    dependencies: dict[str, str] = Field(default_factory=dict)
+
+class BuilderOutput(BaseModel):
+    requirement: RequirementSpec
+    requirements_pkgs: PackageSpec
+
+# -------------------------------
+# Streaming JSON extraction
+# -------------------------------
+class JSONStreamExtractor:
+    """
+    Finds complete top-level JSON objects in streamed text by tracking brace
+    depth outside of string literals, so prose around the JSON (or several
+    JSON blocks) does not break parsing the way a greedy regex does.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """Consume text and return the JSON objects completed within it."""
+        completed = []
+        for ch in chunk:
+            if self._depth == 0:
+                if ch == "{":
+                    self._buffer, self._depth = ["{"], 1
+                continue
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        completed.append(json.loads("".join(self._buffer)))
+                    except ValueError:
+                        pass  # not JSON after all (e.g. a code snippet), keep scanning
+        return completed
+
+def extract_builder_output(token_stream):
+    """Return the first streamed JSON object that validates as BuilderOutput, plus the raw text."""
+    extractor, raw = JSONStreamExtractor(), []
+    for token in token_stream:
+        raw.append(token)
+        for candidate in extractor.feed(token):
+            try:
+                return BuilderOutput.model_validate(candidate), "".join(raw)
+            except ValidationError:
+                continue
+    return None, "".join(raw)
+
+# -------------------------------
+# Query (requirements + package dependencies in one call)
+# -------------------------------
+query = '''Using the BRD, produce ONE JSON object with exactly two keys:
+"requirement": 5 functional requirements with user stories and one major
+non functional requirement with user stories and scope, as
+{"functional_requirements": [...], "non_functional_requirements": [...]}.
+"requirements_pkgs": all package dependencies needed for the project, as
+{"dependencies": {"package": "version"}}.
+Respond with the JSON object only.'''
+with telemetry.span("builder_query"):
+    streaming_response = agent.stream_chat(query)
+    builder_output, raw_response = extract_builder_output(streaming_response.response_gen)
+
+# -------------------------------
+# PyPI version resolution (pooled session + TTL cache)
 # -------------------------------
-query1 = '''Extract 5 functional requirement with user stories and,
-one major Non functional requirements with user stories and scope
-from the BRD and respond in JSON format only.
-Also create a text file with the Json response named Requirement.txt
-and save in the root path. '''
-response1 = agent.chat(query1)
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import threading
+import time
+
+# Pluggable index so a local mirror or stub server can stand in for PyPI
+PYPI_INDEX_URL = os.getenv("PYPI_INDEX_URL", "https://pypi.org/pypi").rstrip("/")
+PYPI_CACHE_FILE = os.getenv("PYPI_CACHE_FILE", ".pypi_cache.json")
+PYPI_CACHE_TTL = int(os.getenv("PYPI_CACHE_TTL", "86400"))  # seconds
+PYPI_MAX_WORKERS = 32
+
+_session = None
+_session_lock = threading.Lock()
 
-query2 = '''Create requirements_pkgs.json file which has all packages dependencies needed for
-the project.Also create a json file with the json response named requirements_pkgs.json
-and save in the root path.'''
-response2 = agent.chat(query2)
+def get_http_session():
+    """Shared requests session with a connection pool sized for concurrent lookups."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=PYPI_MAX_WORKERS, pool_maxsize=PYPI_MAX_WORKERS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+def load_version_cache(cache_file=PYPI_CACHE_FILE):
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_version_cache(cache, cache_file=PYPI_CACHE_FILE):
+    with open(cache_file, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
 
 # -------------------------------
 # Function to fetch latest version from PyPI
 # -------------------------------
-def fetch_latest_version(pkg):
+def fetch_latest_version(pkg, index_url=PYPI_INDEX_URL):
     try:
-        url = f"https://pypi.org/pypi/{pkg}/json"
-        r = requests.get(url, timeout=5)
+        url = f"{index_url}/{pkg}/json"
+        r = get_http_session().get(url, timeout=5)
         if r.status_code == 200:
             data = r.json()
             return data['info']['version']
@@ -110,15 +243,44 @@ def fetch_latest_version(pkg):
         print(f"Warning: Could not fetch latest version for package {pkg}: {e}")
     return None
 
+def resolve_latest_versions(packages, index_url=PYPI_INDEX_URL, cache_file=PYPI_CACHE_FILE, ttl=PYPI_CACHE_TTL):
+    """
+    Resolve latest versions for many packages concurrently.
+    Fresh entries come from the local TTL cache; the rest are fetched in parallel.
+    Returns {pkg: version or None}.
+    """
+    cache = load_version_cache(cache_file)
+    now = time.time()
+    resolved, missing = {}, []
+    for pkg in packages:
+        entry = cache.get(f"{index_url}|{pkg}")
+        if entry and now - entry["fetched_at"] < ttl:
+            resolved[pkg] = entry["version"]
+        else:
+            missing.append(pkg)
+    telemetry.record_cache("pypi_versions", hits=len(resolved), misses=len(missing))
+
+    if missing:
+        workers = min(PYPI_MAX_WORKERS, len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            versions = pool.map(lambda p: fetch_latest_version(p, index_url), missing)
+        for pkg, ver in zip(missing, versions):
+            resolved[pkg] = ver
+            if ver:
+                cache[f"{index_url}|{pkg}"] = {"version": ver, "fetched_at": now}
+        save_version_cache(cache, cache_file)
+    return resolved
+
 # -------------------------------
 # Sanitize and update dependencies dynamically
 # -------------------------------
 def sanitize_dependencies_dynamic(deps: dict) -> dict:
     clean_deps = {}
+    latest = resolve_latest_versions(list(deps))
     for pkg, ver in deps.items():
         # Strip caret, tilde, etc from agent version suggestion
         base_ver = ver.lstrip("^~<>= ") if isinstance(ver, str) else ver
-        latest_ver = fetch_latest_version(pkg)
+        latest_ver = latest.get(pkg)
         if latest_ver:
             clean_deps[pkg] = latest_ver
         else:
@@ -126,38 +288,28 @@ def sanitize_dependencies_dynamic(deps: dict) -> dict:
     return clean_deps
 
 # -------------------------------
-# Handle first response (functional requirements)
+# Save requirement.json and requirements_pkgs.json
 # -------------------------------
 print("===== AGENT RESPONSE =====")
-print(response1.response)
+print(raw_response)
 
-from datetime import datetime
-match = re.search(r'(\{.*\}|\[.*\])', response1.response, re.DOTALL)
-if match:
-    json_output = json.loads(match.group(0))
+if builder_output:
+    requirement = builder_output.requirement.model_dump()
     print("===== PARSED JSON =====")
-    print(json.dumps(json_output, indent=2))
+    print(json.dumps(requirement, indent=2))
     filename = "requirement.json"
     with open(filename, "w", encoding="utf-8") as f:
-        json.dump(json_output, f, indent=2, ensure_ascii=False)
+        json.dump(requirement, f, indent=2, ensure_ascii=False)
     print(f"JSON saved to {filename}")
-else:
-    print("Could not extract JSON automatically. Raw response above.")
 
-# -------------------------------
-# Handle second response (package dependencies)
-# -------------------------------
-match = re.search(r'(\{.*\}|\[.*\])', response2.response, re.DOTALL)
-if match:
-    json_output = json.loads(match.group(0))
-    print("===== PARSED JSON =====")
-    print(json.dumps(json_output, indent=2))
+    packages = builder_output.requirements_pkgs.model_dump()
     # Sanitize and replace with latest versions dynamically
-    if 'dependencies' in json_output:
-        json_output['dependencies'] = sanitize_dependencies_dynamic(json_output['dependencies'])
+    packages['dependencies'] = sanitize_dependencies_dynamic(packages['dependencies'])
+    print("===== PARSED JSON =====")
+    print(json.dumps(packages, indent=2))
     filename = "requirements_pkgs.json"
     with open(filename, "w", encoding="utf-8") as f:
-        json.dump(json_output, f, indent=2, ensure_ascii=False)
+        json.dump(packages, f, indent=2, ensure_ascii=False)
     print(f"JSON saved to {filename}")
 else:
     print("Could not extract JSON automatically. Raw response above.")
@@ -2,6 +2,19 @@ import json
 import subprocess
 import os
 import sys
+import time
+import shutil
+import hashlib
+
+# -------------------------------
+# Shared install settings
+# -------------------------------
+# Wheels built/downloaded once are reused by every project venv.
+WHEEL_CACHE_DIR = os.getenv("KRIYA_WHEEL_CACHE", os.path.join(os.path.expanduser("~"), ".kriya", "wheels"))
+# Pre-warmed base venvs, keyed by the hash of their dependency set.
+BASE_VENV_DIR = os.getenv("KRIYA_BASE_VENVS", os.path.join(os.path.expanduser("~"), ".kriya", "base_venvs"))
+# Optional local package index (a directory of wheels) used instead of PyPI, e.g. for offline runs.
+LOCAL_INDEX_DIR = os.getenv("KRIYA_LOCAL_INDEX")
 
 def parse_package_dependencies_from_file(json_file_path):
     with open(json_file_path, 'r') as f:
@@ -16,6 +29,16 @@ def parse_package_dependencies_from_file(json_file_path):
         raise ValueError("Expected 'dependencies' key in JSON")
     return packages
 
+def get_venv_executables(venv_full_path):
+    """Return (python, pip) executable paths inside a virtual environment."""
+    # OS-dependent executable path
+    if os.name == 'nt':  # Windows
+        bin_dir = os.path.join(venv_full_path, 'Scripts')
+        return os.path.join(bin_dir, 'python.exe'), os.path.join(bin_dir, 'pip.exe')
+    # Linux / macOS
+    bin_dir = os.path.join(venv_full_path, 'bin')
+    return os.path.join(bin_dir, 'python'), os.path.join(bin_dir, 'pip')
+
 def setup_virtualenv_and_install(venv_name, venv_dir_path, json_req_file):
     venv_full_path = os.path.join(venv_dir_path, venv_name)
     packages = parse_package_dependencies_from_file(json_req_file)
@@ -24,11 +47,7 @@ def setup_virtualenv_and_install(venv_name, venv_dir_path, json_req_file):
     if not os.path.exists(venv_full_path):
         subprocess.run([sys.executable, '-m', 'venv', venv_full_path], check=True)
 
-    # OS-dependent pip executable path
-    if os.name == 'nt':  # Windows
-        pip_executable = os.path.join(venv_full_path, 'Scripts', 'pip.exe')
-    else:  # Linux / macOS
-        pip_executable = os.path.join(venv_full_path, 'bin', 'pip')
+    _, pip_executable = get_venv_executables(venv_full_path)
 
     # Ensure pip is upgraded
     subprocess.run([pip_executable, 'install', '--upgrade', 'pip'], check=True)
@@ -39,7 +58,159 @@ def setup_virtualenv_and_install(venv_name, venv_dir_path, json_req_file):
 
     return f"Virtual environment '{venv_name}' created at '{venv_full_path}' with dependencies installed."
 
+# -------------------------------
+# Fast install mode
+# -------------------------------
+def dependency_set_key(packages):
+    """Stable hash of a dependency set, used to name pre-warmed base venvs."""
+    normalized = sorted(p.strip().lower() for p in packages)
+    return hashlib.sha256("\n".join(normalized).encode("utf-8")).hexdigest()[:16]
+
+def build_pip_install_cmd(python_executable, packages, index_dir=None, cache_dir=WHEEL_CACHE_DIR):
+    """
+    Build a single 'pip install' command for all packages so dependency
+    resolution runs once. Wheels are looked up in (and added to) the shared cache.
+    """
+    cmd = [python_executable, '-m', 'pip', 'install', '--disable-pip-version-check',
+           '--cache-dir', cache_dir, '--find-links', cache_dir]
+    if index_dir:
+        # Offline: resolve only against the local wheel directory
+        cmd += ['--no-index', '--find-links', index_dir]
+    return cmd + list(packages)
+
+def warm_wheel_cache(packages, cache_dir=WHEEL_CACHE_DIR, index_dir=None):
+    """Download/build wheels for all packages into the shared cache in one resolve."""
+    os.makedirs(cache_dir, exist_ok=True)
+    cmd = [sys.executable, '-m', 'pip', 'wheel', '--disable-pip-version-check',
+           '--wheel-dir', cache_dir, '--find-links', cache_dir]
+    if index_dir:
+        cmd += ['--no-index', '--find-links', index_dir]
+    subprocess.run(cmd + list(packages), check=True)
+
+def find_base_venv(packages, base_dir=BASE_VENV_DIR):
+    """
+    Return the pre-warmed base venv whose dependency set overlaps most with
+    'packages' (and is fully contained in it), or None.
+    """
+    if not os.path.isdir(base_dir):
+        return None
+    wanted = {p.strip().lower() for p in packages}
+    best, best_overlap = None, 0
+    for name in os.listdir(base_dir):
+        manifest = os.path.join(base_dir, name, 'kriya_packages.json')
+        if not os.path.isfile(manifest):
+            continue
+        with open(manifest, 'r', encoding='utf-8') as f:
+            base_pkgs = {p.strip().lower() for p in json.load(f)}
+        # Only reuse a base whose packages are all wanted, otherwise we would leak extras
+        if base_pkgs and base_pkgs <= wanted and len(base_pkgs) > best_overlap:
+            best, best_overlap = os.path.join(base_dir, name), len(base_pkgs)
+    return best
+
+def create_base_venv(packages, base_dir=BASE_VENV_DIR, index_dir=None):
+    """Create (or reuse) a pre-warmed base venv for a dependency set and return its path."""
+    base_path = os.path.join(base_dir, dependency_set_key(packages))
+    if os.path.isdir(base_path):
+        return base_path
+    os.makedirs(base_dir, exist_ok=True)
+    subprocess.run([sys.executable, '-m', 'venv', base_path], check=True)
+    python_executable, _ = get_venv_executables(base_path)
+    subprocess.run(build_pip_install_cmd(python_executable, packages, index_dir=index_dir), check=True)
+    with open(os.path.join(base_path, 'kriya_packages.json'), 'w', encoding='utf-8') as f:
+        json.dump(sorted(packages), f, indent=2)
+    return base_path
+
+def rewrite_script_paths(base_path, venv_full_path):
+    """
+    Point the scripts copied from a base venv at the clone: console scripts (pip, entry points)
+    have the base interpreter in their shebang, and the activate scripts set VIRTUAL_ENV and
+    the prompt to the base venv ('venv --upgrade' does not regenerate them).
+    """
+    old = os.path.abspath(base_path).encode()
+    new = os.path.abspath(venv_full_path).encode()
+    old_prompt = f"({os.path.basename(os.path.abspath(base_path))})".encode()
+    new_prompt = f"({os.path.basename(os.path.abspath(venv_full_path))})".encode()
+    bin_dir = os.path.dirname(get_venv_executables(venv_full_path)[0])
+    for name in os.listdir(bin_dir):
+        path = os.path.join(bin_dir, name)
+        if os.path.islink(path) or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        if name.lower().startswith('activate'):
+            data = data.replace(old, new).replace(old_prompt, new_prompt)
+        elif data.startswith(b'#!') and old in data:
+            data = data.replace(old, new)
+        else:
+            continue
+        with open(path, 'wb') as f:
+            f.write(data)
+
+def clone_venv(base_path, venv_full_path):
+    """
+    Clone a base venv by copying it, re-running 'venv --upgrade' so the interpreter
+    links point at the new location, and rewriting script shebangs and activate scripts.
+    Not supported on Windows, where script launchers (.exe) embed the base interpreter path.
+    """
+    if os.name == 'nt':
+        raise ValueError("Cloning base venvs is not supported on Windows")
+    shutil.copytree(base_path, venv_full_path, symlinks=True)
+    manifest = os.path.join(venv_full_path, 'kriya_packages.json')
+    if os.path.exists(manifest):
+        os.remove(manifest)
+    subprocess.run([sys.executable, '-m', 'venv', '--upgrade', venv_full_path], check=True)
+    rewrite_script_paths(base_path, venv_full_path)
+
+def setup_virtualenv_fast(venv_name, venv_dir_path, json_req_file, index_dir=LOCAL_INDEX_DIR,
+                          use_base_venv=(os.name != 'nt')):
+    """
+    Fast variant of setup_virtualenv_and_install:
+    - resolves and installs all packages in one pip invocation,
+    - reuses the shared local wheel cache,
+    - clones a pre-warmed base venv when its dependency set overlaps; the first time a
+      dependency set is seen its wheels are cached and a base venv is built for it.
+    Base venvs are off (and refused) on Windows, where script launchers (.exe) embed the base interpreter path.
+    Returns a result dict including the install time in seconds.
+    """
+    if use_base_venv and os.name == 'nt':
+        raise ValueError("use_base_venv is not supported on Windows")
+    start = time.perf_counter()
+    venv_full_path = os.path.join(venv_dir_path, venv_name)
+    packages = parse_package_dependencies_from_file(json_req_file)
+    os.makedirs(WHEEL_CACHE_DIR, exist_ok=True)
+
+    base_path = None
+    if not os.path.exists(venv_full_path):
+        if use_base_venv:
+            base_path = find_base_venv(packages)
+            if base_path is None:
+                print(f"[INFO] Warming wheel cache and base venv for {len(packages)} packages")
+                warm_wheel_cache(packages, index_dir=index_dir)
+                base_path = create_base_venv(packages, index_dir=index_dir)
+        if base_path:
+            print(f"[INFO] Cloning base venv {base_path}")
+            clone_venv(base_path, venv_full_path)
+        else:
+            subprocess.run([sys.executable, '-m', 'venv', venv_full_path], check=True)
+
+    python_executable, _ = get_venv_executables(venv_full_path)
+
+    # Single resolve for everything; pip skips what the cloned base already satisfies
+    subprocess.run(build_pip_install_cmd(python_executable, packages, index_dir=index_dir), check=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] Installed {len(packages)} packages into '{venv_full_path}' in {elapsed:.2f}s")
+    return {
+        "venv": venv_full_path,
+        "packages": packages,
+        "base_venv": base_path,
+        "install_seconds": round(elapsed, 3),
+    }
+
 if __name__ == "__main__":
     # Example parameters, can be parameterized as needed
-    result = setup_virtualenv_and_install('venvtest1', 'C:\\Users\\gangulay\\Documents\\GenAI', 'requirements_pkgs.json')
+    if "--fast" in sys.argv:
+        result = setup_virtualenv_fast('venvtest1', 'C:\\Users\\gangulay\\Documents\\GenAI', 'requirements_pkgs.json')
+    else:
+        result = setup_virtualenv_and_install('venvtest1', 'C:\\Users\\gangulay\\Documents\\GenAI', 'requirements_pkgs.json')
     print(result)
@@ -1,8 +1,13 @@
 import json
 import os
 import re
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from llama_index.llms.openai import OpenAI
+from llm_provider import get_llm, configure
+import telemetry
 
 # -------------------------------
 # Load environment variables
@@ -53,6 +58,116 @@ def save_multi_file_code(output_text, base_dir=None):
         print(f" Wrote {full_path}")
 
 
+# -------------------------------
+# Streaming multi-file writer
+# -------------------------------
+TOP_FOLDER = re.compile(r"^([\w\-_]+/)")
+
+class StreamingCodeWriter:
+    """
+    Incrementally parses ```lang path ... ``` fences from streamed LLM tokens.
+    Each file is written as soon as its closing fence arrives, so downstream
+    stages can start on early files before the completion finishes.
+    """
+
+    def __init__(self, base_dir=None, on_file=None):
+        self.base_dir = base_dir
+        self.on_file = on_file          # optional callback(full_path)
+        self.written = []
+        self._pending = ""               # partial line not yet terminated by newline
+        self._current_file = None
+        self._in_fence = False
+        self._buffer = []
+        self._raw = []                   # kept only for the no-fences fallback
+        self._auto_base_dir = None
+
+    def _resolve_base_dir(self):
+        if not self.base_dir:
+            self.base_dir = self._auto_base_dir or "generated_project"
+        os.makedirs(self.base_dir, exist_ok=True)
+        return self.base_dir
+
+    def _write_file(self, file_path, code):
+        # Skip directory-only paths
+        if file_path.endswith("/") or file_path.endswith("\\"):
+            print(f" Skipping directory path: {file_path}")
+            return
+        full_path = os.path.join(self._resolve_base_dir(), file_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(code.strip())
+        self.written.append(full_path)
+        print(f" Wrote {full_path}")
+        if self.on_file:
+            self.on_file(full_path)
+
+    def _handle_line(self, line):
+        stripped = line.strip()
+        if not self._in_fence:
+            if stripped.startswith("```"):
+                # Header is "```lang path"; a lone token is a path only if it looks like one
+                header = stripped[3:].split()
+                path = None
+                if len(header) > 1 or (header and ("/" in header[0] or "." in header[0])):
+                    path = header[-1]
+                self._in_fence = True
+                self._current_file = path
+                self._buffer = []
+            elif self._auto_base_dir is None:
+                folder_match = TOP_FOLDER.match(line)
+                if folder_match:
+                    self._auto_base_dir = folder_match.group(1).rstrip("/")
+            return
+
+        if stripped.startswith("```"):
+            if self._current_file:
+                self._write_file(self._current_file, "\n".join(self._buffer))
+            self._in_fence = False
+            self._current_file = None
+            self._buffer = []
+        else:
+            self._buffer.append(line)
+
+    def feed(self, text):
+        """Consume a chunk of streamed text (any size, may split lines)."""
+        if not text:
+            return
+        if not self.written:
+            self._raw.append(text)
+        data = self._pending + text
+        lines = data.split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._handle_line(line)
+
+    def close(self):
+        """Flush the trailing partial line; fall back to a single file if no fences were found."""
+        if self._pending:
+            self._handle_line(self._pending)
+            self._pending = ""
+        if self._in_fence and self._current_file:
+            # Unterminated final fence: keep what we have
+            self._write_file(self._current_file, "\n".join(self._buffer))
+        if not self.written:
+            single_file = os.path.join(self._resolve_base_dir(), "generated_code.txt")
+            with open(single_file, "w", encoding="utf-8") as f:
+                f.write("".join(self._raw))
+            print(f" No structured matches found. Saved everything to {single_file}")
+        self._raw = []
+        return self.written
+
+
+def save_multi_file_code_streaming(token_stream, base_dir=None, on_file=None):
+    """
+    Streaming counterpart of save_multi_file_code.
+    token_stream yields llama_index CompletionResponse chunks (from stream_complete) or plain strings.
+    """
+    writer = StreamingCodeWriter(base_dir=base_dir, on_file=on_file)
+    for chunk in token_stream:
+        writer.feed(chunk if isinstance(chunk, str) else chunk.delta)
+    return writer.close()
+
+
 # def create_environment(requirement_file: str = "requirements.txt"):
 #     """
 #     Creates a Python virtual environment and installs dependencies from requirements.txt. 
@@ -84,9 +199,10 @@ def save_multi_file_code(output_text, base_dir=None):
 #     print(" Environment setup complete.")
     
 
-def generate_code(requirement_file: str, base_dir: str = None):
+def generate_code(requirement_file: str, base_dir: str = None, stream: bool = False):
     """
     Reads requirements JSON and generates multi-file project using LlamaIndex LLM.
+    With stream=True, files are written as their code fences complete.
     """
 
     if not os.path.exists(requirement_file):
@@ -99,7 +215,9 @@ def generate_code(requirement_file: str, base_dir: str = None):
     framework = requirements.get("framework", "flask")
 
     api_key = os.getenv("OPENAI_API_KEY")
-    llm = OpenAI(model="gpt-4o-mini", api_key=api_key)
+    llm = get_llm(model="gpt-4o-mini", api_key=api_key)
+    configure(llm)
+    telemetry.install("coder_agent", llm)
 
     prompt = f"""
     You are a senior full-stack developer agent.
@@ -121,14 +239,214 @@ def generate_code(requirement_file: str, base_dir: str = None):
     - Do not provide extra explanations outside code blocks.
     """
 
-    response = llm.complete(prompt)
+    if stream:
+        # Write each file as soon as its closing fence is streamed
+        save_multi_file_code_streaming(llm.stream_complete(prompt), base_dir=base_dir)
+    else:
+        response = llm.complete(prompt)
 
-    # Save output into multi-file structure
-    save_multi_file_code(response.text, base_dir=base_dir)
+        # Save output into multi-file structure
+        save_multi_file_code(response.text, base_dir=base_dir)
     print(f"\n Project generated inside: {base_dir or 'auto-detected root folder'}")
 
 
+# -------------------------------
+# Per-file parallel generation
+# -------------------------------
+MAX_FILE_WORKERS = int(os.getenv("CODER_MAX_WORKERS", "6"))
+MAX_REQUESTS_PER_MINUTE = int(os.getenv("CODER_RPM", "60"))
+FILE_RETRIES = 2
+MANIFEST_FILE = ".kriya_manifest.json"   # saved in the output folder so a rerun can resume
+
+class RateLimiter:
+    """Spaces out request starts so at most 'per_minute' calls begin each minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def extract_json_block(text):
+    """Return the first JSON object/array in an LLM response (fenced or bare)."""
+    text = re.sub(r"^```(?:json)?\s*|```\s*$", "", text.strip(), flags=re.MULTILINE)
+    for i, ch in enumerate(text):
+        if ch in "[{":
+            try:
+                return json.JSONDecoder().raw_decode(text[i:])[0]
+            except ValueError:
+                continue
+    raise ValueError("No JSON found in LLM response")
+
+
+def generate_file_manifest(llm, requirements, language, framework):
+    """Phase 1: one cheap call that returns [{"path": ..., "purpose": ...}, ...]."""
+    prompt = f"""
+    You are a senior full-stack developer agent planning a project.
+    Requirements:
+    {json.dumps(requirements, indent=2)}
+
+    List every file needed for a {language} project using {framework}.
+    Respond with JSON only, as a list of objects:
+    [{{"path": "backend/app.py", "purpose": "one line description"}}]
+    """
+    manifest = extract_json_block(llm.complete(prompt).text)
+    if isinstance(manifest, dict):
+        manifest = manifest.get("files", [])
+    # Models sometimes answer with bare paths instead of objects
+    manifest = [{"path": entry} if isinstance(entry, str) else entry for entry in manifest]
+    return [entry for entry in manifest
+            if isinstance(entry, dict) and entry.get("path") and not entry["path"].endswith("/")]
+
+
+def generate_single_file(llm, requirements, manifest, entry, language, framework):
+    """Phase 2: generate the contents of one file with the whole manifest as context."""
+    file_list = "\n".join(f"- {e['path']}: {e.get('purpose', '')}" for e in manifest)
+    prompt = f"""
+    You are a senior full-stack developer agent.
+    Requirements:
+    {json.dumps(requirements, indent=2)}
+
+    The project uses {language} with {framework} and contains these files:
+    {file_list}
+
+    Write the complete contents of {entry['path']} ({entry.get('purpose', '')}).
+    Keep imports consistent with the file list above.
+    Return only the file contents in a single markdown code block.
+    """
+    text = llm.complete(prompt).text
+    # Greedy up to the last fence line, so fences inside the file (e.g. in a README) are kept
+    match = re.search(r"^```[^\n]*\n(.*)^```", text, re.DOTALL | re.MULTILINE)
+    return match.group(1) if match else text
+
+
+def generate_files_parallel(llm, requirements, manifest, language, framework,
+                            max_workers=MAX_FILE_WORKERS, per_minute=MAX_REQUESTS_PER_MINUTE,
+                            retries=FILE_RETRIES, on_file=None, entries=None):
+    """
+    Generate every manifest file (or only 'entries', with the whole manifest as context)
+    concurrently with a bounded worker pool.
+    A failed file is retried on its own; on_file(path, code) is called as each file completes.
+    Returns ({path: code}, [failed paths]).
+    """
+    limiter = RateLimiter(per_minute)
+
+    def worker(entry):
+        for attempt in range(retries + 1):
+            limiter.wait()
+            try:
+                return generate_single_file(llm, requirements, manifest, entry, language, framework)
+            except Exception as e:
+                print(f" [WARN] {entry['path']} attempt {attempt + 1} failed: {e}")
+                if attempt < retries:
+                    time.sleep(2 ** attempt)
+        return None
+
+    results, failed = {}, []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(worker, entry): entry["path"] for entry in (manifest if entries is None else entries)}
+        for future in as_completed(futures):
+            path = futures[future]
+            code = future.result()
+            if code is None:
+                failed.append(path)
+            else:
+                results[path] = code
+                print(f" Generated {path}")
+                if on_file:
+                    on_file(path, code)
+    return results, failed
+
+
+def generated_file_path(base_dir, path):
+    """Absolute path of a manifest entry under base_dir, or None if it would leave base_dir."""
+    root = os.path.abspath(base_dir)
+    full_path = os.path.abspath(os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root or full_path == root:
+        return None
+    return full_path
+
+
+def write_generated_file(base_dir, path, code):
+    """Write one generated file atomically (a crash never leaves it half-written); returns its path."""
+    full_path = generated_file_path(base_dir, path)
+    if full_path is None:
+        print(f" Skipping path outside {base_dir}: {path}")
+        return None
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(code)
+    os.replace(full_path + ".tmp", full_path)
+    print(f" Wrote {full_path}")
+    return full_path
+
+
+def generate_code_parallel(requirement_file: str, base_dir: str = None, resume: bool = False):
+    """
+    Two-phase generation: plan a file manifest, then generate files concurrently.
+    Each file is written to its manifest path as soon as it completes. The manifest is saved
+    in base_dir; with resume=True a rerun reuses it and only generates files not written yet.
+    Returns the paths that could not be generated.
+    """
+    if not os.path.exists(requirement_file):
+        raise FileNotFoundError(f"Requirement file not found: {requirement_file}")
+
+    with open(requirement_file, "r", encoding="utf-8") as f:
+        requirements = json.load(f)
+
+    language = requirements.get("language", "python")
+    framework = requirements.get("framework", "flask")
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    llm = get_llm(model="gpt-4o-mini", api_key=api_key)
+    configure(llm)
+    telemetry.install("coder_agent", llm)
+
+    start = time.perf_counter()
+    base_dir = base_dir or "generated_project"
+    manifest_path = os.path.join(base_dir, MANIFEST_FILE)
+    if resume and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        print(f" Resuming with saved manifest of {len(manifest)} files")
+    else:
+        manifest = generate_file_manifest(llm, requirements, language, framework)
+        print(f" Manifest lists {len(manifest)} files")
+        os.makedirs(base_dir, exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    pending = []
+    for entry in manifest:
+        full_path = generated_file_path(base_dir, entry["path"])
+        if full_path is None:
+            print(f" Skipping path outside {base_dir}: {entry['path']}")
+        elif not (resume and os.path.exists(full_path)):
+            pending.append(entry)
+    if resume:
+        # Files written by an earlier (crashed or partly failed) run are kept
+        print(f" {len(pending)} of {len(manifest)} files still to generate")
+
+    _, failed = generate_files_parallel(llm, requirements, manifest, language, framework, entries=pending,
+                                        on_file=lambda path, code: write_generated_file(base_dir, path, code))
+    if failed:
+        print(f" [WARN] Could not generate: {', '.join(failed)}; rerun with --resume to retry them")
+    print(f"\n Project generated inside: {base_dir} in {time.perf_counter() - start:.1f}s")
+    return failed
+
+
 if __name__ == "__main__":
     # create_environment("requirements.txt")
     # Reads the requirement.json created by builder_agent.py
-    generate_code("requirement.json")
+    if "--parallel" in sys.argv:
+        generate_code_parallel("requirement.json", resume="--resume" in sys.argv)
+    else:
+        generate_code("requirement.json", stream="--stream" in sys.argv)
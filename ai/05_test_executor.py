@@ -3,10 +3,14 @@ import sys
 import subprocess
 import json
 import importlib.util
+import ast
+import hashlib
+import tempfile
+import re
 
-from llama_index.core import Document, VectorStoreIndex
-from llama_index.llms.openai import OpenAI
+from llm_provider import get_llm, configure
 from dotenv import load_dotenv
+import telemetry
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -71,6 +75,254 @@ def run_pytest(test_dir="project/tests", results_file="report.json"):
         return json.load(f)
 
 
+# -------------------------------
+# Parallel / incremental execution
+# -------------------------------
+# import name -> pip name
+RUNTIME_DEPENDENCIES = {"pytest": "pytest", "pytest_jsonreport": "pytest-json-report"}
+TEST_STATE_FILE = ".kriya_test_state.json"
+DURATION_HISTORY = 20  # runs kept per test
+PYTEST_OK_EXIT_CODES = (0, 1, 5)  # all passed, tests failed, no tests collected
+
+
+def check_runtime_dependencies():
+    """Check (and install if missing) all runtime dependencies once, in a single pip call."""
+    missing = [pip_name for module, pip_name in RUNTIME_DEPENDENCIES.items()
+               if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f"[INFO] Installing missing packages: {', '.join(missing)}")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *missing])
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def hash_project_files(project_root):
+    """Map every .py file under project_root (relative path) to its content hash."""
+    hashes = {}
+    for dirpath, dirnames, filenames in os.walk(project_root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in ("__pycache__", "venv", ".venv")]
+        for filename in filenames:
+            if filename.endswith(".py"):
+                full_path = os.path.join(dirpath, filename)
+                hashes[os.path.relpath(full_path, project_root)] = file_sha256(full_path)
+    return hashes
+
+
+def module_dependencies(source_file, project_root):
+    """Project source files a module imports directly, resolved statically from its AST."""
+    with open(source_file, "r", encoding="utf-8") as f:
+        try:
+            tree = ast.parse(f.read())
+        except SyntaxError:
+            return []
+    package = os.path.relpath(os.path.dirname(os.path.abspath(source_file)), project_root).split(os.sep)
+    package = [] if package == ["."] else package
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                # Relative import: resolve against the importing module's package
+                parent = package[:len(package) - (node.level - 1)] if node.level > 1 else package
+                prefix = ".".join(parent + ([node.module] if node.module else []))
+            else:
+                prefix = node.module
+            if not prefix:
+                modules.update(alias.name for alias in node.names)
+                continue
+            modules.add(prefix)
+            modules.update(f"{prefix}.{alias.name}" for alias in node.names)
+    deps = []
+    for module in modules:
+        parts = module.split(".")
+        # 'import a.b.c' also imports packages a and a.b
+        for depth in range(1, len(parts) + 1):
+            base = os.path.join(*parts[:depth])
+            for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+                if os.path.isfile(os.path.join(project_root, candidate)):
+                    deps.append(os.path.normpath(candidate))
+    return sorted(set(deps))
+
+
+def test_file_dependencies(test_file, project_root, cache=None):
+    """
+    Project source files a test file depends on: its imports and, transitively,
+    everything those modules import. 'cache' maps file -> direct imports across calls.
+    """
+    cache = {} if cache is None else cache
+    seen, stack = set(), module_dependencies(test_file, project_root)
+    while stack:
+        dep = stack.pop()
+        if dep in seen:
+            continue
+        seen.add(dep)
+        if dep not in cache:
+            cache[dep] = module_dependencies(os.path.join(project_root, dep), project_root)
+        stack.extend(cache[dep])
+    return sorted(seen)
+
+
+def load_test_state(state_file=TEST_STATE_FILE):
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"file_hashes": {}, "test_map": {}, "durations": {}}
+
+
+def save_test_state(state, state_file=TEST_STATE_FILE):
+    with open(state_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def select_affected_tests(test_files, project_root, state):
+    """
+    Return (affected test files, new file hashes, new test map).
+    A test is affected if it is new, itself changed, or imports (directly or transitively)
+    a changed project file.
+    """
+    hashes = hash_project_files(project_root)
+    old_hashes = state.get("file_hashes", {})
+    changed = {path for path, digest in hashes.items() if old_hashes.get(path) != digest}
+
+    test_map, affected, cache = {}, [], {}
+    for test_file in test_files:
+        rel = os.path.relpath(test_file, project_root)
+        test_map[rel] = test_file_dependencies(test_file, project_root, cache)
+        if not old_hashes or rel in changed or changed.intersection(test_map[rel]):
+            affected.append(test_file)
+    return affected, hashes, test_map
+
+
+def collect_test_files(test_dir):
+    files = []
+    for dirpath, _, filenames in os.walk(test_dir):
+        for filename in filenames:
+            if (filename.startswith("test_") and filename.endswith(".py")) or filename.endswith("_test.py"):
+                files.append(os.path.join(dirpath, filename))
+    return sorted(files)
+
+
+def shard_tests(test_files, num_shards, durations):
+    """Greedy longest-first split of test files across shards using recorded durations."""
+    def file_cost(path):
+        name = os.path.basename(path)
+        costs = [sum(h) / len(h) for nodeid, h in durations.items() if h and nodeid.split("::")[0].endswith(name)]
+        return sum(costs) if costs else 1.0
+
+    shards = [[] for _ in range(num_shards)]
+    loads = [0.0] * num_shards
+    for path in sorted(test_files, key=file_cost, reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(path)
+        loads[i] += file_cost(path)
+    return [shard for shard in shards if shard]
+
+
+def merge_reports(reports):
+    """Merge per-shard pytest JSON reports into one report with summed counts."""
+    merged = {"summary": {}, "tests": [], "duration": 0.0}
+    for report in reports:
+        for key, value in report.get("summary", {}).items():
+            if isinstance(value, (int, float)):
+                merged["summary"][key] = merged["summary"].get(key, 0) + value
+        merged["tests"].extend(report.get("tests", []))
+        merged["duration"] = max(merged["duration"], report.get("duration", 0.0))
+    return merged
+
+
+def record_durations(report, state):
+    """Append per-test durations to the history and return the slowest tests."""
+    history = state.setdefault("durations", {})
+    for test in report.get("tests", []):
+        total = sum(test.get(phase, {}).get("duration", 0.0) for phase in ("setup", "call", "teardown"))
+        runs = history.setdefault(test["nodeid"], [])
+        runs.append(round(total, 4))
+        del runs[:-DURATION_HISTORY]
+    averages = {nodeid: sum(runs) / len(runs) for nodeid, runs in history.items() if runs}
+    return sorted(averages.items(), key=lambda item: item[1], reverse=True)
+
+
+def run_pytest_parallel(test_dir="project/tests", results_file="report.json", workers=None,
+                        incremental=True, state_file=TEST_STATE_FILE):
+    """
+    Run pytest sharded across CPU cores, optionally only for tests affected by
+    changes since the last run. Returns the merged JSON report.
+    """
+    check_runtime_dependencies()
+
+    results_file = os.path.abspath(results_file)
+    project_root = os.path.abspath("project")
+    env = os.environ.copy()
+    env["PYTHONPATH"] = project_root + os.pathsep + env.get("PYTHONPATH", "")
+
+    state = load_test_state(state_file)
+    test_files = collect_test_files(test_dir)
+    if incremental:
+        selected, hashes, test_map = select_affected_tests(test_files, project_root, state)
+    else:
+        selected, hashes, test_map = test_files, hash_project_files(project_root), state.get("test_map", {})
+    print(f"[INFO] {len(selected)} of {len(test_files)} test files selected")
+
+    reports, crashed_shards, failed_shards = [], [], []
+    if selected:
+        workers = workers or os.cpu_count() or 1
+        shards = shard_tests(selected, min(workers, len(selected)), state.get("durations", {}))
+        processes = []
+        for i, shard in enumerate(shards):
+            shard_report = f"{results_file}.shard{i}"
+            if os.path.exists(shard_report):
+                os.remove(shard_report)
+            cmd = [sys.executable, "-m", "pytest", *shard, "-q", "--json-report",
+                   f"--json-report-file={shard_report}"]
+            # Output goes to a file per shard so no shard blocks on a full pipe while another is read
+            output = tempfile.TemporaryFile(mode="w+", encoding="utf-8", errors="replace")
+            proc = subprocess.Popen(cmd, stdout=output, stderr=subprocess.STDOUT, text=True, env=env)
+            processes.append((proc, shard_report, output))
+
+        for i, (proc, shard_report, output) in enumerate(processes):
+            proc.wait()
+            output.seek(0)
+            print(f"========== PYTEST SHARD {i} ==========")
+            print(output.read())
+            output.close()
+            if os.path.exists(shard_report):
+                with open(shard_report, "r", encoding="utf-8") as f:
+                    reports.append(json.load(f))
+                os.remove(shard_report)
+            else:
+                crashed_shards.append(i)
+            # Exit code 1 only means tests failed; 2+ is an interruption, internal or usage error
+            if proc.returncode not in PYTEST_OK_EXIT_CODES or i in crashed_shards:
+                failed_shards.append({"shard": i, "returncode": proc.returncode,
+                                      "report": i not in crashed_shards, "files": shards[i]})
+
+    report = merge_reports(reports)
+    report["failed_shards"] = failed_shards
+    if crashed_shards:
+        # A shard that died without a report counts as an error, not as "no failures"
+        report["summary"]["error"] = report["summary"].get("error", 0) + len(crashed_shards)
+    slowest = record_durations(report, state)
+    report["slowest_tests"] = [{"nodeid": nodeid, "avg_duration": round(avg, 4)} for nodeid, avg in slowest[:10]]
+
+    # Only remember hashes of a run that passed, so failing tests are re-run next time
+    if not failed_shards and not report["summary"].get("failed") and not report["summary"].get("error"):
+        state["file_hashes"] = hashes
+    state["test_map"] = test_map
+    save_test_state(state, state_file)
+
+    with open(results_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
 def summarize_report(report):
     """Summarize pytest JSON report (structured)."""
     summary = {
@@ -83,34 +335,124 @@ def summarize_report(report):
     return summary
 
 
-def generate_llm_summary(report):
-    """Use LlamaIndex + LLM to generate a natural language summary of test execution."""
-    # Convert report into a readable text
-    report_text = json.dumps(report, indent=4)
+DIGEST_TOP_SLOWEST = 10
+DIGEST_MAX_GROUPS = 15
+DIGEST_SAMPLES_PER_GROUP = 3
+DIGEST_MODULES_PER_GROUP = 10
+DIGEST_MESSAGE_CHARS = 200
 
-    # Wrap it in a LlamaIndex Document
-    doc = Document(text=report_text)
 
-    # Build a mini index
-    index = VectorStoreIndex.from_documents([doc])
+# Exception class at the start of a crash message or an "E   pkg.SomeError: ..." longrepr line
+_EXCEPTION_NAME = r"((?:[A-Za-z_]\w*\.)*[A-Z]\w*)"
+_EXCEPTION_PREFIX = re.compile(_EXCEPTION_NAME + r"(?::\s*|$)")
+_EXCEPTION_LINE = re.compile(r"^E\s+" + _EXCEPTION_NAME + r"(?::|\s*$)")
 
-    # Set up LLM (replace with your model)
-    llm = OpenAI(model="gpt-4o-mini")  # or "gpt-4o", "gpt-3.5-turbo"
 
-    query_engine = index.as_query_engine(llm=llm)
+def _failed_phase(test):
+    for phase in ("setup", "call", "teardown"):
+        info = test.get(phase, {})
+        if info.get("outcome") in ("failed", "error"):
+            return info
+    return {}
 
-    # Ask the LLM to summarize test execution
-    response = query_engine.query(
-        "Summarize this pytest report. Highlight how many tests passed, failed, skipped, "
-        "and describe main failures in simple language."
-    )
 
-    return str(response)
+def _failure_message(test):
+    """First crash message of a failed/errored test, from whichever phase failed."""
+    info = _failed_phase(test)
+    crash = info.get("crash") or {}
+    if crash.get("message"):
+        return crash["message"]
+    # Fall back to the last "E   ..." line of the long representation
+    lines = [l[1:].strip() for l in (info.get("longrepr") or "").splitlines() if l.startswith("E ")]
+    return lines[-1] if lines else ""
+
+
+def _failure_type(test, message):
+    """Exception class name from the crash message, else from the longrepr's 'E   SomeError:' lines."""
+    match = _EXCEPTION_PREFIX.match(message.strip())
+    if not match:
+        for line in (_failed_phase(test).get("longrepr") or "").splitlines():
+            if match := _EXCEPTION_LINE.match(line):
+                break
+    if match:
+        return match.group(1).rsplit(".", 1)[-1]
+    # pytest strips the class name from rewritten assertions
+    return "AssertionError" if message.lstrip().startswith("assert") else "Unknown"
+
+
+def _normalize_message(message):
+    """First line of a message without its exception prefix, with numbers, strings and addresses masked."""
+    line = _EXCEPTION_PREFIX.sub("", message.strip().split("\n", 1)[0], count=1)
+    line = re.sub(r"0x[0-9a-fA-F]+", "<addr>", line)
+    line = re.sub(r"'[^']*'|\"[^\"]*\"", "<str>", line)
+    line = re.sub(r"\d+(?:\.\d+)?", "<n>", line)
+    return " ".join(line.split())[:DIGEST_MESSAGE_CHARS]
+
+
+def build_report_digest(report, top_n=DIGEST_TOP_SLOWEST, max_groups=DIGEST_MAX_GROUPS):
+    """
+    Aggregate a pytest JSON report locally into a compact digest:
+    counts, failures grouped by exception type and normalized message, and the slowest tests.
+    Size is bounded regardless of how many tests the suite has.
+    """
+    groups, group_modules = {}, {}
+    timings = []
+    for test in report.get("tests", []):
+        nodeid = test.get("nodeid", "")
+        total = sum(test.get(phase, {}).get("duration", 0.0) for phase in ("setup", "call", "teardown"))
+        timings.append((total, nodeid))
+        if test.get("outcome") not in ("failed", "error"):
+            continue
+        message = _failure_message(test)
+        exc_type, pattern = _failure_type(test, message), _normalize_message(message)
+        group = groups.setdefault((exc_type, pattern), {"exception": exc_type, "message": pattern, "count": 0,
+                                                        "modules": [], "omitted_modules": 0, "samples": []})
+        group["count"] += 1
+        module = nodeid.split("::", 1)[0]
+        seen = group_modules.setdefault((exc_type, pattern), set())
+        if module not in seen:
+            seen.add(module)
+            if len(group["modules"]) < DIGEST_MODULES_PER_GROUP:
+                group["modules"].append(module)
+            else:
+                group["omitted_modules"] += 1
+        if len(group["samples"]) < DIGEST_SAMPLES_PER_GROUP:
+            group["samples"].append({"test": nodeid, "message": message[:DIGEST_MESSAGE_CHARS]})
+
+    failures = sorted(groups.values(), key=lambda g: g["count"], reverse=True)
+    timings.sort(reverse=True)
+    return {
+        "counts": summarize_report(report),
+        "failure_groups": failures[:max_groups],
+        "omitted_failure_groups": max(0, len(failures) - max_groups),
+        "slowest_tests": [{"test": nodeid, "duration": round(d, 4)} for d, nodeid in timings[:top_n]],
+    }
+
+
+def generate_llm_summary(report):
+    """Summarize test execution with one direct LLM call over a locally built digest."""
+    digest = build_report_digest(report)
+
+    # Set up LLM (replace with your model)
+    llm = get_llm(model="gpt-4o-mini")  # or "gpt-4o", "gpt-3.5-turbo"
+    configure(llm)
+    telemetry.install("test_executor", llm)
+
+    prompt = (
+        "Summarize this pytest report digest. Highlight how many tests passed, failed, skipped, "
+        "and describe main failures in simple language.\n\n"
+        + json.dumps(digest, indent=2)
+    )
+    response = llm.complete(prompt)
+    return response.text
 
 
 if __name__ == "__main__":
     try:
-        report = run_pytest()
+        if "--parallel" in sys.argv:
+            report = run_pytest_parallel(incremental="--full" not in sys.argv)
+        else:
+            report = run_pytest()
         summary = summarize_report(report)
         print("\n===== STRUCTURED SUMMARY =====")
         print(json.dumps(summary, indent=4))
@@ -1,14 +1,127 @@
 import os
 import json
 import re
+import ast
+import fnmatch
+import hashlib
+import importlib.util
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import sys
 from dotenv import load_dotenv
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
-from llama_index.llms.openai import OpenAI
+from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, Document, Settings
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import TextNode
+from llm_provider import get_llm, configure
+import telemetry
 
 load_dotenv()  # Load environment variables from .env file
 
+# Indexing limits for build_index_selective
+INDEX_INCLUDE = ["*.py", "*.js", "*.ts", "*.jsx", "*.tsx", "*.html", "*.css", "*.sql",
+                 "*.json", "*.yml", "*.yaml", "*.md", "*.txt", "*.cfg", "*.toml"]
+INDEX_EXCLUDE = ["venv/*", ".venv/*", "env/*", "*/venv/*", "*/.venv/*", "node_modules/*", "*/node_modules/*",
+                 "tests/*", "*/tests/*", ".git/*", "*/__pycache__/*", "__pycache__/*",
+                 "*.lock", "package-lock.json", ".kriya_*"]
+INDEX_MAX_FILE_BYTES = 200_000
+INDEX_MAX_CHUNK_CHARS = 6_000      # well inside embedding model input limits
+INDEX_CHUNK_OVERLAP_LINES = 5      # carried over between line-split pieces of an oversized chunk
+INDEX_CACHE_FILE = ".kriya_index_cache.json"
+
+
+class ImportRewriter:
+    """
+    Rewrites absolute imports of bare module names to their package path,
+    e.g. "from app import x" -> "from backend.app import x" and
+    "import models" -> "from backend import models".
+    Each file is parsed once with ast; statements are replaced by source position.
+    Files that do not parse fall back to one compiled single-pass regex.
+    """
+
+    def __init__(self, module_map):
+        self.module_map = module_map
+        names = "|".join(re.escape(n) for n in sorted(module_map, key=len, reverse=True))
+        self._fallback = re.compile(
+            rf"^(?P<indent>[ \t]*)(?:from\s+(?P<from>{names})(?P<sub>(?:\.\w+)*)\s+(?:from\s+[\w.]+\s+)?import\b"
+            rf"|import\s+(?P<imp>{names})\b(?!\.))",
+            re.MULTILINE,
+        ) if names else None
+
+    def _map(self, module):
+        head, _, rest = module.partition(".")
+        if head not in self.module_map:
+            return None
+        return self.module_map[head] + (f".{rest}" if rest else "")
+
+    def _rewrite_node(self, node):
+        """Return replacement source for an import node, or None if unchanged."""
+        if isinstance(node, ast.ImportFrom):
+            if node.level or not node.module:
+                return None
+            target = self._map(node.module)
+            if not target:
+                return None
+            names = ", ".join(a.name + (f" as {a.asname}" if a.asname else "") for a in node.names)
+            return [f"from {target} import {names}"]
+
+        statements, plain = [], []
+        for alias in node.names:
+            target = self._map(alias.name)
+            if target and "." not in alias.name:
+                parent, _, leaf = target.rpartition(".")
+                asname = f" as {alias.asname}" if alias.asname and alias.asname != leaf else ""
+                statements.append(f"from {parent} import {leaf}{asname}")
+            elif target and alias.asname:
+                statements.append(f"import {target} as {alias.asname}")
+            elif target:
+                # "import app.views" binds "app": import the submodule, then bind the package name
+                head = alias.name.split(".")[0]
+                parent, _, leaf = self.module_map[head].rpartition(".")
+                statements.extend([f"import {target}", f"from {parent} import {leaf}"])
+            else:
+                plain.append(alias.name + (f" as {alias.asname}" if alias.asname else ""))
+        if not statements:
+            return None
+        if plain:
+            statements.insert(0, "import " + ", ".join(plain))
+        return statements
+
+    def _fallback_sub(self, match):
+        indent = match.group("indent")
+        if match.group("from"):
+            return f"{indent}from {self._map(match.group('from') + match.group('sub'))} import"
+        parent, _, leaf = self.module_map[match.group("imp")].rpartition(".")
+        return f"{indent}from {parent} import {leaf}"
+
+    def rewrite(self, code):
+        if not self.module_map:
+            return code
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return self._fallback.sub(self._fallback_sub, code)
+
+        lines = code.split("\n")
+        edits = []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                replacement = self._rewrite_node(node)
+                if replacement:
+                    edits.append((node, replacement))
+
+        # Apply bottom-up so earlier positions stay valid
+        for node, replacement in sorted(edits, key=lambda e: (e[0].lineno, e[0].col_offset), reverse=True):
+            first, last = node.lineno - 1, node.end_lineno - 1
+            prefix = lines[first][:node.col_offset]
+            suffix = lines[last][node.end_col_offset:]
+            if not prefix.strip():
+                text = ("\n" + prefix).join(replacement)
+            else:
+                # Statement follows other code on the line (e.g. after ";"): keep it on one line
+                text = "; ".join(replacement)
+            lines[first:last + 1] = (prefix + text + suffix).split("\n")
+        return "\n".join(lines)
+
 
 class TesterAgent:
     def __init__(self, project_dir: str, tests_dir: str, requirements_file: str = None):
@@ -89,12 +202,165 @@ def home():
             )
             print(f"Created {models_file}")
 
-    def build_index(self):
-        docs = SimpleDirectoryReader(self.project_dir, recursive=True).load_data()
-        return VectorStoreIndex.from_documents(docs)
+    def build_index(self, selective=True):
+        if not selective:
+            docs = SimpleDirectoryReader(self.project_dir, recursive=True).load_data()
+            return VectorStoreIndex.from_documents(docs)
+        return self.build_index_selective()
+
+    # -------------------------------
+    # Selective, cached indexing
+    # -------------------------------
+    def iter_index_files(self):
+        """Yield (relative posix path, Path) for files that pass the include/exclude globs and size cap."""
+        tests_rel = None
+        if self.tests_dir.is_relative_to(self.project_dir):
+            tests_rel = self.tests_dir.relative_to(self.project_dir).as_posix()
+
+        for dirpath, dirnames, filenames in os.walk(self.project_dir):
+            rel_dir = Path(dirpath).relative_to(self.project_dir).as_posix()
+            # Prune excluded directories (venvs, node_modules, generated tests, ...)
+            kept = []
+            for d in dirnames:
+                rel = f"{d}/" if rel_dir == "." else f"{rel_dir}/{d}/"
+                if rel.rstrip("/") == tests_rel or any(fnmatch.fnmatch(rel, g) for g in INDEX_EXCLUDE):
+                    continue
+                kept.append(d)
+            dirnames[:] = kept
+
+            for filename in filenames:
+                rel = filename if rel_dir == "." else f"{rel_dir}/{filename}"
+                if not any(fnmatch.fnmatch(filename, g) for g in INDEX_INCLUDE):
+                    continue
+                if any(fnmatch.fnmatch(rel, g) for g in INDEX_EXCLUDE):
+                    continue
+                path = Path(dirpath) / filename
+                if path.stat().st_size > INDEX_MAX_FILE_BYTES:
+                    print(f"Skipping {rel}: larger than {INDEX_MAX_FILE_BYTES} bytes")
+                    continue
+                yield rel, path
+
+    @staticmethod
+    def split_lines(text, max_chars=INDEX_MAX_CHUNK_CHARS, overlap=INDEX_CHUNK_OVERLAP_LINES):
+        """Split text into pieces of at most max_chars on line boundaries, repeating 'overlap' lines."""
+        if len(text) <= max_chars:
+            return [text]
+        pieces, current, size = [], [], 0
+        for line in text.splitlines():
+            line = line[:max_chars]
+            if current and size + len(line) + 1 > max_chars:
+                pieces.append("\n".join(current))
+                current = current[-overlap:] if overlap else []
+                while current and sum(len(l) + 1 for l in current) + len(line) + 1 > max_chars:
+                    current.pop(0)
+                size = sum(len(l) + 1 for l in current)
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            pieces.append("\n".join(current))
+        return pieces
+
+    @classmethod
+    def chunk_python(cls, text, max_chars=INDEX_MAX_CHUNK_CHARS):
+        """
+        Split Python source into one chunk per top-level function/class, plus module-level code.
+        Oversized classes are split per method (each prefixed with the class line), and any chunk
+        still above max_chars is split by lines with overlap.
+        """
+        try:
+            tree = ast.parse(text)
+        except SyntaxError:
+            return None
+        lines = text.splitlines()
+
+        def source(node):
+            start = min([d.lineno for d in node.decorator_list] + [node.lineno]) - 1
+            return start, "\n".join(lines[start:node.end_lineno])
+
+        chunks, covered = [], set()
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start, code = source(node)
+                covered.update(range(start, node.end_lineno))
+                if len(code) <= max_chars or not isinstance(node, ast.ClassDef):
+                    chunks.append(code)
+                    continue
+                header, class_lines = lines[node.lineno - 1], set()
+                for member in node.body:
+                    if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        member_start, member_code = source(member)
+                        class_lines.update(range(member_start, member.end_lineno))
+                        chunks.append(f"{header}\n{member_code}")
+                rest = "\n".join(lines[i] for i in range(start, node.end_lineno) if i not in class_lines)
+                chunks.append(rest)
+        module_code = "\n".join(line for i, line in enumerate(lines) if i not in covered).strip()
+        if module_code:
+            chunks.insert(0, module_code)
+        return [piece for chunk in chunks for piece in cls.split_lines(chunk, max_chars)]
+
+    def chunk_file(self, rel, text):
+        """Language-aware chunking: AST-based for Python, sentence splitting otherwise."""
+        chunks = self.chunk_python(text) if rel.endswith(".py") else None
+        if chunks is None:
+            chunks = [n.get_content() for n in SentenceSplitter().get_nodes_from_documents([Document(text=text)])]
+            chunks = [piece for chunk in chunks for piece in self.split_lines(chunk)]
+        return [c for c in chunks if c.strip()]
+
+    def build_index_selective(self, cache_file=INDEX_CACHE_FILE):
+        """
+        Index only matching project files, chunked by function/class.
+        Embeddings are cached per file hash, so unchanged files are never re-embedded.
+        The cache records the embedding model and dimension and is discarded when either changes.
+        """
+        cache_path = self.project_dir / cache_file
+        try:
+            cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cache = {}
+
+        embed_model = Settings.embed_model
+        model_name = ":".join(str(part) for part in (type(embed_model).__name__, getattr(embed_model, "model_name", ""),
+                                                      getattr(embed_model, "dimensions", None) or ""))
+        dimension = cache.get("dimension")
+        if cache.get("model") != model_name or not dimension:
+            print(f"Embedding cache reset for {model_name}.")
+            cache, dimension = {}, None
+        cache = cache.get("files", {})
+
+        nodes, new_cache, reused, embedded = [], {}, 0, 0
+        for rel, path in self.iter_index_files():
+            raw = path.read_bytes()
+            digest = hashlib.sha256(raw).hexdigest()
+            entry = cache.get(rel)
+            if not entry or entry["hash"] != digest:
+                text = raw.decode("utf-8", errors="ignore")
+                chunks = self.chunk_file(rel, text)
+                vectors = embed_model.get_text_embedding_batch(chunks) if chunks else []
+                entry = {"hash": digest, "chunks": [{"text": c, "embedding": v} for c, v in zip(chunks, vectors)]}
+                embedded += 1
+                if vectors and dimension is None:
+                    dimension = len(vectors[0])
+                elif vectors and len(vectors[0]) != dimension:
+                    # Same model name, different vector size: nothing cached is usable
+                    print(f"Embedding dimension changed from {dimension} to {len(vectors[0])}; rebuilding.")
+                    cache_path.unlink(missing_ok=True)
+                    return self.build_index_selective(cache_file)
+            else:
+                reused += 1
+            new_cache[rel] = entry
+            for chunk in entry["chunks"]:
+                nodes.append(TextNode(text=chunk["text"], embedding=chunk["embedding"], metadata={"file_path": rel}))
+
+        cache_path.write_text(json.dumps({"model": model_name, "dimension": dimension, "files": new_cache}),
+                              encoding="utf-8")
+        telemetry.record_cache("embedding_cache", hits=reused, misses=embedded, stage="tester_agent")
+        print(f"Indexed {len(new_cache)} files ({embedded} embedded, {reused} from cache), {len(nodes)} chunks.")
+        return VectorStoreIndex(nodes)
 
     def generate_tests(self, index, language="python", framework="flask"):
-        llm = OpenAI(model="gpt-4o-mini")
+        llm = get_llm(model="gpt-4o-mini")
+        configure(llm)
+        telemetry.install("tester_agent", llm)
         query_engine = index.as_query_engine(llm=llm)
 
         test_prompt = f"""
@@ -115,62 +381,95 @@ def home():
         return response.response
 
 
-    def save_tests_from_llm(self, output: str):
+    def build_module_map(self):
         """
-        Parse markdown code blocks from LLM output and save them as files.
-        Auto-fixes broken imports for backend modules.
+        Map bare module names the LLM tends to use (e.g. "app", "models") to their
+        real dotted path in the project (e.g. "backend.app"), derived from the package layout.
+        Names that exist at the project root, are ambiguous, or shadow a stdlib or installed
+        module (e.g. "types", "requests") are left alone.
         """
-        self.tests_dir.mkdir(parents=True, exist_ok=True)
-
-        lines = output.split("\n")
-        current_file = None
-        buffer = []
-
-        for line in lines:
+        root_modules, candidates = set(), {}
+        for rel, _ in self.iter_index_files():
+            if not rel.endswith(".py"):
+                continue
+            parts = rel[:-3].split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            if not parts:
+                continue
+            if len(parts) == 1:
+                root_modules.add(parts[0])
+            else:
+                candidates.setdefault(parts[-1], set()).add(".".join(parts))
+        return {name: next(iter(paths)) for name, paths in candidates.items()
+                if len(paths) == 1 and name not in root_modules and not self._is_external_module(name)}
+
+    def _is_external_module(self, name):
+        """True for stdlib modules and modules importable from outside the project."""
+        if name in getattr(sys, "stdlib_module_names", sys.builtin_module_names):
+            return True
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            return False
+        if spec is None:
+            return False
+        locations = [spec.origin] if spec.origin and spec.has_location else list(spec.submodule_search_locations or [])
+        if not locations:
+            return True     # built-in or frozen
+        root = os.path.normcase(os.path.abspath(self.project_dir))
+        for location in locations:
+            location = os.path.normcase(os.path.abspath(location))
+            if location != root and not location.startswith(root + os.sep):
+                return True
+        return False
+
+    @staticmethod
+    def parse_code_blocks(output: str):
+        """Split LLM output into [(relative path, code)] from ```lang path fences."""
+        blocks, current_file, buffer = [], None, []
+        for line in output.split("\n"):
             if line.strip().startswith("```"):
                 if current_file:  # End of code block
-                    filepath = self.tests_dir / current_file
-                    filepath.parent.mkdir(parents=True, exist_ok=True)
-
-                    fixed_code = "\n".join(buffer)
-
-                    # --- AUTO-FIX imports with regex ---
-                    fixes = [
-                        # fix "from app import ..." → "from backend.app import ..." 
-                        (r"\bfrom\s+app\s+import", "from backend.app import"),
-                        # fix "import app" → "from backend import app"
-                        (r"^import\s+app\b", "from backend import app"),
-                        # fix "from models import ..." → "from backend.models import ..."
-                        (r"\bfrom\s+models\s+import", "from backend.models import"),
-                        # fix "import models" → "from backend import models"
-                        (r"^import\s+models\b", "from bacend import models"),
-                        # catch weird "from app from backend import"
-                        (r"from app from backend", "from backend.app"),
-                        (r"\bfrom\s+config\s+import", "from backend.config import"),
-                        (r"^import\s+config\b", "from backend import config"),
-                    ]
-                    for pattern, repl in fixes:
-                        fixed_code = re.sub(pattern, repl, fixed_code, flags=re.MULTILINE)
-
-                    filepath.write_text(fixed_code, encoding="utf-8")
-                    print(f" Wrote {filepath}")
-
-                    # Reset
+                    blocks.append((current_file, "\n".join(buffer)))
                     current_file, buffer = None, []
                 else:
                     parts = line.strip().split(" ", 1)
                     if len(parts) > 1:
-                        current_file = parts[1]
-            else:
-                if current_file:
-                    buffer.append(line)
+                        current_file = parts[1].strip()
+            elif current_file:
+                buffer.append(line)
+        return blocks
+
+    def save_tests_from_llm(self, output: str):
+        """
+        Parse markdown code blocks from LLM output and save them as files.
+        Auto-fixes broken imports using the project's actual package layout.
+        """
+        self.tests_dir.mkdir(parents=True, exist_ok=True)
+        rewriter = ImportRewriter(self.build_module_map())
+
+        def write_block(block):
+            current_file, code = block
+            filepath = self.tests_dir / current_file
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            filepath.write_text(rewriter.rewrite(code), encoding="utf-8")
+            return filepath
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for filepath in pool.map(write_block, self.parse_code_blocks(output)):
+                print(f" Wrote {filepath}")
 
     def run(self):
+        configure()
+        telemetry.install("tester_agent")
+
         # Step 0: Ensure backend files exist
         self.ensure_backend_files()
 
         # Step 1: Build index and generate tests
-        index = self.build_index()
+        with telemetry.span("index_build", stage="tester_agent"):
+            index = self.build_index()
         print("Loaded requirements and project files. Querying LlamaIndex...")
         output = self.generate_tests(index)
 
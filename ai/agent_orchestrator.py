@@ -1,24 +1,32 @@
 import subprocess
 import sys
 import os
+import telemetry
+
+# Agent scripts live next to this file; the pipeline works in the current directory
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def agent_script(name):
+    return os.path.join(AGENT_DIR, name)
 
 def run_requirement_agent(jira_issue_id):
     print("Running Requirement Agent...")
     result = subprocess.run(
-        [sys.executable, "01_requirement_agent.py", jira_issue_id],
+        [sys.executable, agent_script("01_requirement_agent.py"), jira_issue_id],
         capture_output=True, text=True
     )
     if result.returncode != 0:
         print("Requirement Agent failed:", result.stderr)
         sys.exit(1)
     print("Requirement Agent completed.")
-    # BRD.pdf should be generated in current directory
-    return "BRD.pdf"
+    # BRD.json (consumed by the builder) is generated in current directory;
+    # BRD.pdf is rendered in the background for humans
+    return "BRD.json"
 
 def run_builder_agent():
     print("Running Builder Agent...")
     result = subprocess.run(
-        [sys.executable, "02_builder_agent.py"],
+        [sys.executable, agent_script("02_builder_agent.py")],
         capture_output=True, text=True
     )
     if result.returncode != 0:
@@ -34,13 +42,14 @@ def run_venv_creation(venv_name, venv_dir, req_json):
     # Import your 03_venv_creation as module if structured so; else subprocess alternative
     from importlib import import_module
     venv_module = import_module("03_venv_creation")
-    msg = venv_module.setup_virtualenv_and_install(venv_name, venv_dir, req_json)
-    print(msg)
+    # Single-resolve install with shared wheel cache and base venv reuse
+    result = venv_module.setup_virtualenv_fast(venv_name, venv_dir, req_json)
+    print(f"Virtual environment ready at '{result['venv']}' in {result['install_seconds']}s.")
 
 def run_coder_agent():
     print("Running Coder Agent...")
     result = subprocess.run(
-        [sys.executable, "04_coder_agent.py"],
+        [sys.executable, agent_script("04_coder_agent.py")],
         capture_output=True, text=True
     )
     if result.returncode != 0:
@@ -52,7 +61,7 @@ def run_coder_agent():
 def run_tester_agent():
     print("Running Tester Agent to generate tests...")
     result = subprocess.run(
-        [sys.executable, "06_tester_agent.py"],
+        [sys.executable, agent_script("06_tester_agent.py")],
         capture_output=True, text=True
     )
     if result.returncode != 0:
@@ -64,7 +73,7 @@ def run_tester_agent():
 def run_test_executor():
     print("Running Test Executor Agent...")
     result = subprocess.run(
-        [sys.executable, "05_test_executor.py"],
+        [sys.executable, agent_script("05_test_executor.py")],
         capture_output=True, text=True
     )
     if result.returncode != 0:
@@ -73,24 +82,33 @@ def run_test_executor():
     print("Test Executor completed.")
 
 def main():
-    # Replace this with actual Jira Issue ID or CLI argument
-    jira_issue_id = "Neev-307"
+    jira_issue_id = sys.argv[1] if len(sys.argv) > 1 else "Neev-307"
+
+    # Shared by all agent subprocesses so their metrics group under one run
+    run_id = telemetry.run_id()
 
-    brd_pdf = run_requirement_agent(jira_issue_id)
-    requirement_json, requirements_pkgs_json = run_builder_agent()
+    with telemetry.span("stage", stage="requirement_agent"):
+        brd_json = run_requirement_agent(jira_issue_id)
+    with telemetry.span("stage", stage="builder_agent"):
+        requirement_json, requirements_pkgs_json = run_builder_agent()
 
     # Define virtualenv name and dir
     venv_name = "venv"
     venv_dir = os.getcwd()
 
     # Setup virtual env and install dependencies using the JSON generated
-    run_venv_creation(venv_name, venv_dir, requirements_pkgs_json)
+    with telemetry.span("stage", stage="venv_creation"):
+        run_venv_creation(venv_name, venv_dir, requirements_pkgs_json)
 
-    run_coder_agent()
-    run_tester_agent()
-    run_test_executor()
+    with telemetry.span("stage", stage="coder_agent"):
+        run_coder_agent()
+    with telemetry.span("stage", stage="tester_agent"):
+        run_tester_agent()
+    with telemetry.span("stage", stage="test_executor"):
+        run_test_executor()
 
-    print("All agents ran successfully.")
+    print(f"All agents ran successfully. Metrics for run {run_id} in {telemetry.METRICS_FILE} "
+          f"(python telemetry.py report).")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,320 @@
+"""
+LLM / embedding factory for the kriya agents.
+
+KRIYA_LLM_PROVIDER=openai (default) returns the real llama_index OpenAI LLM.
+KRIYA_LLM_PROVIDER=mock returns an in-process fake with configurable latency,
+token counts and canned structured outputs, so the pipeline can be load-tested
+and profiled without a live endpoint:
+
+    KRIYA_MOCK_LATENCY     seconds added to every call (default 0.05)
+    KRIYA_MOCK_TPS         simulated output tokens per second (default 200, 0 = instant)
+    KRIYA_MOCK_EMBED_LATENCY  seconds per embedding batch (default 0.01)
+    KRIYA_MOCK_RESPONSES   JSON file of [{"match": "<prompt substring>", "response": "..."}]
+                           checked before the built-in responses
+"""
+import os
+import json
+import time
+import asyncio
+from typing import Any, List
+
+PROVIDER = os.getenv("KRIYA_LLM_PROVIDER", "openai").lower()
+MOCK_LATENCY = float(os.getenv("KRIYA_MOCK_LATENCY", "0.05"))
+MOCK_TPS = float(os.getenv("KRIYA_MOCK_TPS", "200"))
+MOCK_EMBED_LATENCY = float(os.getenv("KRIYA_MOCK_EMBED_LATENCY", "0.01"))
+MOCK_EMBED_DIM = 256
+
+
+def is_mock():
+    return PROVIDER == "mock"
+
+
+# -------------------------------
+# Canned responses (first matching prompt substring wins)
+# -------------------------------
+MOCK_DEPENDENCIES = {"flask": "3.0.3", "pytest": "8.2.0"}
+
+DEFAULT_RESPONSES = [
+    ("Extract the Business Benefit", json.dumps({
+        "business_benefit": "Faster identification of partner payment issues.",
+        "objective": "Validate partner transactions against the partner master.",
+        "description": "Service that ingests POS files and flags unmapped partners.",
+        "scope": "POS and INV files for APJ partners.",
+        "assumptions": "Partner master is refreshed daily.",
+        "constraints": "Must comply with audit guidelines.",
+    })),
+    ("Extract the following sections", json.dumps({
+        "Business Benefit": "Faster identification of partner payment issues.",
+        "Objective": "Validate partner transactions against the partner master.",
+        "Description": "Service that ingests POS files and flags unmapped partners.",
+        "Scope": "POS and INV files for APJ partners.",
+        "Assumptions": "Partner master is refreshed daily.",
+        "Constraints": "Must comply with audit guidelines.",
+    })),
+    ("produce ONE JSON object with exactly two keys", json.dumps({
+        "requirement": {
+            "language": "python",
+            "framework": "flask",
+            "functional_requirements": [
+                {"id": f"FR{i}", "user_story": f"As an analyst I want capability {i} so that payments are correct."}
+                for i in range(1, 6)
+            ],
+            "non_functional_requirements": [
+                {"id": "NFR1", "user_story": "As an auditor I want every validation logged.", "scope": "All files"}
+            ],
+        },
+        "requirements_pkgs": {"dependencies": MOCK_DEPENDENCIES},
+    })),
+    ("List every file needed", json.dumps([
+        {"path": "backend/__init__.py", "purpose": "package marker"},
+        {"path": "backend/app.py", "purpose": "Flask app"},
+        {"path": "backend/models.py", "purpose": "data models"},
+    ])),
+    ("Write the complete contents of", "```python\n# generated by mock LLM\n```"),
+    ("generate a COMPLETE project codebase", "\n".join([
+        "project/",
+        "```python backend/__init__.py",
+        "```",
+        "```python backend/app.py",
+        "from flask import Flask",
+        "",
+        "app = Flask(__name__)",
+        "",
+        "@app.route(\"/\")",
+        "def home():",
+        "    return \"ok\"",
+        "```",
+        "```python backend/models.py",
+        "class Partner:",
+        "    def __init__(self, code):",
+        "        self.code = code",
+        "```",
+    ])),
+    ("Generate automated test cases", "\n".join([
+        "```python test_models.py",
+        "from models import Partner",
+        "",
+        "def test_partner_code():",
+        "    assert Partner(\"2-SIWB-20652\").code == \"2-SIWB-20652\"",
+        "```",
+    ])),
+    ("Summarize this pytest report", "All generated tests ran; see the digest for failures."),
+]
+
+
+def load_responses():
+    responses = []
+    custom_file = os.getenv("KRIYA_MOCK_RESPONSES")
+    if custom_file:
+        with open(custom_file, "r", encoding="utf-8") as f:
+            responses += [(r["match"], r["response"]) for r in json.load(f)]
+    return responses + DEFAULT_RESPONSES
+
+
+def approx_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _build_mock_classes():
+    """Defined lazily so importing this module does not require llama_index."""
+    from llama_index.core.base.llms.types import (
+        ChatMessage, ChatResponse, CompletionResponse, LLMMetadata, MessageRole,
+    )
+    from llama_index.core.embeddings import MockEmbedding
+    from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+    from llama_index.core.llms.function_calling import FunctionCallingLLM
+    from llama_index.core.llms.llm import ToolSelection
+
+    class MockLLM(FunctionCallingLLM):
+        """Offline stand-in for OpenAI: canned outputs, simulated latency and usage."""
+
+        model: str = "mock-gpt-4o-mini"
+        latency: float = MOCK_LATENCY
+        tokens_per_second: float = MOCK_TPS
+        responses: List[Any] = []
+        chunk_chars: int = 16
+
+        @classmethod
+        def class_name(cls):
+            return "MockLLM"
+
+        @property
+        def metadata(self):
+            return LLMMetadata(model_name=self.model, is_chat_model=True, is_function_calling_model=True,
+                               context_window=128000, num_output=4096)
+
+        def _respond(self, prompt):
+            for match, response in self.responses or load_responses():
+                if match in prompt:
+                    return response
+            return "{}"
+
+        def _usage(self, prompt, text):
+            return {"usage": {"prompt_tokens": approx_tokens(prompt), "completion_tokens": approx_tokens(text)}}
+
+        def _delay(self, text):
+            return self.latency + (approx_tokens(text) / self.tokens_per_second if self.tokens_per_second else 0)
+
+        @staticmethod
+        def _prompt_of(messages):
+            return "\n".join(str(m.content or "") for m in messages)
+
+        def _tool_calls(self, text, tools):
+            """Turn a canned JSON answer into a call of the tool whose schema it matches (structured output)."""
+            if not tools:
+                return []
+            try:
+                args = json.loads(text)
+            except ValueError:
+                return []
+            if not isinstance(args, dict):
+                return []
+            for tool in tools:
+                schema = tool.metadata.fn_schema
+                fields = set(getattr(schema, "model_fields", {}) or {})
+                if fields and set(args) & fields:
+                    return [ToolSelection(tool_id=f"call_{tool.metadata.name}", tool_name=tool.metadata.name,
+                                          tool_kwargs=args)]
+            return []
+
+        def _chat_response(self, messages, tools):
+            prompt = self._prompt_of(messages)
+            text = self._respond(prompt)
+            tool_calls = self._tool_calls(text, tools)
+            message = ChatMessage(role=MessageRole.ASSISTANT, content="" if tool_calls else text,
+                                  additional_kwargs={"tool_calls": tool_calls})
+            return ChatResponse(message=message, raw=self._usage(prompt, text)), text
+
+        # --- sync ---
+        @llm_chat_callback()
+        def chat(self, messages, **kwargs):
+            response, text = self._chat_response(messages, kwargs.get("tools"))
+            time.sleep(self._delay(text))
+            return response
+
+        @llm_completion_callback()
+        def complete(self, prompt, formatted=False, **kwargs):
+            text = self._respond(prompt)
+            time.sleep(self._delay(text))
+            return CompletionResponse(text=text, raw=self._usage(prompt, text))
+
+        def _chat_chunks(self, messages, tools):
+            response, text = self._chat_response(messages, tools)
+            content = response.message.content or ""
+            pause = self._delay(text) / max(1, len(content) // self.chunk_chars + 1)
+            acc = ""
+            for i in range(0, max(1, len(content)), self.chunk_chars):
+                time.sleep(pause)
+                delta = content[i:i + self.chunk_chars]
+                acc += delta
+                message = ChatMessage(role=MessageRole.ASSISTANT, content=acc,
+                                      additional_kwargs=response.message.additional_kwargs)
+                yield ChatResponse(message=message, delta=delta, raw=response.raw)
+
+        def _completion_chunks(self, prompt):
+            text = self._respond(prompt)
+            pause = self._delay(text) / max(1, len(text) // self.chunk_chars + 1)
+            raw = self._usage(prompt, text)
+            acc = ""
+            for i in range(0, max(1, len(text)), self.chunk_chars):
+                time.sleep(pause)
+                delta = text[i:i + self.chunk_chars]
+                acc += delta
+                yield CompletionResponse(text=acc, delta=delta, raw=raw)
+
+        @llm_chat_callback()
+        def stream_chat(self, messages, **kwargs):
+            return self._chat_chunks(messages, kwargs.get("tools"))
+
+        @llm_completion_callback()
+        def stream_complete(self, prompt, formatted=False, **kwargs):
+            return self._completion_chunks(prompt)
+
+        # --- async ---
+        @llm_chat_callback()
+        async def achat(self, messages, **kwargs):
+            response, text = self._chat_response(messages, kwargs.get("tools"))
+            await asyncio.sleep(self._delay(text))
+            return response
+
+        @llm_completion_callback()
+        async def acomplete(self, prompt, formatted=False, **kwargs):
+            text = self._respond(prompt)
+            await asyncio.sleep(self._delay(text))
+            return CompletionResponse(text=text, raw=self._usage(prompt, text))
+
+        @llm_chat_callback()
+        async def astream_chat(self, messages, **kwargs):
+            async def gen():
+                for chunk in self._chat_chunks(messages, kwargs.get("tools")):
+                    yield chunk
+            return gen()
+
+        @llm_completion_callback()
+        async def astream_complete(self, prompt, formatted=False, **kwargs):
+            async def gen():
+                for chunk in self._completion_chunks(prompt):
+                    yield chunk
+            return gen()
+
+        # --- function calling ---
+        def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None, verbose=False,
+                                     allow_parallel_tool_calls=False, tool_required=False, **kwargs):
+            messages = list(chat_history or [])
+            if user_msg:
+                messages.append(ChatMessage(role=MessageRole.USER, content=user_msg)
+                                if isinstance(user_msg, str) else user_msg)
+            return {"messages": messages, "tools": tools, **kwargs}
+
+        def get_tool_calls_from_response(self, response, error_on_no_tool_call=True, **kwargs):
+            tool_calls = response.message.additional_kwargs.get("tool_calls", [])
+            if not tool_calls and error_on_no_tool_call:
+                raise ValueError("Expected at least one tool call, but got 0 tool calls.")
+            return tool_calls
+
+    class MockLatencyEmbedding(MockEmbedding):
+        """MockEmbedding with a fixed delay per embedding batch / query."""
+
+        latency: float = MOCK_EMBED_LATENCY
+
+        def _get_query_embedding(self, query):
+            time.sleep(self.latency)
+            return self._get_vector()
+
+        def _get_text_embeddings(self, texts):
+            time.sleep(self.latency)
+            return [self._get_vector() for _ in texts]
+
+    return MockLLM, MockLatencyEmbedding
+
+
+_mock_classes = None
+
+
+def _mock():
+    global _mock_classes
+    if _mock_classes is None:
+        _mock_classes = _build_mock_classes()
+    return _mock_classes
+
+
+def get_llm(model="gpt-4o-mini", **kwargs):
+    """LLM for an agent: the configured provider's model, or the offline mock."""
+    if is_mock():
+        mock_llm, _ = _mock()
+        return mock_llm()
+    from llama_index.llms.openai import OpenAI
+    return OpenAI(model=model, **kwargs)
+
+
+def configure(llm=None):
+    """
+    Point llama_index's global Settings at the mock LLM/embedding model when the
+    mock provider is selected (query engines and indexes fall back to Settings).
+    """
+    if not is_mock():
+        return
+    from llama_index.core import Settings
+    mock_llm, mock_embedding = _mock()
+    Settings.llm = llm or mock_llm()
+    Settings.embed_model = mock_embedding(embed_dim=MOCK_EMBED_DIM)
@@ -0,0 +1,57 @@
+"""
+Offline stand-in for a package index.
+
+Builds a directory of minimal pure-python wheels for a requirements_pkgs.json
+so 03_venv_creation can be exercised with '--no-index --find-links <dir>'
+without network access.
+"""
+import os
+import sys
+import json
+import base64
+import hashlib
+import zipfile
+
+def _normalize(name):
+    return name.replace("-", "_").replace(".", "_").lower()
+
+def _record_line(arcname, data):
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode("ascii")
+    return f"{arcname},sha256={digest},{len(data)}"
+
+def build_stub_wheel(index_dir, name, version):
+    """Write '<name>-<version>-py3-none-any.whl' containing an importable stub module."""
+    dist = _normalize(name)
+    dist_info = f"{dist}-{version}.dist-info"
+    files = {
+        f"{dist}/__init__.py": f'__version__ = "{version}"\n'.encode("utf-8"),
+        f"{dist_info}/METADATA": (
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+        ).encode("utf-8"),
+        f"{dist_info}/WHEEL": (
+            "Wheel-Version: 1.0\nGenerator: kriya-local-index\nRoot-Is-Purelib: true\nTag: py3-none-any\n"
+        ).encode("utf-8"),
+    }
+    record = [_record_line(arc, data) for arc, data in files.items()]
+    record.append(f"{dist_info}/RECORD,,")
+
+    wheel_path = os.path.join(index_dir, f"{dist}-{version}-py3-none-any.whl")
+    with zipfile.ZipFile(wheel_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for arcname, data in files.items():
+            zf.writestr(arcname, data)
+        zf.writestr(f"{dist_info}/RECORD", "\n".join(record) + "\n")
+    return wheel_path
+
+def build_local_index(json_req_file, index_dir="local_index"):
+    """Create stub wheels for every dependency in a requirements_pkgs.json file."""
+    with open(json_req_file, "r", encoding="utf-8") as f:
+        deps = json.load(f).get("dependencies", {})
+    os.makedirs(index_dir, exist_ok=True)
+    wheels = [build_stub_wheel(index_dir, pkg, str(ver).lstrip("^~<>= ")) for pkg, ver in deps.items()]
+    print(f"[INFO] Local package index with {len(wheels)} wheels at {os.path.abspath(index_dir)}")
+    return index_dir
+
+if __name__ == "__main__":
+    req_file = sys.argv[1] if len(sys.argv) > 1 else "requirements_pkgs.json"
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else "local_index"
+    build_local_index(req_file, out_dir)
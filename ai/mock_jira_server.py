@@ -0,0 +1,89 @@
+"""
+Local mock Jira server for exercising 01_requirement_agent without a real Jira.
+
+Serves /rest/api/2/issue/<key> and /rest/api/2/search with generated issues,
+optional latency and an optional rate of 503 responses to exercise retries.
+
+    python mock_jira_server.py [port] [--latency 0.2] [--fail-rate 0.1]
+    JIRA_URL=http://127.0.0.1:8085 python 01_requirement_agent.py --batch issues.txt
+"""
+import sys
+import json
+import time
+import random
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8085
+
+
+def make_issue(key):
+    return {
+        "key": key,
+        "fields": {
+            "summary": f"Partner compensation report for {key}",
+            "description": (
+                f"As a PC analyst I want transactions for {key} validated against the partner master "
+                "so that payment issues are found before month end. Scope: POS and INV files. "
+                "Assumes partner master is refreshed daily. Constraint: must comply with audit guidelines."
+            ),
+        },
+    }
+
+
+class MockJiraHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+    issue_keys = [f"MOCK-{i}" for i in range(1, 51)]
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 503:
+            self.send_header("Retry-After", "0.1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            return self._send(503, {"errorMessages": ["Service temporarily unavailable"]})
+
+        url = urlparse(self.path)
+        if url.path.startswith("/rest/api/2/issue/"):
+            return self._send(200, make_issue(url.path.rsplit("/", 1)[-1]))
+        if url.path == "/rest/api/2/search":
+            params = parse_qs(url.query)
+            start = int(params.get("startAt", ["0"])[0])
+            size = int(params.get("maxResults", ["50"])[0])
+            page = self.issue_keys[start:start + size]
+            return self._send(200, {"startAt": start, "total": len(self.issue_keys),
+                                    "issues": [{"key": k} for k in page]})
+        self._send(404, {"errorMessages": [f"Not found: {url.path}"]})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_jira(port=DEFAULT_PORT, latency=0.0, fail_rate=0.0):
+    """Start the server in a daemon thread and return it (call .shutdown() to stop)."""
+    MockJiraHandler.latency = latency
+    MockJiraHandler.fail_rate = fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockJiraHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    port = int(args[0]) if args and not args[0].startswith("--") else DEFAULT_PORT
+    latency = float(args[args.index("--latency") + 1]) if "--latency" in args else 0.0
+    fail_rate = float(args[args.index("--fail-rate") + 1]) if "--fail-rate" in args else 0.0
+    MockJiraHandler.latency = latency
+    MockJiraHandler.fail_rate = fail_rate
+    print(f"Mock Jira listening on http://127.0.0.1:{port}")
+    ThreadingHTTPServer(("127.0.0.1", port), MockJiraHandler).serve_forever()
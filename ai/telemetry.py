@@ -0,0 +1,239 @@
+"""
+Per-stage latency, token, cost and cache telemetry for the kriya agent pipeline.
+
+Agents call install("<stage>") once to attach a callback handler to the
+llama_index LLM/embedding objects; the orchestrator wraps each stage in span().
+Every measurement is appended as one JSON line to KRIYA_METRICS_FILE.
+
+Report across runs:
+    python telemetry.py report [metrics_file]
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+
+METRICS_FILE = os.getenv("KRIYA_METRICS_FILE", "kriya_metrics.jsonl")
+
+# USD per 1K tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "text-embedding-ada-002": (0.0001, 0.0),
+    "text-embedding-3-small": (0.00002, 0.0),
+    "text-embedding-3-large": (0.00013, 0.0),
+}
+
+_lock = threading.Lock()
+_stage = os.getenv("KRIYA_STAGE", "unknown")
+_handler = None
+
+
+def run_id():
+    """Id shared by the orchestrator and every agent subprocess of one pipeline run."""
+    if "KRIYA_RUN_ID" not in os.environ:
+        os.environ["KRIYA_RUN_ID"] = uuid.uuid4().hex[:12]
+    return os.environ["KRIYA_RUN_ID"]
+
+
+def record(kind, **fields):
+    """Append one metric event as a JSON line."""
+    event = {"ts": time.time(), "run_id": run_id(), "stage": fields.pop("stage", _stage), "kind": kind}
+    event.update(fields)
+    line = json.dumps(event, default=str)
+    with _lock:
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(name, stage=None, **attrs):
+    """Time a block of work; records status=error if it raises (including sys.exit)."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record("span", stage=stage or _stage, name=name, status=status,
+               latency_ms=round((time.perf_counter() - start) * 1000, 2), **attrs)
+
+
+def record_cache(name, hits, misses, stage=None):
+    record("cache", stage=stage or _stage, name=name, hits=hits, misses=misses)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return round(prompt_tokens / 1000 * price_in + completion_tokens / 1000 * price_out, 6)
+
+
+# -------------------------------
+# llama_index callback handler
+# -------------------------------
+def _usage_from(response):
+    """Extract (prompt_tokens, completion_tokens) from a llama_index LLM response."""
+    raw = getattr(response, "raw", None)
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is None:
+        kwargs = getattr(response, "additional_kwargs", {}) or {}
+        return kwargs.get("prompt_tokens", 0), kwargs.get("completion_tokens", 0)
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+def install(stage, *components):
+    """
+    Register the telemetry callback handler for this process (safe to call again).
+    LLM and embedding objects keep their own callback managers, so pass the
+    ones the agent uses (e.g. install("coder_agent", llm, Settings.embed_model)).
+    """
+    global _stage, _handler
+    _stage = stage
+    from llama_index.core import Settings
+
+    if _handler is None:
+        _handler = KriyaCallbackHandler()
+    managers = [Settings.callback_manager]
+    managers += [c.callback_manager for c in components if getattr(c, "callback_manager", None) is not None]
+    for manager in managers:
+        if _handler not in manager.handlers:
+            manager.add_handler(_handler)
+    return _handler
+
+
+try:
+    from llama_index.core.callbacks import CBEventType, EventPayload
+    from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+except ImportError:  # telemetry report works without llama_index installed
+    BaseCallbackHandler = object
+
+
+class KriyaCallbackHandler(BaseCallbackHandler):
+    """Records latency, tokens and cost of every LLM and embedding event."""
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._starts = {}
+
+    def on_event_start(self, event_type, payload=None, event_id="", parent_id="", **kwargs):
+        if event_type in (CBEventType.LLM, CBEventType.EMBEDDING):
+            serialized = (payload or {}).get(EventPayload.SERIALIZED, {}) or {}
+            model = serialized.get("model") or serialized.get("model_name") or "unknown"
+            self._starts[event_id] = (time.perf_counter(), model)
+        return event_id
+
+    def on_event_end(self, event_type, payload=None, event_id="", **kwargs):
+        if event_id not in self._starts:
+            return
+        start, model = self._starts.pop(event_id)
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        payload = payload or {}
+        if event_type == CBEventType.LLM:
+            response = payload.get(EventPayload.RESPONSE) or payload.get(EventPayload.COMPLETION)
+            prompt_tokens, completion_tokens = _usage_from(response)
+            record("llm", model=model, latency_ms=latency_ms, prompt_tokens=prompt_tokens,
+                   completion_tokens=completion_tokens,
+                   cost_usd=estimate_cost(model, prompt_tokens, completion_tokens))
+        else:
+            chunks = payload.get(EventPayload.CHUNKS) or []
+            # Embedding APIs report no usage through llama_index; ~4 characters per token
+            tokens = sum(len(c) for c in chunks) // 4
+            record("embedding", model=model, latency_ms=latency_ms, chunks=len(chunks),
+                   prompt_tokens=tokens, completion_tokens=0, cost_usd=estimate_cost(model, tokens, 0))
+
+    def start_trace(self, trace_id=None):
+        pass
+
+    def end_trace(self, trace_id=None, trace_map=None):
+        pass
+
+
+# -------------------------------
+# Report
+# -------------------------------
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def load_events(metrics_file=METRICS_FILE):
+    events = []
+    with open(metrics_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                events.append(json.loads(line))
+    return events
+
+
+def build_report(events):
+    """Aggregate events into per-stage rows of latency percentiles, tokens, cost and cache hits."""
+    stages = {}
+    for e in events:
+        row = stages.setdefault(e["stage"], {
+            "runs": set(), "span_ms": [], "index_ms": [], "llm_ms": [], "llm_calls": 0, "embed_calls": 0,
+            "tokens": 0, "cost_usd": 0.0, "cache_hits": 0, "cache_misses": 0,
+        })
+        row["runs"].add(e.get("run_id"))
+        if e["kind"] == "span":
+            # Whole-stage spans come from the orchestrator; index_build spans from the agents
+            if e.get("name") == "stage":
+                row["span_ms"].append(e["latency_ms"])
+            elif e.get("name") == "index_build":
+                row["index_ms"].append(e["latency_ms"])
+        elif e["kind"] in ("llm", "embedding"):
+            if e["kind"] == "llm":
+                row["llm_calls"] += 1
+                row["llm_ms"].append(e["latency_ms"])
+            else:
+                row["embed_calls"] += 1
+            row["tokens"] += e.get("prompt_tokens", 0) + e.get("completion_tokens", 0)
+            row["cost_usd"] += e.get("cost_usd", 0.0)
+        elif e["kind"] == "cache":
+            row["cache_hits"] += e.get("hits", 0)
+            row["cache_misses"] += e.get("misses", 0)
+
+    report = {}
+    for stage, row in stages.items():
+        report[stage] = {
+            "runs": len(row["runs"]),
+            "p50_ms": percentile(row["span_ms"], 50),
+            "p95_ms": percentile(row["span_ms"], 95),
+            "index_p50_ms": percentile(row["index_ms"], 50),
+            "llm_calls": row["llm_calls"],
+            "llm_p50_ms": percentile(row["llm_ms"], 50),
+            "llm_p95_ms": percentile(row["llm_ms"], 95),
+            "embed_calls": row["embed_calls"],
+            "tokens": row["tokens"],
+            "cost_usd": round(row["cost_usd"], 4),
+            "cache_hits": row["cache_hits"],
+            "cache_misses": row["cache_misses"],
+        }
+    return report
+
+
+def print_report(report):
+    columns = ["runs", "p50_ms", "p95_ms", "index_p50_ms", "llm_calls", "llm_p50_ms", "llm_p95_ms",
+               "embed_calls", "tokens", "cost_usd", "cache_hits", "cache_misses"]
+    print(f"{'stage':<22}" + "".join(f"{c:>13}" for c in columns))
+    for stage in sorted(report):
+        print(f"{stage:<22}" + "".join(f"{report[stage][c]:>13}" for c in columns))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "report":
+        print("Usage: python telemetry.py report [metrics_file]")
+        sys.exit(1)
+    metrics_file = sys.argv[2] if len(sys.argv) > 2 else METRICS_FILE
+    print_report(build_report(load_events(metrics_file)))
@@ -0,0 +1,253 @@
+import os
+import sys
+import sqlite3
+from datetime import date, datetime
+
+import pandas as pd
+
+import filenamevalidation
+
+# What each partner owes per period, refreshed from Partner_Master on every partner load
+EXPECTATION_TABLE = "Partner_Expectation"
+# One row per received file (makes recording idempotent)
+ARRIVAL_TABLE = "File_Arrival"
+# Running expected-vs-received counts per (period, file_type, partner)
+LEDGER_TABLE = "Arrival_Ledger"
+# Reporting frequencies in use, and the periods whose ledger rows have been opened from the expectations
+FREQUENCY_TABLE = "Arrival_Frequency"
+PERIOD_TABLE = "Arrival_Period"
+# Partners / files still missing per (period, file_type), kept current by every recorded arrival
+SUMMARY_TABLE = "Arrival_Summary"
+
+# Partner_Master columns per file type: (reports flag, frequency, expected files per period)
+REPORTING_COLUMNS = {
+    "POS": ("Reports_Point_of_Sale", "Point_of_Sale_Frequency", "Expected_Num_POS_Files"),
+    "INV": ("Reports_INV", "INV_Frequency", "Expected_Num_INV_Files"),
+}
+DEFAULT_FREQUENCY = "MONTHLY"
+# A file counts against the period of its earliest transaction; files without dates count when they arrive
+DATE_COLUMN = "Transaction Date"
+
+
+def period_key(frequency, when):
+    """Period a date falls in for a reporting frequency, e.g. DAILY 2025-03-04, WEEKLY 2025-W10, MONTHLY 2025-03."""
+    if isinstance(when, datetime):
+        when = when.date()
+    frequency = (frequency or DEFAULT_FREQUENCY).upper()
+    if frequency == "DAILY":
+        return when.isoformat()
+    if frequency == "WEEKLY":
+        year, week, _ = when.isocalendar()
+        return f"{year}-W{week:02d}"
+    if frequency == "QUARTERLY":
+        return f"{when.year}-Q{(when.month - 1) // 3 + 1}"
+    if frequency in ("YEARLY", "ANNUAL", "ANNUALLY"):
+        return str(when.year)
+    return f"{when.year}-{when.month:02d}"
+
+
+def create_arrival_tables(conn):
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {EXPECTATION_TABLE} (
+        partner_code TEXT NOT NULL, file_type TEXT NOT NULL, frequency TEXT NOT NULL,
+        expected_files INTEGER NOT NULL, region TEXT,
+        PRIMARY KEY (partner_code, file_type)) WITHOUT ROWID""")
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {ARRIVAL_TABLE} (
+        file_name TEXT PRIMARY KEY, partner_code TEXT, file_type TEXT, period TEXT, arrived TEXT)""")
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+        period TEXT NOT NULL, file_type TEXT NOT NULL, partner_code TEXT NOT NULL, frequency TEXT,
+        expected_files INTEGER NOT NULL DEFAULT 0, received_files INTEGER NOT NULL DEFAULT 0,
+        last_arrival TEXT, PRIMARY KEY (period, file_type, partner_code)) WITHOUT ROWID""")
+    # Only partners still short of their expectation are indexed, so the missing list is read directly
+    conn.execute(f"""CREATE INDEX IF NOT EXISTS idx_{LEDGER_TABLE}_missing
+        ON {LEDGER_TABLE} (period, file_type, partner_code, expected_files, received_files)
+        WHERE received_files < expected_files""")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {FREQUENCY_TABLE} (frequency TEXT PRIMARY KEY)")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {PERIOD_TABLE} (frequency TEXT, period TEXT, PRIMARY KEY (frequency, period))")
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        period TEXT NOT NULL, file_type TEXT NOT NULL, partners_missing INTEGER NOT NULL,
+        files_missing INTEGER NOT NULL, PRIMARY KEY (period, file_type))""")
+
+
+def build_expectations(master_df):
+    """(partner_code, file_type, frequency, expected_files, region) for every partner that reports POS/INV."""
+    rows = []
+    for file_type, (reports, frequency, expected) in REPORTING_COLUMNS.items():
+        if reports not in master_df.columns:
+            continue
+        df = master_df[master_df[reports].astype(str).str.strip().str.upper() == "Y"]
+        frequencies = (df[frequency].astype(str).str.strip().str.upper().replace("", DEFAULT_FREQUENCY)
+                       if frequency in df.columns else [DEFAULT_FREQUENCY] * len(df))
+        counts = (df[expected].astype(str).str.strip() if expected in df.columns else [""] * len(df))
+        regions = df["Region"].astype(str).str.strip() if "Region" in df.columns else [""] * len(df)
+        for code, freq, count, region in zip(df["Reporting_Partner_Code"].astype(str).str.strip(),
+                                             frequencies, counts, regions):
+            rows.append((code, file_type, freq, int(count) if count.isdigit() else 1, region))
+    return rows
+
+
+def refresh_expectations(conn, master_df, when=None):
+    """Replace the expectations and carry changed ones into the already opened current periods."""
+    create_arrival_tables(conn)
+    rows = build_expectations(master_df)
+    conn.execute(f"DELETE FROM {EXPECTATION_TABLE}")
+    conn.executemany(f"INSERT OR REPLACE INTO {EXPECTATION_TABLE} VALUES (?, ?, ?, ?, ?)", rows)
+    conn.execute(f"DELETE FROM {FREQUENCY_TABLE}")
+    conn.executemany(f"INSERT INTO {FREQUENCY_TABLE} VALUES (?)", [(f,) for f in {r[2] for r in rows}])
+    when = when or date.today()
+    opened = conn.execute(f"SELECT frequency, period FROM {PERIOD_TABLE}").fetchall()
+    current = {(f, p) for f, p in opened if period_key(f, when) == p}
+    for frequency, period in current:
+        _open_rows(conn, frequency, period)
+        _close_rows(conn, frequency, period)
+    for period in {p for _, p in current}:
+        _recount(conn, period)
+    print(f"Arrival expectations refreshed: {len(rows)} partner/file-type rows.")
+
+
+def _open_rows(conn, frequency, period):
+    conn.execute(f"""INSERT INTO {LEDGER_TABLE} (period, file_type, partner_code, frequency, expected_files)
+        SELECT ?, file_type, partner_code, frequency, expected_files FROM {EXPECTATION_TABLE} WHERE frequency = ?
+        ON CONFLICT (period, file_type, partner_code) DO UPDATE SET
+            expected_files = excluded.expected_files, frequency = excluded.frequency""", (period, frequency))
+
+
+def _close_rows(conn, frequency, period):
+    """Stop expecting files from partners that no longer report this file type at this frequency."""
+    conn.execute(f"""UPDATE {LEDGER_TABLE} SET expected_files = 0
+        WHERE period = ? AND expected_files > 0 AND NOT EXISTS (
+            SELECT 1 FROM {EXPECTATION_TABLE} e WHERE e.partner_code = {LEDGER_TABLE}.partner_code
+            AND e.file_type = {LEDGER_TABLE}.file_type AND e.frequency = ?)""", (period, frequency))
+
+
+def _recount(conn, period):
+    """Rebuild one period's summary rows (only when rows are opened or expectations change)."""
+    conn.execute(f"DELETE FROM {SUMMARY_TABLE} WHERE period = ?", (period,))
+    conn.execute(f"""INSERT INTO {SUMMARY_TABLE}
+        SELECT period, file_type, COUNT(*), SUM(expected_files - received_files) FROM {LEDGER_TABLE}
+        INDEXED BY idx_{LEDGER_TABLE}_missing WHERE period = ? AND received_files < expected_files
+        GROUP BY period, file_type""", (period,))
+
+
+def open_periods(conn, when=None):
+    """
+    Make sure every frequency's current period has its ledger rows (one insert per period
+    rollover); returns {frequency: period}.
+    """
+    create_arrival_tables(conn)
+    when = when or date.today()
+    frequencies = [f for (f,) in conn.execute(f"SELECT frequency FROM {FREQUENCY_TABLE}")]
+    periods = {f: period_key(f, when) for f in frequencies}
+    for frequency, period in periods.items():
+        if conn.execute(f"SELECT 1 FROM {PERIOD_TABLE} WHERE frequency = ? AND period = ?",
+                        (frequency, period)).fetchone() is None:
+            _open_rows(conn, frequency, period)
+            conn.execute(f"INSERT INTO {PERIOD_TABLE} VALUES (?, ?)", (frequency, period))
+            _recount(conn, period)
+    return periods
+
+
+def reported_date(file_path, chunk_size=250000):
+    """Earliest transaction date in a file, or None when it has no parseable DATE_COLUMN."""
+    try:
+        chunks = pd.read_csv(file_path, dtype=str, usecols=[DATE_COLUMN], chunksize=chunk_size)
+    except ValueError:
+        return None
+    earliest = min((pd.to_datetime(chunk[DATE_COLUMN], errors="coerce").min() for chunk in chunks),
+                   default=pd.NaT)
+    return None if pd.isna(earliest) else earliest.to_pydatetime()
+
+
+def record_arrival(conn, file_name, partner_code, file_type, arrived=None, reported=None):
+    """
+    Count one received file against its partner's period: the period of 'reported' (the file's
+    earliest transaction date) when given, otherwise the period it arrived in. Re-delivering the
+    same file name is not counted twice. Returns the period, or None when the file was already recorded.
+    Partners without an expectation still get a ledger row (expected 0) so unexpected files show up.
+    """
+    create_arrival_tables(conn)
+    arrived = arrived or datetime.now()
+    row = conn.execute(f"SELECT frequency FROM {EXPECTATION_TABLE} WHERE partner_code = ? AND file_type = ?",
+                       (partner_code, file_type)).fetchone()
+    frequency = row[0] if row else DEFAULT_FREQUENCY
+    period = period_key(frequency, reported or arrived)
+    try:
+        conn.execute(f"INSERT INTO {ARRIVAL_TABLE} VALUES (?, ?, ?, ?, ?)",
+                     (file_name, partner_code, file_type, period, arrived.isoformat(timespec="seconds")))
+    except sqlite3.IntegrityError:
+        return None
+    before = conn.execute(f"SELECT expected_files, received_files FROM {LEDGER_TABLE} "
+                          "WHERE period = ? AND file_type = ? AND partner_code = ?",
+                          (period, file_type, partner_code)).fetchone()
+    expected, received = before or (0, 0)
+    if received < expected:
+        # Delta to the precomputed counts: one file fewer missing, one partner fewer once complete
+        conn.execute(f"UPDATE {SUMMARY_TABLE} SET files_missing = files_missing - 1, "
+                     "partners_missing = partners_missing - ? WHERE period = ? AND file_type = ?",
+                     (int(received + 1 == expected), period, file_type))
+    conn.execute(f"""INSERT INTO {LEDGER_TABLE} (period, file_type, partner_code, frequency, received_files, last_arrival)
+        VALUES (?, ?, ?, ?, 1, ?)
+        ON CONFLICT (period, file_type, partner_code) DO UPDATE SET
+            received_files = received_files + 1, last_arrival = excluded.last_arrival""",
+                 (period, file_type, partner_code, frequency, arrived.isoformat(timespec="seconds")))
+    return period
+
+
+def record_file(conn, file_path, arrived=None):
+    """Map a file to partner and type with the filename validation rules and record it; None if it does not map."""
+    file_type = filenamevalidation.file_type(file_path)
+    partner_code = filenamevalidation.file_partner_code(file_path)
+    if file_type is None or partner_code is None:
+        return None
+    return record_arrival(conn, os.path.basename(file_path), partner_code, file_type, arrived,
+                          reported_date(file_path))
+
+
+def missing_files(conn, when=None, file_type=None):
+    """
+    Partners that have not yet sent all expected files in their current period:
+    [(partner_code, file_type, period, expected_files, received_files)].
+    """
+    periods = open_periods(conn, when)
+    conn.commit()
+    out = []
+    for period in sorted(set(periods.values())):
+        query = (f"SELECT partner_code, file_type, period, expected_files, received_files FROM {LEDGER_TABLE} "
+                 f"INDEXED BY idx_{LEDGER_TABLE}_missing WHERE period = ? AND received_files < expected_files")
+        params = [period]
+        if file_type:
+            query += " AND file_type = ?"
+            params.append(file_type)
+        out.extend(conn.execute(query, params).fetchall())
+    return out
+
+
+def missing_summary(conn, when=None):
+    """Partners and files still missing in the current periods: [(period, file_type, partners, files)]."""
+    periods = open_periods(conn, when)
+    conn.commit()
+    placeholders = ", ".join("?" for _ in set(periods.values()))
+    return conn.execute(f"SELECT period, file_type, partners_missing, files_missing FROM {SUMMARY_TABLE} "
+                        f"WHERE period IN ({placeholders}) ORDER BY period, file_type",
+                        sorted(set(periods.values()))).fetchall()
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("missing", "record"):
+        print("Usage: python arrivaltracker.py missing [YYYY-MM-DD] [POS|INV]")
+        print("       python arrivaltracker.py record <file.csv> [...]")
+        sys.exit(1)
+    conn = sqlite3.connect("kriya.db")
+    if sys.argv[1] == "record":
+        for path in sys.argv[2:]:
+            print(f"{path}: {record_file(conn, path) or 'not recorded'}")
+        conn.commit()
+    else:
+        when = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+        for period, kind, partners, files in missing_summary(conn, when):
+            print(f"{period:<10} {kind}: {partners} partners missing {files} files")
+        rows = missing_files(conn, when, sys.argv[3] if len(sys.argv) > 3 else None)
+        print(f"{len(rows)} partner/file-type pairs missing files this period.")
+        for code, kind, period, expected, received in rows[:50]:
+            print(f"  {code:<18} {kind} {period:<10} received {received}/{expected}")
+    conn.close()
@@ -0,0 +1,147 @@
+"""
+End-to-end benchmark of the agent pipeline (ai/agent_orchestrator.py) with no network.
+
+Each run executes the full orchestrator flow in a scratch directory against:
+  - the in-process mock LLM/embeddings (KRIYA_LLM_PROVIDER=mock, see ai/llm_provider.py)
+  - the local mock Jira server (ai/mock_jira_server.py)
+  - a stub-wheel package index for the venv stage (ai/local_package_index.py)
+and reports per-stage wall time next to the time spent inside (mock) LLM calls,
+so orchestration overhead can be tuned independently of model latency.
+
+    python bench_pipeline.py [--runs 3] [--latency 0.05] [--tps 200] [--issue MOCK-1]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+AI_DIR = os.path.join(REPO_ROOT, "ai")
+STAGES = ["requirement_agent", "builder_agent", "venv_creation", "coder_agent", "tester_agent", "test_executor"]
+
+
+def closed_port():
+    """A local port with nothing listening, so PyPI lookups fail fast and fall back to the agent's versions."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_environment(root, jira_port, latency, tps):
+    sys.path.insert(0, AI_DIR)
+    from llm_provider import MOCK_DEPENDENCIES
+    from local_package_index import build_local_index
+
+    deps_file = os.path.join(root, "mock_pkgs.json")
+    with open(deps_file, "w", encoding="utf-8") as f:
+        json.dump({"dependencies": MOCK_DEPENDENCIES}, f)
+    index_dir = build_local_index(deps_file, os.path.join(root, "local_index"))
+
+    env = dict(os.environ)
+    env.update({
+        "KRIYA_LLM_PROVIDER": "mock",
+        "KRIYA_MOCK_LATENCY": str(latency),
+        "KRIYA_MOCK_TPS": str(tps),
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "sk-mock"),
+        "JIRA_URL": f"http://127.0.0.1:{jira_port}",
+        "JIRA_USER": "bench",
+        "JIRA_API_TOKEN": "bench",
+        "PYPI_INDEX_URL": f"http://127.0.0.1:{closed_port()}/pypi",
+        "KRIYA_LOCAL_INDEX": os.path.abspath(index_dir),
+        # Shared across runs: the first run is cold, later runs reuse wheels and the base venv
+        "KRIYA_WHEEL_CACHE": os.path.join(root, "wheels"),
+        "KRIYA_BASE_VENVS": os.path.join(root, "base_venvs"),
+        "KRIYA_METRICS_FILE": os.path.join(root, "metrics.jsonl"),
+        "BRD_PDF_MODE": "off",
+    })
+    return env
+
+
+def run_pipeline(root, env, issue_id, n):
+    """One orchestrator run in its own working directory; returns (seconds, returncode, output tail)."""
+    work_dir = os.path.join(root, f"run_{n}")
+    os.makedirs(work_dir)
+    env = dict(env, KRIYA_RUN_ID=f"bench{n:03d}")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(AI_DIR, "agent_orchestrator.py"), issue_id],
+                            cwd=work_dir, env=env, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    return seconds, result.returncode, (result.stdout + result.stderr)[-2000:]
+
+
+def stage_breakdown(events):
+    """Per stage: mean wall time of the orchestrator span vs mean time inside LLM/embedding calls."""
+    runs = {e["run_id"] for e in events}
+    rows = {}
+    for stage in STAGES:
+        if not any(e["stage"] == stage for e in events):
+            continue
+        span_ms = sum(e["latency_ms"] for e in events
+                      if e["stage"] == stage and e["kind"] == "span" and e.get("name") == "stage")
+        model_ms = sum(e["latency_ms"] for e in events
+                       if e["stage"] == stage and e["kind"] in ("llm", "embedding"))
+        n = max(1, len(runs))
+        rows[stage] = {
+            "stage_ms": round(span_ms / n, 1),
+            "model_ms": round(model_ms / n, 1),
+            "overhead_ms": round((span_ms - model_ms) / n, 1),
+        }
+    return rows
+
+
+def main(runs=3, latency=0.05, tps=200.0, issue_id="MOCK-1"):
+    sys.path.insert(0, AI_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    import telemetry
+    from mock_jira_server import start_mock_jira
+    from run_benchmarks import RESULTS_DIR, git_revision
+
+    root = tempfile.mkdtemp(prefix="kriya_pipeline_")
+    jira = start_mock_jira(port=0)
+    try:
+        env = prepare_environment(root, jira.server_address[1], latency, tps)
+        wall = []
+        for n in range(runs):
+            seconds, code, tail = run_pipeline(root, env, issue_id, n)
+            status = "ok" if code == 0 else f"failed ({code})"
+            print(f"run {n}: {seconds:.2f}s {status}")
+            if code != 0:
+                print(tail)
+            wall.append({"run": n, "seconds": round(seconds, 3), "returncode": code})
+
+        events = telemetry.load_events(env["KRIYA_METRICS_FILE"])
+        telemetry.print_report(telemetry.build_report(events))
+        breakdown = stage_breakdown(events)
+        print(f"\n{'stage':<22}{'stage_ms':>12}{'model_ms':>12}{'overhead_ms':>14}")
+        for stage, row in breakdown.items():
+            print(f"{stage:<22}{row['stage_ms']:>12}{row['model_ms']:>12}{row['overhead_ms']:>14}")
+    finally:
+        jira.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mock_latency": latency,
+        "mock_tps": tps,
+        "runs": wall,
+        "stages": breakdown,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_file = os.path.join(RESULTS_DIR, f"pipeline_{time.strftime('%Y%m%d_%H%M%S')}_{report['revision']}.json")
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {out_file}")
+    return out_file
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opts = {args[i]: args[i + 1] for i in range(0, len(args) - 1, 2)}
+    main(runs=int(opts.get("--runs", 3)), latency=float(opts.get("--latency", 0.05)),
+         tps=float(opts.get("--tps", 200)), issue_id=opts.get("--issue", "MOCK-1"))
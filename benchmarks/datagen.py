@@ -0,0 +1,170 @@
+"""
+Synthetic data generator for kriya benchmarks.
+
+Writes Partner_Master (44 columns), Partner_Master_Flags (45 columns) and POS
+CSVs with the same layouts as HPI_Partner_Master.csv / HPI_Partner_Master_Flags.csv.
+Rows are streamed to disk, so 10M-row files do not need to fit in memory.
+
+    python datagen.py <out_dir> <rows> [--partners N] [--pos-files N] [--seed S]
+"""
+import os
+import sys
+import csv
+import random
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POS_COLUMNS = [
+    "Transaction ID", "Reporter ID", "Reporter Company Name", "Country", "Transaction Date",
+    "Product Number", "Quantity", "Currency", "Unit Price", "Serial Number",
+]
+
+COUNTRIES = {
+    "NZ": ("Asia Pacific", "GREATER ASIA", "NZD"), "TH": ("Asia Pacific", "GREATER ASIA", "THB"),
+    "AU": ("Asia Pacific", "GREATER ASIA", "AUD"), "IN": ("Asia Pacific", "INDIA", "INR"),
+    "SG": ("Asia Pacific", "GREATER ASIA", "SGD"), "JP": ("Asia Pacific", "JAPAN", "JPY"),
+    "US": ("Americas", "NORTH AMERICA", "USD"), "DE": ("EMEA", "CENTRAL EUROPE", "EUR"),
+    "GB": ("EMEA", "UK&I", "GBP"), "BR": ("Americas", "LATAM", "BRL"),
+}
+NAME_WORDS = ["OEM", "PRINT", "POWER", "BUY", "SOLUTIONS", "DIGITAL", "OFFICE", "TECH", "SYSTEMS",
+              "GLOBAL", "PACIFIC", "NETWORK", "DATA", "IMAGING", "SUPPLIES", "DIRECT", "RETAIL"]
+SUFFIXES = ["LTD", "LIMITED", "COMPANY LIMITED", "INC", "CO", "PTY LTD", ""]
+PARTNER_TYPES = ["RESELLER", "Retailer", "Distributor", "OEM"]
+TIERS = ["Tier1", "Tier2", "Tier3"]
+FREQUENCIES = ["DAILY", "WEEKLY", "MONTHLY"]
+FORMATS = ["API/Excel", "Excel", "API", "CSV"]
+
+
+def read_header(file_name):
+    with open(os.path.join(REPO_ROOT, file_name), "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f))
+
+
+def partner_code(i):
+    return f"2-SIWB-{20000 + i:05d}" if i < 80000 else f"2-SIWB-{i:07d}"
+
+
+def partner_name(rng, i):
+    words = rng.sample(NAME_WORDS, 2)
+    return f"{' '.join(words)} {i} {rng.choice(SUFFIXES)}".strip()
+
+
+def _fmt(d):
+    return f"{d.month}/{d.day}/{d.year}"
+
+
+def write_partner_master(path, partners, rng):
+    """
+    Partner_Master rows with the 44-column layout. A generator: each row is written as it is
+    consumed and yielded as (code, name, country), so no partner list is held in memory.
+    """
+    header = read_header("HPI_Partner_Master.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(partners):
+            code = partner_code(i)
+            name = partner_name(rng, i)
+            country = rng.choice(list(COUNTRIES))
+            region, sub_region, currency = COUNTRIES[country]
+            domain = f"{name.split()[0].lower()}{i}.co.{country.lower()}"
+            # ~70% of partners are roots, the rest point at an earlier partner
+            father = code if i == 0 or rng.random() < 0.7 else partner_code(rng.randrange(i))
+            row = dict.fromkeys(header, "")
+            row.update({
+                "Reporting_Partner_Code": code, "Reporting_Partner_Name": name,
+                "Partner_Type": rng.choice(PARTNER_TYPES), "Region": region, "Sub_Region": sub_region,
+                "Country_Code": country, "Siebel_row_ID": code,
+                "Partner_Contact_email": f"ops@{domain};finance@{domain}",
+                "Tier": rng.choice(TIERS), "Reports_Point_of_Sale": rng.choice("YN"),
+                "Point_of_Sale_Frequency": rng.choice(FREQUENCIES), "Reports_INV": rng.choice("YN"),
+                "INV_Frequency": rng.choice(FREQUENCIES), "Reporting_Format": rng.choice(FORMATS),
+                "CAC": "D", "NAT_Partner": "Z", "Father_ID": father, "TYPE_TX": "Amplify_Excel_V1",
+                "Serial_Number_Required": rng.choice("YN"), "Authorised_NMSO_Partner": "N",
+                "Currency_Code": currency, "Channel_Segment": "APJ", "Discount_Geo": country,
+                "Top_Value": "N", "APR_Status": "V", "APR_Condition": "Y", "CAC_Code2": "File Name",
+                "Expected_Num_POS_Files": str(rng.randint(1, 4)), "Expected_Num_INV_Files": str(rng.randint(1, 4)),
+                "USER_DEFINED_DATE_FIELD_1": _fmt(date(2019, 1, 1) + timedelta(days=rng.randrange(1500))),
+                "TAX_ID": "TRUE",
+            })
+            writer.writerow([row[c] for c in header])
+            yield code, name, country
+
+
+def write_partner_flags(path, partners, rng):
+    """Partner_Master_Flags rows with the 45-column layout (32 UDF flags + 12 UDF dates), streamed from 'partners'."""
+    header = read_header("HPI_Partner_Master_Flags.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for code, name, country in partners:
+            row = dict.fromkeys(header, "")
+            row["PARTNER_CODE"] = code
+            for n in range(1, 33):
+                row[f"UDF{n}"] = rng.choice(["Y", "N", "", ""])
+            domain = f"{name.split()[0].lower()}.co.{country.lower()}"
+            row["UDF29"] = f"hpiapj.ftp:{domain}:{code.lower()}.ftp;AddTransactions.ftp"
+            start = date(2019, 1, 1) + timedelta(days=rng.randrange(1500))
+            row["UDF_DATE1"], row["UDF_DATE2"] = _fmt(start), "12/31/2099"
+            row["UDF_DATE3"], row["UDF_DATE4"] = _fmt(start), "12/31/2099"
+            writer.writerow([row[c] for c in header])
+
+
+def write_pos_file(path, rows, partner, rng):
+    """POS file for one partner; column 2 / row 2 holds the partner code used by filename validation."""
+    code, name, country = partner
+    currency = COUNTRIES[country][2]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(POS_COLUMNS)
+        base = date(2024, 1, 1)
+        for i in range(rows):
+            writer.writerow([
+                f"T{i:09d}", code, name, country, (base + timedelta(days=i % 365)).isoformat(),
+                f"P{rng.randrange(10000):05d}", rng.randint(1, 50), currency,
+                f"{rng.uniform(5, 2000):.2f}", f"SN{rng.randrange(10 ** 9):09d}",
+            ])
+
+
+def generate_dataset(out_dir, rows, partners=None, pos_files=4, seed=42):
+    """
+    Generate one dataset: Partner_Master/Flags with 'partners' rows (defaults to 'rows')
+    and 'pos_files' POS files sharing 'rows' transactions. Returns the file paths.
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    partners = partners or rows
+    master = os.path.join(out_dir, "HPI_Partner_Master.csv")
+    flags = os.path.join(out_dir, "HPI_Partner_Master_Flags.csv")
+    # Master and flags are written in one pass; only the partners that get POS files are kept
+    partner_rows = []
+
+    def stream_partners():
+        for partner in write_partner_master(master, partners, rng):
+            if len(partner_rows) < pos_files:
+                partner_rows.append(partner)
+            yield partner
+
+    write_partner_flags(flags, stream_partners(), rng)
+
+    pos_dir = os.path.join(out_dir, "pos")
+    os.makedirs(pos_dir, exist_ok=True)
+    pos_paths = []
+    for i in range(pos_files):
+        partner = partner_rows[i % len(partner_rows)]
+        path = os.path.join(pos_dir, f"V2_POS_AMPLIFY_{partner[0]}.csv")
+        write_pos_file(path, rows // pos_files, partner, rng)
+        pos_paths.append(path)
+    return {"master": master, "flags": flags, "pos_dir": pos_dir, "pos_files": pos_paths}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(1)
+    opts = {args[i]: args[i + 1] for i in range(2, len(args) - 1, 2)}
+    paths = generate_dataset(args[0], int(args[1]), partners=int(opts.get("--partners", 0)) or None,
+                             pos_files=int(opts.get("--pos-files", 4)), seed=int(opts.get("--seed", 42)))
+    print(paths)
@@ -0,0 +1,233 @@
+"""
+Benchmarks for kriya's data-validation hot paths.
+
+Each (benchmark, size) case runs in a fresh process against synthetic data from
+datagen.py and records throughput, latency percentiles and peak RSS. Results are
+written to benchmarks/results/<timestamp>.json for comparison between versions.
+
+    python run_benchmarks.py [--sizes 10000,100000] [--repeat 3] [--only insert,genie]
+    python run_benchmarks.py --compare results/old.json results/new.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_SIZES = [10_000, 100_000]
+GENIE_REQUESTS = 2_000
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, -(-len(ordered) * pct // 100) - 1))
+    return ordered[int(k)]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except (ImportError, AttributeError):
+            return None
+
+
+def count_rows(path):
+    with open(path, "rb") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+# -------------------------------
+# Benchmark bodies (run inside the child process, cwd = scratch dir)
+# -------------------------------
+def bench_insert(dataset, repeat):
+    import validation
+    files = validation.find_files_with_partner_master(os.path.dirname(dataset["master"]))
+    rows = sum(count_rows(f["full_path"]) for f in files)
+    latencies = []
+    for _ in range(repeat):
+        if os.path.exists("kriya.db"):
+            os.remove("kriya.db")
+        start = time.perf_counter()
+        validation.create_database_and_tables(files)
+        validation.insert_data_into_tables(files)
+        latencies.append(time.perf_counter() - start)
+    return rows * repeat, latencies
+
+
+def bench_fetch_columns(dataset, repeat):
+    import datavalidation
+    config_path = os.path.join(REPO_ROOT, "config.yaml")
+    rows = sum(count_rows(p) for p in dataset["pos_files"])
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in dataset["pos_files"]:
+            datavalidation.fetch_dynamic_columns(path, config_path)
+        latencies.append(time.perf_counter() - start)
+    return rows * repeat, latencies
+
+
+def bench_filename_validation(dataset, repeat):
+    import filenamevalidation
+    rows = sum(count_rows(p) for p in dataset["pos_files"])
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        filenamevalidation.validate_all_in_directory(dataset["pos_dir"])
+        latencies.append(time.perf_counter() - start)
+    return rows * repeat, latencies
+
+
+def bench_genie(dataset, repeat):
+    import genie
+    client = genie.app.test_client()
+    payload = {"Reporter ID": "2-SIWB-20652", "Quantity": 3, "Currency": "NZD", "Unit Price": 120.5}
+    latencies = []
+    for _ in range(GENIE_REQUESTS * repeat):
+        start = time.perf_counter()
+        response = client.post("/api/payload", json=payload)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 201
+    return len(latencies), latencies
+
+
+BENCHMARKS = {
+    "insert": bench_insert,
+    "fetch_dynamic_columns": bench_fetch_columns,
+    "filename_validation": bench_filename_validation,
+    "genie_ingest": bench_genie,
+}
+
+
+def _child(name, dataset, repeat, queue):
+    """Entry point of the isolated benchmark process; benchmarks return (items processed, latencies)."""
+    scratch = tempfile.mkdtemp(prefix="kriya_bench_")
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(scratch)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")  # datavalidation reads it at import
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rss_before = peak_rss_mb()
+            items, latencies = BENCHMARKS[name](dataset, repeat)
+        queue.put({"items": items, "latencies": latencies, "rss_before_mb": rss_before, "peak_rss_mb": peak_rss_mb()})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        os.chdir(BENCH_DIR)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run_case(name, dataset, rows, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(name, dataset, repeat, queue))
+    proc.start()
+    outcome = queue.get()
+    proc.join()
+
+    result = {"benchmark": name, "rows": rows}
+    if "error" in outcome:
+        result["error"] = outcome["error"]
+        print(f"  {name:<24} {rows:>10}  skipped: {outcome['error']}")
+        return result
+
+    # Latencies are per request for genie and per full pass over the dataset otherwise
+    latencies = outcome["latencies"]
+    result.update({
+        "samples": len(latencies),
+        "total_seconds": round(sum(latencies), 4),
+        "items_per_sec": round(outcome["items"] / sum(latencies), 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "rss_before_mb": outcome["rss_before_mb"],
+        "peak_rss_mb": outcome["peak_rss_mb"],
+    })
+    print(f"  {name:<24} {rows:>10}  {result['items_per_sec']:>12}/s  p50 {result['p50_ms']:>10} ms"
+          f"  p95 {result['p95_ms']:>10} ms  peak {result['peak_rss_mb']} MB")
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_all(sizes, repeat, only=None, data_dir=None):
+    sys.path.insert(0, BENCH_DIR)
+    from datagen import generate_dataset
+
+    data_root = data_dir or tempfile.mkdtemp(prefix="kriya_bench_data_")
+    results = []
+    try:
+        for rows in sizes:
+            print(f"Generating {rows} rows...")
+            dataset = generate_dataset(os.path.join(data_root, str(rows)), rows)
+            for name in BENCHMARKS:
+                if only and name not in only:
+                    continue
+                results.append(run_case(name, dataset, rows, repeat))
+    finally:
+        if not data_dir:
+            shutil.rmtree(data_root, ignore_errors=True)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_file = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}_{report['revision']}.json")
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {out_file}")
+    return out_file
+
+
+def compare(old_file, new_file):
+    """Print throughput / p95 / memory change per case between two result files."""
+    with open(old_file, "r", encoding="utf-8") as f:
+        old = {(r["benchmark"], r["rows"]): r for r in json.load(f)["results"] if "error" not in r}
+    with open(new_file, "r", encoding="utf-8") as f:
+        new = {(r["benchmark"], r["rows"]): r for r in json.load(f)["results"] if "error" not in r}
+    print(f"{'benchmark':<24}{'rows':>10}{'throughput':>14}{'p95':>10}{'peak rss':>12}")
+    for key in sorted(old.keys() & new.keys()):
+        o, n = old[key], new[key]
+        ratio = lambda a, b: f"{b / a:.2f}x" if a and b else "n/a"
+        print(f"{key[0]:<24}{key[1]:>10}{ratio(o['items_per_sec'], n['items_per_sec']):>14}"
+              f"{ratio(o['p95_ms'], n['p95_ms']):>10}{ratio(o['peak_rss_mb'], n['peak_rss_mb']):>12}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--compare":
+        compare(args[1], args[2])
+        sys.exit(0)
+    opts = {args[i]: args[i + 1] for i in range(0, len(args) - 1, 2)}
+    sizes = [int(s) for s in opts.get("--sizes", ",".join(map(str, DEFAULT_SIZES))).split(",")]
+    only = set(opts["--only"].split(",")) if "--only" in opts else None
+    run_all(sizes, int(opts.get("--repeat", 3)), only=only, data_dir=opts.get("--data-dir"))
@@ -1,6 +1,7 @@
 import json
 import os
 import re
+import sys
 from dotenv import load_dotenv
 from llama_index.llms.openai import OpenAI
 
@@ -53,9 +54,120 @@ def save_multi_file_code(output_text, base_dir=None):
         print(f" Wrote {full_path}")
 
 
-def generate_code(requirement_file: str, base_dir: str = None):
+# -------------------------------
+# Streaming multi-file writer
+# -------------------------------
+TOP_FOLDER = re.compile(r"^([\w\-_]+/)")
+
+class StreamingCodeWriter:
+    """
+    Incrementally parses ```lang path ... ``` fences from streamed LLM tokens.
+    Each file is written as soon as its closing fence arrives, so downstream
+    stages can start on early files before the completion finishes.
+    """
+
+    def __init__(self, base_dir=None, on_file=None):
+        self.base_dir = base_dir
+        self.on_file = on_file          # optional callback(full_path)
+        self.written = []
+        self._pending = ""               # partial line not yet terminated by newline
+        self._current_file = None
+        self._in_fence = False
+        self._buffer = []
+        self._raw = []                   # kept only for the no-fences fallback
+        self._auto_base_dir = None
+
+    def _resolve_base_dir(self):
+        if not self.base_dir:
+            self.base_dir = self._auto_base_dir or "generated_project"
+        os.makedirs(self.base_dir, exist_ok=True)
+        return self.base_dir
+
+    def _write_file(self, file_path, code):
+        # Skip directory-only paths
+        if file_path.endswith("/") or file_path.endswith("\\"):
+            print(f" Skipping directory path: {file_path}")
+            return
+        full_path = os.path.join(self._resolve_base_dir(), file_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(code.strip())
+        self.written.append(full_path)
+        print(f" Wrote {full_path}")
+        if self.on_file:
+            self.on_file(full_path)
+
+    def _handle_line(self, line):
+        stripped = line.strip()
+        if not self._in_fence:
+            if stripped.startswith("```"):
+                # Header is "```lang path"; a lone token is a path only if it looks like one
+                header = stripped[3:].split()
+                path = None
+                if len(header) > 1 or (header and ("/" in header[0] or "." in header[0])):
+                    path = header[-1]
+                self._in_fence = True
+                self._current_file = path
+                self._buffer = []
+            elif self._auto_base_dir is None:
+                folder_match = TOP_FOLDER.match(line)
+                if folder_match:
+                    self._auto_base_dir = folder_match.group(1).rstrip("/")
+            return
+
+        if stripped.startswith("```"):
+            if self._current_file:
+                self._write_file(self._current_file, "\n".join(self._buffer))
+            self._in_fence = False
+            self._current_file = None
+            self._buffer = []
+        else:
+            self._buffer.append(line)
+
+    def feed(self, text):
+        """Consume a chunk of streamed text (any size, may split lines)."""
+        if not text:
+            return
+        if not self.written:
+            self._raw.append(text)
+        data = self._pending + text
+        lines = data.split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._handle_line(line)
+
+    def close(self):
+        """Flush the trailing partial line; fall back to a single file if no fences were found."""
+        if self._pending:
+            self._handle_line(self._pending)
+            self._pending = ""
+        if self._in_fence and self._current_file:
+            # Unterminated final fence: keep what we have
+            self._write_file(self._current_file, "\n".join(self._buffer))
+        if not self.written:
+            single_file = os.path.join(self._resolve_base_dir(), "generated_code.txt")
+            with open(single_file, "w", encoding="utf-8") as f:
+                f.write("".join(self._raw))
+            print(f" No structured matches found. Saved everything to {single_file}")
+        self._raw = []
+        return self.written
+
+
+def save_multi_file_code_streaming(token_stream, base_dir=None, on_file=None):
+    """
+    Streaming counterpart of save_multi_file_code.
+    token_stream yields llama_index CompletionResponse chunks (from stream_complete) or plain strings.
+    """
+    writer = StreamingCodeWriter(base_dir=base_dir, on_file=on_file)
+    for chunk in token_stream:
+        writer.feed(chunk if isinstance(chunk, str) else chunk.delta)
+    return writer.close()
+
+
+def generate_code(requirement_file: str, base_dir: str = None, stream: bool = False):
     """
     Reads requirements JSON and generates multi-file project using LlamaIndex LLM.
+    With stream=True, files are written as their code fences complete.
     """
 
     if not os.path.exists(requirement_file):
@@ -87,13 +199,17 @@ def generate_code(requirement_file: str, base_dir: str = None):
     - Do not provide extra explanations outside code blocks.
     """
 
-    response = llm.complete(prompt)
+    if stream:
+        # Write each file as soon as its closing fence is streamed
+        save_multi_file_code_streaming(llm.stream_complete(prompt), base_dir=base_dir)
+    else:
+        response = llm.complete(prompt)
 
-    # Save output into multi-file structure
-    save_multi_file_code(response.text, base_dir=base_dir)
+        # Save output into multi-file structure
+        save_multi_file_code(response.text, base_dir=base_dir)
     print(f"\n Project generated inside: {base_dir or 'auto-detected root folder'}")
 
 
 if __name__ == "__main__":
     # Reads the requirement.json created by builder_agent.py
-    generate_code("requirement.json")
+    generate_code("requirement.json", stream="--stream" in sys.argv)
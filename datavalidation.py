@@ -8,7 +8,6 @@ from llama_index.core.query_engine import NLSQLTableQueryEngine
 from llama_index.core.agent.workflow import ReActAgent
 from llama_index.core import SQLDatabase
 from llama_index.core.agent.workflow import AgentWorkflow, FunctionAgent
-from llama_index.llms.openai import OpenAI
 from llama_index.core.base.llms.types import ChatMessage
 import pandas as pd
 from IPython.display import Markdown
@@ -18,6 +17,11 @@ import re
 import yaml
 from IPython.display import Markdown, display
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai"))
+from llm_provider import get_llm, configure
+import summarytables
+from partnermatch import PartnerNameIndex, load_match_config, resolved
+
 
 # Fix Windows asyncio bug
 if sys.platform.startswith("win"):
@@ -102,17 +106,20 @@ try:
 except Exception as e:
     print(f"Database connection failed: {e}")
 
-# Create SQL Query Engine
+# Create SQL Query Engine (mock LLM when KRIYA_LLM_PROVIDER=mock)
+configure()
 sql_database = SQLDatabase.from_uri(sqlite_uri)
 sql_query_engine = NLSQLTableQueryEngine(
     sql_database=sql_database,
-    tables=tables
+    tables=tables,
+    context_query_kwargs=summarytables.TABLE_DESCRIPTIONS
 )
 db_tool = QueryEngineTool(
     query_engine=sql_query_engine,
     metadata=ToolMetadata(
         name="database_validator",
-        description="SQL database containing partner details and POS/Inventory information tables."
+        description="SQL database containing partner details, POS/Inventory information tables and "
+                    "precomputed per partner/region/period error summaries."
     )
 )
 system_prompt = """You are an experienced Data administrator.
@@ -123,18 +130,28 @@ agent = FunctionAgent(
     name="database_analyzer_agent",
     description="Database Analyzer Agent",
     tools=tools,
-    llm=OpenAI(model="gpt-4o-mini"),
+    llm=get_llm(model="gpt-4o-mini"),
     system_prompt=system_prompt,
     verbose=False
 )
 
-async def main(agent, records):
+async def main(agent, records, matcher=None):
     try:
         print("......Starting main().....")
 
+        # Resolve the whole batch locally first; only unresolved names go to the agent
+        matches = matcher.match_batch(records) if matcher else [None] * len(records)
+
         # Iterate through all extracted rows from CSV
-        for idx, row in enumerate(records, start=1):
+        for idx, (row, match) in enumerate(zip(records, matches), start=1):
             print(f"\n Processing Row {idx}: {row}")
+            best = resolved(match)
+            if best and best["partner_code"].upper() == str(row.get("Reporter ID", "")).strip().upper():
+                print(f" Resolved locally: {best['partner_code']} ({best['partner_name']}, score {best['score']})")
+                continue
+            if best:
+                # Name is known but reported under another partner ID: let the agent check the row
+                print(f" Name resolves to {best['partner_code']}, row reports {row.get('Reporter ID')}")
 
             # Dynamically build query conditions
             query_parts = []
@@ -174,6 +191,10 @@ async def main(agent, records):
 if __name__ == "__main__":
     csv_file_path = r"C:\\Users\\gangulay\\Documents\\GenAI\\temp\\data\\V2_POS_AMPLIFY_2-SIWB-20652.csv"
     config_path = "config.yaml"
+    if len(sys.argv) > 1:
+        csv_file_path = sys.argv[1]
     records = fetch_dynamic_columns(csv_file_path, config_path)
     print(records)
+    matcher = PartnerNameIndex.from_db(db_path, config=load_match_config(config_path))
+    asyncio.run(main(agent, records, matcher))
     #display(Markdown(f"{records}"))
@@ -1,14 +1,28 @@
 import os
 import pandas as pd
 
-def validate_file_name(file_path):
+# Transaction file types recognised from the tokens of a file name, e.g. V2_POS_AMPLIFY_2-SIWB-20652.csv
+FILE_TYPES = ("POS", "INV")
+
+def file_type(file_path):
     """
-    Reads a CSV file and checks if the file name contains
-    the value from the second column, second row.
+    Returns 'POS' or 'INV' when the file name carries that token, otherwise None.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0].upper()
+    tokens = set(stem.replace("-", "_").replace(" ", "_").split("_"))
+    for kind in FILE_TYPES:
+        if kind in tokens:
+            return kind
+    return None
+
+def file_partner_code(file_path):
+    """
+    Reads the value from the second column, second row of a CSV file (the reporting
+    partner code) and returns it when the file name contains it, otherwise None.
     """
     try:
-        # Load CSV
-        df = pd.read_csv(file_path)
+        # Load CSV (only the rows needed for the check)
+        df = pd.read_csv(file_path, nrows=2)
 
         # Ensure at least 2 rows & 2 columns
         if df.shape[0] < 2 or df.shape[1] < 2:
@@ -22,11 +36,19 @@ def validate_file_name(file_path):
         file_name = os.path.basename(file_path)
 
         # Check match
-        return second_col_value in file_name
+        return second_col_value if second_col_value in file_name else None
 
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
-        return False
+        return None
+
+
+def validate_file_name(file_path):
+    """
+    Reads a CSV file and checks if the file name contains
+    the value from the second column, second row.
+    """
+    return file_partner_code(file_path) is not None
 
 
 def validate_all_in_directory(directory_path):
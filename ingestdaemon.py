@@ -0,0 +1,395 @@
+import os
+import sys
+import json
+import time
+import queue
+import select
+import shutil
+import sqlite3
+import struct
+import threading
+import ctypes
+import ctypes.util
+from datetime import datetime
+
+import pandas as pd
+
+import arrivaltracker
+import filenamevalidation
+import partnerrouting
+import partnersnapshot
+import summarytables
+from posvalidation import PartnerAttributes, TransactionValidator, load_validation_config
+
+WATCH_DIRS = os.getenv("KRIYA_WATCH_DIRS", "incoming").split(os.pathsep)
+RESULTS_DIR = os.getenv("KRIYA_RESULTS_DIR", "validated")
+DB_PATH = os.getenv("KRIYA_DB_PATH", "kriya.db")
+SETTLE_SECONDS = float(os.getenv("KRIYA_SETTLE_SECONDS", "2"))   # size/mtime must be unchanged this long
+POLL_SECONDS = float(os.getenv("KRIYA_POLL_SECONDS", "1"))       # polling fallback scan interval
+RESCAN_SECONDS = float(os.getenv("KRIYA_RESCAN_SECONDS", "60"))  # full rescan with inotify, for missed events
+QUEUE_SIZE = int(os.getenv("KRIYA_QUEUE_SIZE", "16"))             # per stage; a full queue backs up the previous stage
+VERIFY_WORKERS = int(os.getenv("KRIYA_VERIFY_WORKERS", "2"))
+TRANSACTION_TABLES = {"POS": "POS_Transactions", "INV": "INV_Transactions"}
+PROCESSED_DIR = "processed"
+REJECTED_DIR = "rejected"
+RESULT_LOG = "ingest_log.jsonl"
+LOAD_CHUNK_SIZE = 100000
+
+
+def _is_candidate(path):
+    name = os.path.basename(path)
+    return name.lower().endswith(".csv") and not name.startswith((".", "~"))
+
+
+# -------------------------------
+# Arrival detection
+# -------------------------------
+class Debouncer:
+    """
+    Holds arrived paths until their (size, mtime) stops changing for SETTLE_SECONDS,
+    so files still being written by FTP/SMB uploads are never picked up half-way.
+    """
+
+    def __init__(self, settle_seconds=SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self.pending = {}        # path -> (signature, stable since, first seen wall-clock time)
+        self.claimed = set()     # paths handed to the pipeline and not yet moved away
+        self.lock = threading.Lock()
+
+    def touch(self, path):
+        with self.lock:
+            # Changes to a pending file are picked up by ready() through its size/mtime
+            if path not in self.claimed and path not in self.pending:
+                self.pending[path] = (None, time.monotonic(), time.time())
+
+    def release(self, path):
+        with self.lock:
+            self.claimed.discard(path)
+
+    def ready(self):
+        """(path, first seen) of files that have been stable long enough; each is returned once."""
+        now, out = time.monotonic(), []
+        with self.lock:
+            for path, (signature, since, first_seen) in list(self.pending.items()):
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    del self.pending[path]
+                    continue
+                current = (st.st_size, st.st_mtime_ns)
+                if current != signature:
+                    self.pending[path] = (current, now, first_seen)
+                elif now - since >= self.settle_seconds:
+                    del self.pending[path]
+                    self.claimed.add(path)
+                    out.append((path, first_seen))
+        return out
+
+
+def scan(directories, debouncer):
+    """Touch every candidate file in the drop directories (start-up backlog and polling fallback)."""
+    for directory in directories:
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_file() and _is_candidate(entry.path):
+                debouncer.touch(entry.path)
+
+
+class InotifyWatcher:
+    """
+    Linux inotify through ctypes; raises OSError where it is unavailable (Windows, macOS).
+    'overflowed' is set when the kernel queue overflowed and events were dropped.
+    """
+
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE, IN_Q_OVERFLOW = 0x2, 0x8, 0x80, 0x100, 0x4000
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, directories):
+        path = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(path, use_errno=True) if path else None
+        if libc is None or not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        self.dirs = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.dirs[wd] = directory
+        self.overflowed = False
+
+    def events(self, timeout):
+        """Paths touched since the last call (waits up to 'timeout' seconds for the first one)."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths, offset = [], 0
+        while offset < len(data):
+            wd, event_mask, _, length = self.EVENT.unpack_from(data, offset)
+            name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b"\0")
+            offset += self.EVENT.size + length
+            if event_mask & self.IN_Q_OVERFLOW:
+                self.overflowed = True
+            elif name and wd in self.dirs:
+                paths.append(os.path.join(self.dirs[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def load_transactions(conn, table, path, source_file):
+    """
+    Replace a file's rows in a transaction table inside the caller's open transaction.
+    Columns the table does not have yet are added, so a file with extra columns
+    loads instead of failing half-way; the caller commits or rolls back the whole file.
+    Returns (rows loaded, earliest transaction date or None).
+    """
+    columns = list(pd.read_csv(path, dtype=str, nrows=0).columns) + ["source_file"]
+    existing = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+    if not existing:
+        conn.execute(f"CREATE TABLE {_quote(table)} ({', '.join(_quote(c) + ' TEXT' for c in columns)})")
+    else:
+        for column in columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)} TEXT")
+        # Re-delivered files replace their earlier rows
+        conn.execute(f"DELETE FROM {_quote(table)} WHERE source_file = ?", (source_file,))
+    insert = (f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) "
+              f"VALUES ({', '.join('?' for _ in columns)})")
+    rows, dates = 0, []
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=LOAD_CHUNK_SIZE):
+        chunk["source_file"] = source_file
+        conn.executemany(insert, chunk[columns].itertuples(index=False, name=None))
+        rows += len(chunk)
+        if arrivaltracker.DATE_COLUMN in chunk.columns:
+            dates.append(pd.to_datetime(chunk[arrivaltracker.DATE_COLUMN], errors="coerce").min())
+    earliest = pd.Series(dates, dtype="datetime64[ns]").min()
+    return rows, (None if pd.isna(earliest) else earliest.to_pydatetime())
+
+
+# -------------------------------
+# Pipeline stages
+# -------------------------------
+class IngestDaemon:
+    """
+    Watches drop directories and runs every settled CSV through
+    filename validation -> load into kriya.db -> partner verification,
+    one thread (or VERIFY_WORKERS threads) per stage joined by bounded queues.
+    Finished files are moved to processed/ or rejected/ under their drop directory.
+    """
+
+    def __init__(self, directories=WATCH_DIRS, results_dir=RESULTS_DIR, db_path=DB_PATH,
+                 settle_seconds=SETTLE_SECONDS, use_inotify=True):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.results_dir = results_dir
+        self.db_path = db_path
+        self.use_inotify = use_inotify
+        self.debouncer = Debouncer(settle_seconds)
+        self.name_queue = queue.Queue(QUEUE_SIZE)
+        self.load_queue = queue.Queue(QUEUE_SIZE)
+        self.verify_queue = queue.Queue(QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.config = load_validation_config()
+        self._validator = None
+        self._regions = None
+        self._validator_version = None
+        self._validator_lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_checked = float("-inf")
+        self._log_lock = threading.Lock()
+
+    # --- arrival ---
+    def _watch(self):
+        watcher = None
+        if self.use_inotify:
+            try:
+                watcher = InotifyWatcher(self.directories)
+                print(f"Watching {self.directories} with inotify.")
+            except OSError as e:
+                print(f"inotify unavailable ({e}); polling every {POLL_SECONDS}s.")
+        scan(self.directories, self.debouncer)
+        last_scan = time.monotonic()
+        try:
+            # Only touches the debouncer, never the bounded queues, so inotify is always read promptly
+            while not self.stop_event.is_set():
+                if watcher is not None:
+                    for path in watcher.events(timeout=0.25):
+                        if _is_candidate(path):
+                            self.debouncer.touch(path)
+                    # Dropped events (queue overflow) or any other miss are caught by a full rescan
+                    rescan = watcher.overflowed or time.monotonic() - last_scan >= RESCAN_SECONDS
+                    watcher.overflowed = False
+                else:
+                    time.sleep(0.25)
+                    rescan = time.monotonic() - last_scan >= POLL_SECONDS
+                if rescan:
+                    scan(self.directories, self.debouncer)
+                    last_scan = time.monotonic()
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+    def _dispatch(self):
+        """Hand settled files to the pipeline; blocks on a full name queue instead of the watcher."""
+        while not self.stop_event.is_set():
+            time.sleep(0.25)
+            for path, arrived in self.debouncer.ready():
+                self.name_queue.put({"path": path, "file": os.path.basename(path), "arrived": arrived})
+        self.name_queue.put(None)
+
+    # --- stage 1: filename validation ---
+    def _check_names(self):
+        while (item := self.name_queue.get()) is not None:
+            item["file_type"] = filenamevalidation.file_type(item["path"])
+            if item["file_type"] is None:
+                self._finish(item, "rejected", "filename", reason="file name has no POS/INV token")
+            elif (partner_code := filenamevalidation.file_partner_code(item["path"])) is None:
+                self._finish(item, "rejected", "filename", reason="partner code in row 2 is not in the file name")
+            else:
+                item["partner_code"] = partner_code
+                self.load_queue.put(item)
+        self.load_queue.put(None)
+
+    # --- stage 2: load ---
+    def _load(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            while (item := self.load_queue.get()) is not None:
+                try:
+                    table = TRANSACTION_TABLES[item["file_type"]]
+                    # Take the write lock up front; a deferred BEGIN that reads first can deadlock with the verifiers
+                    conn.execute("BEGIN IMMEDIATE")
+                    rows, reported = load_transactions(conn, table, item["path"], item["file"])
+                    # Counted against the partner's expected files in the same transaction as the load,
+                    # in the period the file reports rather than the one it arrived in
+                    item["period"] = arrivaltracker.record_arrival(conn, item["file"], item["partner_code"],
+                                                                   item["file_type"],
+                                                                   datetime.fromtimestamp(item["arrived"]), reported)
+                    conn.commit()
+                    item["table"], item["loaded_rows"] = table, rows
+                except Exception as e:
+                    conn.rollback()
+                    self._finish(item, "error", "load", reason=str(e))
+                    continue
+                self.verify_queue.put(item)
+        finally:
+            conn.close()
+            for _ in range(VERIFY_WORKERS):
+                self.verify_queue.put(None)
+
+    # --- stage 3: partner verification ---
+    def _get_validator(self):
+        """
+        (validator, partner regions) over the newest partner snapshot. Until a snapshot is
+        published it falls back to kriya.db, retrying the snapshot every RECHECK_SECONDS and
+        re-reading the partner tables whenever a new partner load stamps the routing version.
+        """
+        with self._validator_lock:
+            now = time.monotonic()
+            if not self._snapshot and now - self._snapshot_checked >= partnersnapshot.RECHECK_SECONDS:
+                self._snapshot_checked = now
+                try:
+                    self._snapshot = partnersnapshot.SharedPartnerSnapshot()
+                except FileNotFoundError:
+                    self._snapshot = None
+            if self._snapshot:
+                store = self._snapshot.store
+                version = ("snapshot", self._snapshot.version)
+                if self._validator_version != version:
+                    self._validator = TransactionValidator(PartnerAttributes.from_store(store), self.config)
+                    self._regions = summarytables.partner_regions(store)
+                    self._validator_version = version
+            else:
+                try:
+                    version = ("db", partnerrouting.routing_version(self.db_path))
+                except sqlite3.OperationalError:
+                    version = ("db", None)
+                if self._validator is None or self._validator_version != version:
+                    self._validator = TransactionValidator(PartnerAttributes.from_db(self.db_path), self.config)
+                    self._regions = summarytables.partner_regions(db_path=self.db_path)
+                    self._validator_version = version
+            return self._validator, self._regions
+
+    def _verify(self):
+        while (item := self.verify_queue.get()) is not None:
+            try:
+                out_path = os.path.join(self.results_dir, os.path.splitext(item["file"])[0] + "_validated.csv")
+                validator, regions = self._get_validator()
+                aggregator = summarytables.FileAggregator(item["file_type"], validator.rule_names, regions)
+                summary = validator.validate_file(item["path"], out_path, on_chunk=aggregator.add)
+                # Fold this file's counts into the summary tables (retracting an earlier delivery of it)
+                conn = sqlite3.connect(self.db_path, timeout=30)
+                try:
+                    summarytables.apply_file(conn, item["file"], aggregator.frame())
+                    conn.commit()
+                finally:
+                    conn.close()
+                item.update(rows=summary["rows"], invalid_rows=summary["invalid_rows"],
+                            errors={k: v for k, v in summary["errors"].items() if v}, output=out_path)
+                self._finish(item, "validated", "verify")
+            except Exception as e:
+                self._finish(item, "error", "verify", reason=str(e))
+
+    # --- completion ---
+    def _finish(self, item, status, stage, reason=None):
+        item.update(status=status, stage=stage, finished=time.time())
+        item["latency_seconds"] = round(item["finished"] - item["arrived"], 3)
+        if reason:
+            item["reason"] = reason
+        target = os.path.join(os.path.dirname(item["path"]), PROCESSED_DIR if status == "validated" else REJECTED_DIR)
+        try:
+            os.makedirs(target, exist_ok=True)
+            shutil.move(item["path"], os.path.join(target, item["file"]))
+        except OSError as e:
+            print(f"Could not move {item['path']}: {e}")
+        self.debouncer.release(item["path"])
+        with self._log_lock:
+            with open(os.path.join(self.results_dir, RESULT_LOG), "a", encoding="utf-8") as f:
+                f.write(json.dumps(item) + "\n")
+        detail = f"{item.get('invalid_rows', 0)}/{item.get('rows', 0)} invalid rows" if status == "validated" else reason
+        print(f"[{status}] {item['file']} ({stage}, {item['latency_seconds']}s after arrival): {detail}")
+
+    # --- lifecycle ---
+    def start(self):
+        os.makedirs(self.results_dir, exist_ok=True)
+        for directory in self.directories:
+            os.makedirs(directory, exist_ok=True)
+        targets = [self._watch, self._dispatch, self._check_names, self._load] + [self._verify] * VERIFY_WORKERS
+        self.threads = [threading.Thread(target=t, name=t.__name__, daemon=True) for t in targets]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=30):
+        """Stop watching and let files already in the pipeline finish."""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+
+# Example usage
+if __name__ == "__main__":
+    directories = sys.argv[1:] or WATCH_DIRS
+    daemon = IngestDaemon(directories).start()
+    print(f"Ingestion daemon running; results in {os.path.abspath(RESULTS_DIR)}. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        daemon.stop()
@@ -0,0 +1,176 @@
+import sys
+import sqlite3
+from collections import defaultdict, deque
+
+# Materialized Father_ID closure: one row per (ancestor, descendant), depth 0 = the partner itself
+CLOSURE_TABLE = "Partner_Hierarchy"
+# Current parent / group of every partner, used to diff the next load against
+PARENT_TABLE = "Partner_Parent"
+
+
+class PartnerHierarchy:
+    """
+    In-memory Father_ID forest (parent map + child sets). Re-parenting a partner
+    returns the closure rows to delete and insert, so the table in kriya.db is
+    maintained by deltas instead of being recomputed.
+    """
+
+    def __init__(self):
+        self.parent = {}                 # partner -> father (None for roots)
+        self.children = defaultdict(set)
+        self.group = {}
+
+    def __contains__(self, code):
+        return code in self.parent
+
+    def ancestors(self, code):
+        """[(ancestor, depth)] from the partner itself (depth 0) up to its root."""
+        out, depth, seen = [], 0, set()
+        while code is not None and code not in seen:
+            out.append((code, depth))
+            seen.add(code)
+            code, depth = self.parent.get(code), depth + 1
+        return out
+
+    def descendants(self, code):
+        """[(descendant, depth)] of the subtree rooted at the partner, itself included."""
+        out, queue = [], deque([(code, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            out.append((node, depth))
+            queue.extend((child, depth + 1) for child in self.children.get(node, ()))
+        return out
+
+    def root_of(self, code):
+        return self.ancestors(code)[-1][0]
+
+    def _add_node(self, code):
+        """Register an unknown partner as a root; returns its self row."""
+        self.parent[code] = None
+        return [(code, code, 0)]
+
+    def set_parent(self, code, father, group_id=None):
+        """
+        Point 'code' at 'father' (blank or self = root). Returns (removed_pairs, added_rows)
+        where removed_pairs are (ancestor, descendant) and added_rows (ancestor, descendant, depth).
+        """
+        father = (father or "").strip() or None
+        if father == code:
+            father = None
+        if group_id is not None:
+            self.group[code] = group_id
+
+        added = self._add_node(code) if code not in self.parent else []
+        if father is not None and father not in self.parent:
+            # Father outside the loaded master (e.g. a 2-SISC org): keep it as an external root
+            added += self._add_node(father)
+        subtree = self.descendants(code)
+        if father is not None and father in {d for d, _ in subtree}:
+            print(f"Warning: Father_ID {father} of {code} would create a cycle; treating {code} as a root.")
+            father = None
+        if self.parent[code] == father:
+            return [], added
+
+        removed = [(a, d) for a, _ in self.ancestors(code)[1:] for d, _ in subtree]
+        old = self.parent[code]
+        if old is not None:
+            self.children[old].discard(code)
+        self.parent[code] = father
+        if father is not None:
+            self.children[father].add(code)
+            added += [(a, d, da + 1 + dd) for a, da in self.ancestors(father) for d, dd in subtree]
+        return removed, added
+
+    def closure_rows(self):
+        for code in self.parent:
+            for ancestor, depth in self.ancestors(code):
+                yield ancestor, code, depth
+
+
+# -------------------------------
+# kriya.db persistence
+# -------------------------------
+def create_hierarchy_tables(conn):
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {CLOSURE_TABLE} (
+        ancestor TEXT NOT NULL, descendant TEXT NOT NULL, depth INTEGER NOT NULL,
+        PRIMARY KEY (ancestor, descendant)) WITHOUT ROWID""")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CLOSURE_TABLE}_descendant ON {CLOSURE_TABLE} (descendant)")
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {PARENT_TABLE} (
+        partner_code TEXT PRIMARY KEY, father_id TEXT, group_id TEXT)""")
+
+
+def load_hierarchy(conn):
+    """Rebuild the in-memory structure from the parent table (no closure recomputation)."""
+    hierarchy = PartnerHierarchy()
+    create_hierarchy_tables(conn)
+    for code, father, group_id in conn.execute(f"SELECT partner_code, father_id, group_id FROM {PARENT_TABLE}"):
+        hierarchy.parent[code] = father
+        hierarchy.group[code] = group_id
+        if father is not None:
+            hierarchy.children[father].add(code)
+    return hierarchy
+
+
+def refresh_hierarchy(conn, master_df):
+    """
+    Apply a Partner_Master load to the stored hierarchy. Only partners that are new
+    or whose Father_ID changed touch the closure table; an empty table is built in full.
+    Returns the in-memory PartnerHierarchy.
+    """
+    hierarchy = load_hierarchy(conn)
+    initial = not hierarchy.parent
+    before = {c: (f, hierarchy.group.get(c)) for c, f in hierarchy.parent.items()}
+    codes = master_df["Reporting_Partner_Code"].astype(str).str.strip()
+    fathers = master_df["Father_ID"].astype(str) if "Father_ID" in master_df.columns else [""] * len(codes)
+    groups = master_df["Group_ID"].astype(str).str.strip() if "Group_ID" in master_df.columns else [""] * len(codes)
+
+    # Net effect per (ancestor, descendant): later moves in the same load override earlier ones
+    delta = {}
+    for code, father, group_id in zip(codes, fathers, groups):
+        r, a = hierarchy.set_parent(code, father, group_id or None)
+        if not initial:
+            delta.update((pair, None) for pair in r)
+            delta.update(((anc, desc), depth) for anc, desc, depth in a)
+
+    if initial:
+        removed, added = [], list(hierarchy.closure_rows())
+    else:
+        removed = [pair for pair, depth in delta.items() if depth is None]
+        added = [(anc, desc, depth) for (anc, desc), depth in delta.items() if depth is not None]
+        conn.executemany(f"DELETE FROM {CLOSURE_TABLE} WHERE ancestor = ? AND descendant = ?", removed)
+    conn.executemany(f"INSERT OR REPLACE INTO {CLOSURE_TABLE} VALUES (?, ?, ?)", added)
+    changed = [(c, f, hierarchy.group.get(c)) for c, f in hierarchy.parent.items()
+               if before.get(c) != (f, hierarchy.group.get(c))]
+    conn.executemany(f"INSERT OR REPLACE INTO {PARENT_TABLE} VALUES (?, ?, ?)", changed)
+    print(f"Partner hierarchy refreshed: {len(hierarchy.parent)} partners, "
+          f"{len(removed)} closure rows removed, {len(added)} added.")
+    return hierarchy
+
+
+def rollup(conn, table, partner_column, value_expr, ancestor=None):
+    """
+    Aggregate a transaction table over every partner's subtree with one join against the closure.
+    e.g. rollup(conn, "POS", '"Reporter ID"', 'SUM("Quantity" * "Unit Price")')
+    Returns [(ancestor, value)], or one row when 'ancestor' is given.
+    """
+    query = (f"SELECT h.ancestor, {value_expr} FROM {CLOSURE_TABLE} h "
+             f"JOIN {table} t ON t.{partner_column} = h.descendant")
+    params = ()
+    if ancestor is not None:
+        query += " WHERE h.ancestor = ?"
+        params = (ancestor,)
+    return conn.execute(query + " GROUP BY h.ancestor", params).fetchall()
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python partnerhierarchy.py <partner_code> [kriya.db]")
+        sys.exit(1)
+    conn = sqlite3.connect(sys.argv[2] if len(sys.argv) > 2 else "kriya.db")
+    code = sys.argv[1]
+    print("Ancestors:", conn.execute(f"SELECT ancestor, depth FROM {CLOSURE_TABLE} WHERE descendant = ? "
+                                     "ORDER BY depth", (code,)).fetchall())
+    print("Descendants:", conn.execute(f"SELECT descendant, depth FROM {CLOSURE_TABLE} WHERE ancestor = ? "
+                                       "ORDER BY depth", (code,)).fetchall())
+    conn.close()
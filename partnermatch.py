@@ -0,0 +1,217 @@
+import os
+import re
+import sys
+import sqlite3
+from collections import Counter, defaultdict
+
+import yaml
+
+# Legal-form suffixes dropped before matching (superset of the LTD|LIMITED|COMPANY|INC|CO regex in datavalidation)
+LEGAL_SUFFIXES = {
+    "LTD", "LIMITED", "COMPANY", "INC", "INCORPORATED", "CO", "CORP", "CORPORATION", "LLC", "LLP", "PLC",
+    "PTY", "PVT", "PRIVATE", "PTE", "GMBH", "AG", "SA", "SAS", "SRL", "BV", "NV", "SDN", "BHD", "KK", "TBK", "PT",
+}
+# Common abbreviations expanded to one canonical token
+ABBREVIATIONS = {
+    "INTL": "INTERNATIONAL", "INT'L": "INTERNATIONAL", "TECH": "TECHNOLOGY", "TECHNOLOGIES": "TECHNOLOGY",
+    "SVCS": "SERVICES", "SVC": "SERVICES", "SOLN": "SOLUTIONS", "SOLNS": "SOLUTIONS", "SYS": "SYSTEMS",
+    "MFG": "MANUFACTURING", "DIST": "DISTRIBUTION", "ELEC": "ELECTRONICS", "GRP": "GROUP", "AUST": "AUSTRALIA",
+    "&": "AND",
+}
+DEFAULT_MATCH_CONFIG = {
+    "min_score": 0.6,          # candidates scoring below are dropped
+    "accept_score": 0.85,      # best candidate at or above is resolved without review
+    "max_candidates": 5,       # ranked candidates returned per name
+    "max_posting": 1000,       # trigrams shared by more partners than this are not used for blocking
+    "block_grams": 6,          # rarest query trigrams used for blocking
+    "shortlist": 20,           # partners scored per name after blocking
+}
+
+_PUNCT = re.compile(r"[^\w&' ]+")
+
+
+def load_match_config(config_path="config.yaml"):
+    """Thresholds from the 'partner_matching' section of config.yaml, falling back to defaults."""
+    config = dict(DEFAULT_MATCH_CONFIG)
+    if config_path and os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            config.update((yaml.safe_load(f) or {}).get("partner_matching") or {})
+    return config
+
+
+def normalize_name(name):
+    """Upper-case, strip punctuation, expand abbreviations and drop legal suffixes."""
+    tokens = []
+    for token in _PUNCT.sub(" ", str(name or "").upper().replace(".", "").replace("&", " & ")).split():
+        token = ABBREVIATIONS.get(token, token).replace("'", "")
+        if token and token not in LEGAL_SUFFIXES:
+            tokens.append(token)
+    return " ".join(tokens)
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(grams_a, grams_b):
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b)) if grams_a and grams_b else 0.0
+
+
+def similarity(a, b, grams_a=None, grams_b=None):
+    """
+    Mean of the character-trigram and whole-token Dice coefficients of two normalized names (0..1).
+    Trigrams absorb typos and truncation; tokens keep "PRINT 549" from matching "PRINT 5490".
+    """
+    if a == b:
+        return 1.0
+    grams_a = grams_a if grams_a is not None else trigrams(a)
+    grams_b = grams_b if grams_b is not None else trigrams(b)
+    return (dice(grams_a, grams_b) + dice(set(a.split()), set(b.split()))) / 2
+
+
+# -------------------------------
+# Blocking index
+# -------------------------------
+class PartnerNameIndex:
+    """
+    Trigram blocking index over normalized Reporting_Partner_Name, partitioned by Country_Code.
+    Candidates for a name are the partners of the same country sharing the most
+    selective trigrams; only that shortlist is scored.
+    """
+
+    def __init__(self, partners, config=None):
+        """partners: iterable of (partner_code, partner_name, country_code)."""
+        self.config = dict(DEFAULT_MATCH_CONFIG, **(config or {}))
+        self.codes, self.names, self.normalized, self.countries, self.grams = [], [], [], [], []
+        self.postings = defaultdict(list)      # (country, trigram) -> [partner ids]
+        self.exact = defaultdict(list)         # (country, normalized name) -> [partner ids]
+        for code, name, country in partners:
+            pid = len(self.codes)
+            norm = normalize_name(name)
+            country = str(country or "").strip().upper()
+            grams = trigrams(norm)
+            self.codes.append(code)
+            self.names.append(name)
+            self.normalized.append(norm)
+            self.countries.append(country)
+            self.grams.append(grams)
+            self.exact[(country, norm)].append(pid)
+            for gram in grams:
+                self.postings[(country, gram)].append(pid)
+        self.country_set = set(self.countries)
+        print(f"Partner name index built: {len(self.codes)} partners, {len(self.postings)} postings.")
+
+    @classmethod
+    def from_db(cls, db_path="kriya.db", table="HPI_Partner_Master", config=None):
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT Reporting_Partner_Code, Reporting_Partner_Name, Country_Code FROM {table}"
+            ).fetchall()
+        finally:
+            conn.close()
+        return cls(rows, config)
+
+    @classmethod
+    def from_csv(cls, csv_path, config=None):
+        import pandas as pd
+        df = pd.read_csv(csv_path, usecols=["Reporting_Partner_Code", "Reporting_Partner_Name", "Country_Code"],
+                         dtype=str, keep_default_na=False)
+        return cls(df.itertuples(index=False, name=None), config)
+
+    def _shortlist(self, grams, countries):
+        counts = Counter()
+        max_posting = self.config["max_posting"]
+        for country in countries:
+            postings = [self.postings.get((country, g), ()) for g in grams]
+            postings = sorted((p for p in postings if p), key=len)
+            selective = [p for p in postings if len(p) <= max_posting][:self.config["block_grams"]]
+            # Every trigram is common: fall back to the three rarest so blocking still narrows the search
+            for posting in selective or postings[:3]:
+                counts.update(posting)
+        return [pid for pid, _ in counts.most_common(self.config["shortlist"])]
+
+    def match(self, name, country=None):
+        """
+        Ranked candidates for one reporter name:
+        {"query", "status": exact|match|review|no_match, "candidates": [{"partner_code", "partner_name", "score"}]}
+        A name whose best score is shared by more than one partner code is always "review".
+        """
+        norm = normalize_name(name)
+        country = str(country or "").strip().upper()
+        countries = [country] if country in self.country_set else sorted(self.country_set)
+        result = {"query": name, "country": country, "status": "no_match", "candidates": []}
+        if not norm:
+            return result
+
+        exact = [pid for c in countries for pid in self.exact.get((c, norm), ())]
+        if exact:
+            # Duplicate master rows of one partner collapse; different partners with the same name need review
+            by_code = {self.codes[pid]: pid for pid in reversed(exact)}
+            result["status"] = "exact" if len(by_code) == 1 else "review"
+            result["candidates"] = [self._candidate(pid, 1.0) for pid in sorted(by_code.values())]
+            return result
+
+        grams = trigrams(norm)
+        scored = []
+        for pid in self._shortlist(grams, countries):
+            score = similarity(norm, self.normalized[pid], grams, self.grams[pid])
+            if score >= self.config["min_score"]:
+                scored.append((score, pid))
+        scored.sort(key=lambda item: (-item[0], self.codes[item[1]]))
+        scored = scored[:self.config["max_candidates"]]
+        result["candidates"] = [self._candidate(pid, s) for s, pid in scored]
+        if result["candidates"]:
+            best = result["candidates"][0]["score"]
+            tied = {c["partner_code"] for c in result["candidates"] if c["score"] == best}
+            result["status"] = "match" if best >= self.config["accept_score"] and len(tied) == 1 else "review"
+        return result
+
+    def _candidate(self, pid, score):
+        return {"partner_code": self.codes[pid], "partner_name": self.names[pid], "score": round(score, 4)}
+
+    def match_batch(self, records, name_column="Reporter Company Name", country_column="Country"):
+        """
+        Match a batch of records (dicts as returned by datavalidation.fetch_dynamic_columns).
+        Repeated (name, country) pairs are scored once.
+        """
+        cache = {}
+        results = []
+        for record in records:
+            key = (record.get(name_column, ""), str(record.get(country_column, "") or "").upper())
+            if key not in cache:
+                cache[key] = self.match(*key)
+            results.append(cache[key])
+        return results
+
+
+def resolved(result):
+    """The single candidate a match result resolves to without review, or None."""
+    if result and result["status"] in ("exact", "match"):
+        return result["candidates"][0]
+    return None
+
+
+def summarize(results):
+    return dict(Counter(r["status"] for r in results))
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python partnermatch.py <pos_csv> [kriya.db] [config.yaml]")
+        sys.exit(1)
+    import pandas as pd
+
+    pos_csv = sys.argv[1]
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "kriya.db"
+    config = load_match_config(sys.argv[3] if len(sys.argv) > 3 else "config.yaml")
+
+    index = PartnerNameIndex.from_db(db_path, config=config)
+    records = pd.read_csv(pos_csv, dtype=str, keep_default_na=False).to_dict("records")
+    results = index.match_batch(records)
+    for r in results[:20]:
+        best = r["candidates"][0] if r["candidates"] else {}
+        print(f"{r['query']!r:<45} {r['status']:<9} {best.get('partner_code', '')} {best.get('score', '')}")
+    print(f"Matched {len(results)} rows: {summarize(results)}")
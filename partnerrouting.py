@@ -0,0 +1,173 @@
+import sys
+import time
+import sqlite3
+from collections import defaultdict
+
+import pandas as pd
+
+ROUTING_TABLE = "Partner_Routing"
+EMAIL_COLUMNS = ["Partner_Contact_email"]      # Partner_Master, ';'-separated addresses
+FTP_COLUMNS = ["UDF29"]                        # Flags, e.g. hpiapj.ftp:oem.co.nz:2-siwb-20652.ftp;AddTransactions.ftp
+# HP-side domains (and their subdomains) appear on many partners' contact lists and never identify a partner
+INTERNAL_DOMAINS = {"hp.com", "hpe.com"}
+# FTP accounts and hosts must identify one partner; shared ones (hpiapj.ftp, AddTransactions.ftp) are dropped
+SHARED_KEY_LIMIT = 1
+VERSION_TABLE = "Partner_Routing_Version"
+ROUTER_RECHECK_SECONDS = 5
+
+
+def _split_tokens(series, separators=";"):
+    """Explode a packed string column into lower-cased tokens indexed by their source row."""
+    values = series.fillna("").astype(str).str.lower()
+    for sep in separators[1:]:
+        values = values.str.replace(sep, separators[0], regex=False)
+    tokens = values.str.split(separators[0]).explode().str.strip()
+    return tokens[tokens != ""]
+
+
+def _is_internal(domains):
+    """True for INTERNAL_DOMAINS and their subdomains (e.g. ext.hp.com)."""
+    return domains.isin(INTERNAL_DOMAINS) | domains.str.endswith(tuple("." + d for d in INTERNAL_DOMAINS))
+
+
+def build_routing_frame(master_df=None, flags_df=None):
+    """
+    Tokenize contact emails and FTP identifiers into rows of (key_type, key, partner_code, source):
+    'email' and 'domain' from Partner_Contact_email, 'ftp' accounts (*.ftp) and 'domain'
+    hosts from the Flags FTP field. HP addresses are skipped, and FTP accounts or domains
+    naming more than SHARED_KEY_LIMIT partners are dropped rather than routed to one of them.
+    """
+    parts = []
+    if master_df is not None:
+        codes = master_df["Reporting_Partner_Code"].astype(str).str.strip()
+        for column in EMAIL_COLUMNS:
+            if column not in master_df.columns:
+                continue
+            tokens = _split_tokens(master_df[column], ";,")
+            emails = tokens[tokens.str.contains("@", regex=False)]
+            emails = emails[~_is_internal(emails.str.split("@").str[-1])]
+            partner = codes.loc[emails.index].values
+            parts.append(pd.DataFrame({"key_type": "email", "key": emails.values, "partner_code": partner,
+                                       "source": column}))
+            parts.append(pd.DataFrame({"key_type": "domain", "key": emails.str.split("@").str[-1].values,
+                                       "partner_code": partner, "source": column}))
+    if flags_df is not None:
+        codes = flags_df["PARTNER_CODE"].astype(str).str.strip()
+        for column in FTP_COLUMNS:
+            if column not in flags_df.columns:
+                continue
+            tokens = _split_tokens(flags_df[column], ";:")
+            is_ftp = tokens.str.endswith(".ftp")
+            parts.append(pd.DataFrame({"key_type": "ftp", "key": tokens[is_ftp].str[:-4].values,
+                                       "partner_code": codes.loc[tokens[is_ftp].index].values, "source": column}))
+            hosts = tokens[~is_ftp & tokens.str.contains(".", regex=False)]
+            parts.append(pd.DataFrame({"key_type": "domain", "key": hosts.values,
+                                       "partner_code": codes.loc[hosts.index].values, "source": column}))
+    if not parts:
+        return pd.DataFrame(columns=["key_type", "key", "partner_code", "source"])
+    frame = pd.concat(parts, ignore_index=True)
+    frame = frame[~((frame["key_type"] == "domain") & _is_internal(frame["key"]))]
+    frame = frame.drop_duplicates(["key_type", "key", "partner_code"])
+    width = frame.groupby(["key_type", "key"])["partner_code"].transform("size")
+    return frame[(frame["key_type"] == "email") | (width <= SHARED_KEY_LIMIT)].reset_index(drop=True)
+
+
+def save_routing_table(conn, frame, table=ROUTING_TABLE):
+    frame.to_sql(table, conn, if_exists="replace", index=False)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_key ON {table} (key_type, key)")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (version REAL)")
+    conn.execute(f"DELETE FROM {VERSION_TABLE}")
+    conn.execute(f"INSERT INTO {VERSION_TABLE} VALUES (?)", (time.time(),))
+    print(f"Table '{table}' written with {len(frame)} routing keys.")
+
+
+# -------------------------------
+# In-memory resolver
+# -------------------------------
+class PartnerRouter:
+    """Hash maps (key_type, key) -> partner codes; every lookup is O(1) per candidate key."""
+
+    def __init__(self, frame):
+        self.keys = defaultdict(list)
+        for key_type, key, code in zip(frame["key_type"], frame["key"], frame["partner_code"]):
+            self.keys[(key_type, key)].append(code)
+
+    @classmethod
+    def from_db(cls, db_path="kriya.db", table=ROUTING_TABLE):
+        conn = sqlite3.connect(db_path)
+        try:
+            frame = pd.read_sql_query(f"SELECT key_type, key, partner_code FROM {table}", conn)
+        finally:
+            conn.close()
+        return cls(frame)
+
+    def lookup(self, key_type, key):
+        return self.keys.get((key_type, key.strip().lower()), [])
+
+    def resolve_sender(self, address):
+        """
+        Partner codes for an inbound email address: exact address first, then its domain
+        and parent domains (mail.oem.co.nz -> oem.co.nz).
+        """
+        address = address.strip().lower()
+        if "<" in address:
+            address = address[address.rfind("<") + 1:].rstrip(">")
+        codes = self.lookup("email", address)
+        if codes:
+            return codes
+        labels = address.rsplit("@", 1)[-1].split(".")
+        for i in range(len(labels) - 1):
+            codes = self.lookup("domain", ".".join(labels[i:]))
+            if codes:
+                return codes
+        return []
+
+    def resolve_ftp(self, path):
+        """Partner codes for an FTP account or an upload path containing one (e.g. /2-siwb-20652.ftp/in/x.csv)."""
+        for segment in reversed(path.replace("\\", "/").strip("/").split("/")):
+            segment = segment.lower()
+            codes = self.lookup("ftp", segment[:-4] if segment.endswith(".ftp") else segment)
+            if codes:
+                return codes
+        return []
+
+    def resolve(self, item):
+        """Route an inbound email sender or FTP path to its partner codes."""
+        return self.resolve_sender(item) if "@" in item else self.resolve_ftp(item)
+
+
+_routers = {}
+
+
+def routing_version(db_path="kriya.db"):
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(f"SELECT version FROM {VERSION_TABLE}").fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def get_router(db_path="kriya.db"):
+    """
+    Process-wide cached router. The routing table's version stamp is re-read at most
+    every ROUTER_RECHECK_SECONDS, and the cache is rebuilt only after a new partner load.
+    """
+    now = time.monotonic()
+    cached = _routers.get(db_path)
+    if cached is None or now - cached["checked"] >= ROUTER_RECHECK_SECONDS:
+        version = routing_version(db_path)
+        if cached is None or cached["version"] != version:
+            cached = {"version": version, "router": PartnerRouter.from_db(db_path)}
+            _routers[db_path] = cached
+        cached["checked"] = now
+    return cached["router"]
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python partnerrouting.py <email-or-ftp-path> [kriya.db]")
+        sys.exit(1)
+    router = get_router(sys.argv[2] if len(sys.argv) > 2 else "kriya.db")
+    print(f"{sys.argv[1]} -> {router.resolve(sys.argv[1])}")
@@ -0,0 +1,154 @@
+import os
+import sys
+import mmap
+import json
+import time
+import struct
+
+import numpy as np
+
+from partnerstore import PartnerStore
+
+SNAPSHOT_DIR = os.getenv("KRIYA_SNAPSHOT_DIR", "partner_snapshots")
+CURRENT_FILE = "CURRENT"          # name of the live snapshot file
+MAGIC = b"KRIYASNP"
+ALIGNMENT = 64
+RECHECK_SECONDS = 2.0
+
+# File layout:
+#   MAGIC | uint64 header length | JSON header | zero padding to ALIGNMENT | array blocks (each aligned)
+# The header holds version, row count, partner code width, per-array dtype/shape/offset and the category string tables.
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def current_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """File name of the live snapshot, or None before the first publish."""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _version_of(file_name):
+    return int(file_name.rsplit("-v", 1)[1].split(".")[0]) if file_name else 0
+
+
+def publish(store, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Write the store as a new immutable snapshot version and switch CURRENT to it atomically.
+    Readers attached to older versions keep their mapping until they swap.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = _version_of(current_snapshot(snapshot_dir)) + 1
+    file_name = f"partners-v{version:06d}.snap"
+
+    arrays = {name: np.ascontiguousarray(a) for name, a in store.arrays.items()}
+    layout, offset = {}, 0
+    for name, a in arrays.items():
+        layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset = _align(offset + a.nbytes)
+    header = json.dumps({"version": version, "created": time.time(), "rows": len(store),
+                         "code_width": store.code_width, "arrays": layout,
+                         "categories": store.categories}).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = os.path.join(snapshot_dir, file_name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, a in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(a.tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(snapshot_dir, file_name))
+
+    pointer_tmp = os.path.join(snapshot_dir, CURRENT_FILE + ".tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(file_name)
+    os.replace(pointer_tmp, os.path.join(snapshot_dir, CURRENT_FILE))
+    print(f"Published partner snapshot v{version} ({len(store)} partners) to {snapshot_dir}")
+    return version
+
+
+def attach(path):
+    """
+    Map a snapshot file read-only and return (version, PartnerStore) whose arrays are
+    views into the mapping: no parsing and no copy, pages are shared by every process.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapping[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a partner snapshot")
+    (header_len,) = struct.unpack_from("<Q", mapping, len(MAGIC))
+    header = json.loads(mapping[len(MAGIC) + 8:len(MAGIC) + 8 + header_len].decode("utf-8"))
+    data_start = _align(len(MAGIC) + 8 + header_len)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+        arrays[name] = np.frombuffer(mapping, dtype=dtype, count=count,
+                                     offset=data_start + spec["offset"]).reshape(spec["shape"])
+    if "code_width" in header and arrays["partner_code"].dtype.itemsize != header["code_width"]:
+        raise ValueError(f"{path}: partner codes are {arrays['partner_code'].dtype.itemsize} bytes wide, "
+                         f"header says {header['code_width']}")
+    return header["version"], PartnerStore(arrays, header["categories"])
+
+
+def prune(snapshot_dir=SNAPSHOT_DIR, keep=2):
+    """Delete all but the newest 'keep' snapshots (files still mapped elsewhere are skipped on Windows)."""
+    files = sorted(f for f in os.listdir(snapshot_dir) if f.startswith("partners-v") and f.endswith(".snap"))
+    for file_name in files[:-keep]:
+        try:
+            os.remove(os.path.join(snapshot_dir, file_name))
+        except OSError:
+            pass
+
+
+class SharedPartnerSnapshot:
+    """
+    Worker-side handle. 'store' returns the attached PartnerStore and, at most every
+    RECHECK_SECONDS, looks at CURRENT and re-attaches when a newer version was published.
+    Callers should read 'store' once per unit of work so one file sees one version.
+    """
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, recheck_seconds=RECHECK_SECONDS):
+        self.snapshot_dir = snapshot_dir
+        self.recheck_seconds = recheck_seconds
+        self.version = None
+        self._store = None
+        self._file = None
+        self._checked = 0.0
+        self._refresh()
+
+    def _refresh(self):
+        file_name = current_snapshot(self.snapshot_dir)
+        if file_name is None:
+            raise FileNotFoundError(f"No partner snapshot published in {self.snapshot_dir}")
+        if file_name != self._file:
+            self.version, self._store = attach(os.path.join(self.snapshot_dir, file_name))
+            self._file = file_name
+        self._checked = time.monotonic()
+
+    @property
+    def store(self):
+        if time.monotonic() - self._checked >= self.recheck_seconds:
+            self._refresh()
+        return self._store
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "publish":
+        import pandas as pd
+        master = pd.read_csv(sys.argv[2], dtype=str, keep_default_na=False)
+        flags = pd.read_csv(sys.argv[3], dtype=str, keep_default_na=False) if len(sys.argv) > 3 else None
+        publish(PartnerStore.from_frames(master, flags))
+        prune()
+    else:
+        snapshot = SharedPartnerSnapshot()
+        print(f"Attached v{snapshot.version}: {len(snapshot.store)} partners, {snapshot.store.nbytes / 1e6:.2f} MB mapped")
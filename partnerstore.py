@@ -0,0 +1,190 @@
+import sys
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Low-cardinality Partner_Master columns kept as dictionary codes
+CATEGORICAL_COLUMNS = [
+    "Region", "Sub_Region", "Country_Code", "Currency_Code", "Partner_Type", "Tier",
+    "Reporting_Format", "Serial_Number_Required", "Point_of_Sale_Frequency", "INV_Frequency",
+]
+FLAG_COLUMNS = [f"UDF{n}" for n in range(1, 33)]   # Flags: Y / N / blank, one bit each
+CODE_ENCODING = "utf-8"                            # partner codes are stored as fixed-width bytes
+
+
+def _smallest_uint(n):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def encode_codes(codes):
+    """Fixed-width bytes array sized to the longest encoded code, so no code is truncated."""
+    encoded = [str(c).encode(CODE_ENCODING) for c in codes]
+    width = max((len(c) for c in encoded), default=0)
+    return np.array(encoded, dtype=f"S{max(width, 1)}")
+
+
+def encode_categorical(values):
+    """(codes, categories): codes index into categories; category 0 is always ''."""
+    values = pd.Series(values, dtype="string").fillna("").str.strip()
+    categories = [""] + sorted(set(values) - {""})
+    codes = pd.Categorical(values, categories=categories).codes
+    return codes.astype(_smallest_uint(len(categories))), categories
+
+
+def pack_flags(flags_df, columns=FLAG_COLUMNS):
+    """uint32 bitsets per partner: bit n-1 of yes/no is set when UDFn is 'Y' / 'N'."""
+    yes = np.zeros(len(flags_df), dtype=np.uint32)
+    no = np.zeros(len(flags_df), dtype=np.uint32)
+    for bit, column in enumerate(columns):
+        if column not in flags_df.columns:
+            continue
+        values = flags_df[column].fillna("").astype(str).str.strip().str.upper().to_numpy()
+        yes |= (values == "Y").astype(np.uint32) << np.uint32(bit)
+        no |= (values == "N").astype(np.uint32) << np.uint32(bit)
+    return yes, no
+
+
+class PartnerStore:
+    """
+    Column store of partner reference data: fixed-width partner codes, dictionary-encoded
+    categoricals and Y/N flag bitsets. Everything lives in 'arrays' (numpy) and
+    'categories' (lists of strings), so the store can also be serialized as-is.
+    Free-text UDF values (e.g. the UDF29 FTP ids) are not flags and are not kept here.
+    """
+
+    def __init__(self, arrays, categories):
+        self.arrays = arrays
+        self.categories = categories
+        self._index = None
+
+    # --- construction ---
+    @classmethod
+    def from_frames(cls, master_df, flags_df=None, categorical=CATEGORICAL_COLUMNS):
+        master_df = master_df.drop_duplicates("Reporting_Partner_Code", keep="last")
+        codes = master_df["Reporting_Partner_Code"].astype(str).str.strip()
+        arrays = {"partner_code": encode_codes(codes)}
+        categories = {}
+        for column in categorical:
+            if column in master_df.columns:
+                arrays[column], categories[column] = encode_categorical(master_df[column])
+
+        if flags_df is not None:
+            # Align Flags rows to Partner_Master order; partners without a Flags row get no bits
+            flags_df = flags_df.drop_duplicates("PARTNER_CODE", keep="last")
+            position = pd.Index(flags_df["PARTNER_CODE"].astype(str).str.strip()).get_indexer(codes)
+            yes, no = pack_flags(flags_df)
+            present = position >= 0
+            arrays["flags_yes"] = np.where(present, yes[position], 0).astype(np.uint32)
+            arrays["flags_no"] = np.where(present, no[position], 0).astype(np.uint32)
+        else:
+            arrays["flags_yes"] = np.zeros(len(codes), dtype=np.uint32)
+            arrays["flags_no"] = np.zeros(len(codes), dtype=np.uint32)
+        return cls(arrays, categories)
+
+    @classmethod
+    def from_db(cls, db_path="kriya.db", master_table="HPI_Partner_Master", flags_table="HPI_Partner_Master_Flags"):
+        conn = sqlite3.connect(db_path)
+        try:
+            master = pd.read_sql_query(f"SELECT * FROM {master_table}", conn)
+            try:
+                flags = pd.read_sql_query(f"SELECT * FROM {flags_table}", conn)
+            except pd.errors.DatabaseError:
+                flags = None
+        finally:
+            conn.close()
+        return cls.from_frames(master, flags)
+
+    # --- lookups ---
+    def __len__(self):
+        return len(self.arrays["partner_code"])
+
+    @property
+    def code_width(self):
+        """Bytes per stored partner code (the longest code in the load)."""
+        return self.arrays["partner_code"].dtype.itemsize
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def partner_codes(self, mask=None):
+        codes = self.arrays["partner_code"] if mask is None else self.arrays["partner_code"][mask]
+        return np.char.decode(codes, CODE_ENCODING).tolist()
+
+    def position(self, partner_code):
+        if self._index is None:
+            self._index = pd.Index(self.arrays["partner_code"])
+        return self._index.get_loc(partner_code.encode(CODE_ENCODING))
+
+    def get(self, partner_code):
+        """Decoded attributes and flags of one partner."""
+        i = self.position(partner_code)
+        row = {"partner_code": partner_code}
+        for column, categories in self.categories.items():
+            row[column] = categories[self.arrays[column][i]]
+        yes, no = int(self.arrays["flags_yes"][i]), int(self.arrays["flags_no"][i])
+        for bit, column in enumerate(FLAG_COLUMNS):
+            row[column] = "Y" if yes >> bit & 1 else "N" if no >> bit & 1 else ""
+        return row
+
+    # --- filters ---
+    def flag_mask(self, **flags):
+        """
+        Bitwise filter across all partners, e.g. flag_mask(UDF1="Y", UDF17="Y", UDF3="N").
+        Required Y and N flags are each checked with one AND + compare over the bitsets.
+        """
+        need_yes = need_no = 0
+        for column, value in flags.items():
+            bit = 1 << FLAG_COLUMNS.index(column)
+            if str(value).upper() == "Y":
+                need_yes |= bit
+            elif str(value).upper() == "N":
+                need_no |= bit
+            else:
+                raise ValueError(f"{column} filter must be 'Y' or 'N', got {value!r}")
+        mask = np.ones(len(self), dtype=bool)
+        if need_yes:
+            mask &= (self.arrays["flags_yes"] & np.uint32(need_yes)) == need_yes
+        if need_no:
+            mask &= (self.arrays["flags_no"] & np.uint32(need_no)) == need_no
+        return mask
+
+    def where(self, **conditions):
+        """
+        Boolean mask for UDF flag and categorical equality conditions,
+        e.g. where(UDF1="Y", UDF17="Y", Country_Code="NZ", Tier="Tier2").
+        """
+        flags = {c: v for c, v in conditions.items() if c in FLAG_COLUMNS}
+        mask = self.flag_mask(**flags)
+        for column, value in conditions.items():
+            if column in flags:
+                continue
+            if column not in self.categories:
+                raise KeyError(f"Column '{column}' is not in the partner store")
+            categories = self.categories[column]
+            if value not in categories:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.arrays[column] == categories.index(value)
+        return mask
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python partnerstore.py <HPI_Partner_Master.csv> <HPI_Partner_Master_Flags.csv> [COLUMN=VALUE ...]")
+        sys.exit(1)
+    master = pd.read_csv(sys.argv[1], dtype=str, keep_default_na=False)
+    flags = pd.read_csv(sys.argv[2], dtype=str, keep_default_na=False)
+    store = PartnerStore.from_frames(master, flags)
+    used = CATEGORICAL_COLUMNS + ["Reporting_Partner_Code"]
+    frame_bytes = (master[[c for c in used if c in master.columns]].memory_usage(deep=True).sum()
+                   + flags[[c for c in FLAG_COLUMNS if c in flags.columns]].memory_usage(deep=True).sum())
+    print(f"{len(store)} partners: {store.nbytes / 1e6:.2f} MB in the store vs {frame_bytes / 1e6:.2f} MB as DataFrames")
+    conditions = dict(arg.split("=", 1) for arg in sys.argv[3:])
+    if conditions:
+        matches = store.partner_codes(store.where(**conditions))
+        print(f"{len(matches)} partners match {conditions}: {matches[:10]}")
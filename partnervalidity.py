@@ -0,0 +1,151 @@
+import sys
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Validity windows in HPI_Partner_Master_Flags, as (start, end) column pairs in M/D/YYYY
+DATE_RANGES = [("UDF_DATE1", "UDF_DATE2"), ("UDF_DATE3", "UDF_DATE4")]
+# Active_Inactive_Flag values that switch a partner off regardless of its windows (blank = active)
+INACTIVE_FLAGS = {"N", "I", "INACTIVE", "0", "FALSE"}
+VALIDITY_TABLE = "Partner_Validity"
+
+# Day numbers (days since 1970-01-01) used for open-ended windows
+OPEN_START = -(2 ** 31)
+OPEN_END = 2 ** 31 - 1
+
+
+def to_days(values, date_format=None):
+    """
+    Vectorized conversion of dates to int64 day numbers. Strings are parsed with
+    one format for the whole array (inferred from the first value if not given).
+    Returns (days, valid_mask); unparseable values are False in the mask.
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        parsed = pd.DatetimeIndex(values)
+    else:
+        parsed = pd.DatetimeIndex(pd.to_datetime(pd.Series(values, dtype="string"), format=date_format, errors="coerce"))
+    valid = ~parsed.isna()
+    days = np.where(valid, parsed.values.astype("datetime64[D]").astype(np.int64), -1)
+    return days, np.asarray(valid)
+
+
+def days_to_dates(days):
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]")
+
+
+def build_validity_frame(flags_df, master_df=None):
+    """
+    Parse UDF_DATE1..4 once and return one row per (partner, window):
+    partner_code, range_no, start_day, end_day, inactive.
+    A blank start or end is open-ended; partners without any window get a single open window.
+    """
+    codes = flags_df["PARTNER_CODE"].astype(str).str.strip()
+    parts = []
+    for range_no, (start_col, end_col) in enumerate(DATE_RANGES, start=1):
+        if start_col not in flags_df.columns or end_col not in flags_df.columns:
+            continue
+        start, has_start = to_days(flags_df[start_col].fillna("").astype(str).str.strip(), "%m/%d/%Y")
+        end, has_end = to_days(flags_df[end_col].fillna("").astype(str).str.strip(), "%m/%d/%Y")
+        declared = has_start | has_end
+        parts.append(pd.DataFrame({
+            "partner_code": codes[declared].values,
+            "range_no": range_no,
+            "start_day": np.where(has_start, start, OPEN_START)[declared],
+            "end_day": np.where(has_end, end, OPEN_END)[declared],
+        }))
+    frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+        columns=["partner_code", "range_no", "start_day", "end_day"])
+    # UDF_DATE3/4 usually repeat UDF_DATE1/2
+    frame = frame.drop_duplicates(["partner_code", "start_day", "end_day"])
+
+    undeclared = codes[~codes.isin(frame["partner_code"])].unique()
+    if len(undeclared):
+        frame = pd.concat([frame, pd.DataFrame({"partner_code": undeclared, "range_no": 0,
+                                                "start_day": OPEN_START, "end_day": OPEN_END})],
+                          ignore_index=True)
+
+    frame["inactive"] = 0
+    if master_df is not None and "Active_Inactive_Flag" in master_df.columns:
+        flag = master_df["Active_Inactive_Flag"].fillna("").astype(str).str.strip().str.upper()
+        inactive_codes = set(master_df["Reporting_Partner_Code"].astype(str).str.strip()[flag.isin(INACTIVE_FLAGS)])
+        frame["inactive"] = frame["partner_code"].isin(inactive_codes).astype(int)
+    return frame.astype({"range_no": int, "start_day": np.int64, "end_day": np.int64})
+
+
+def save_validity_table(conn, frame, table=VALIDITY_TABLE):
+    """Persist the parsed windows to kriya.db so readers never re-parse the date strings."""
+    frame.to_sql(table, conn, if_exists="replace", index=False)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_code ON {table} (partner_code)")
+    print(f"Table '{table}' written with {len(frame)} validity windows.")
+
+
+# -------------------------------
+# Interval index
+# -------------------------------
+class PartnerValidityIndex:
+    """
+    Per-partner validity windows as dense (partners x max_windows) start/end arrays,
+    so "active on date D" for N (partner, date) pairs is one hash lookup plus a
+    vectorized comparison over at most a few windows.
+    """
+
+    def __init__(self, frame):
+        self.codes = pd.Index(sorted(frame["partner_code"].unique()))
+        pid = self.codes.get_indexer(frame["partner_code"])
+        slot = frame.groupby(pid).cumcount().to_numpy()
+        width = int(slot.max()) + 1 if len(slot) else 1
+        # Unused slots are empty windows (start > end)
+        self.starts = np.full((len(self.codes), width), 1, dtype=np.int64)
+        self.ends = np.full((len(self.codes), width), 0, dtype=np.int64)
+        self.starts[pid, slot] = frame["start_day"].to_numpy()
+        self.ends[pid, slot] = frame["end_day"].to_numpy()
+        self.inactive = np.zeros(len(self.codes), dtype=bool)
+        self.inactive[pid] = frame["inactive"].to_numpy().astype(bool)
+
+    @classmethod
+    def from_frames(cls, flags_df, master_df=None):
+        return cls(build_validity_frame(flags_df, master_df))
+
+    @classmethod
+    def from_db(cls, db_path="kriya.db", table=VALIDITY_TABLE):
+        conn = sqlite3.connect(db_path)
+        try:
+            frame = pd.read_sql_query(f"SELECT partner_code, start_day, end_day, inactive FROM {table}", conn)
+        finally:
+            conn.close()
+        return cls(frame)
+
+    def active_on(self, partner_codes, dates, date_format=None):
+        """
+        Bulk check: element i is True when partner_codes[i] is a known, active partner
+        with a validity window containing dates[i]. Unknown partners and unparseable dates are False.
+        """
+        pid = self.codes.get_indexer(pd.Index(np.asarray(partner_codes, dtype=object)).astype(str).str.strip())
+        days, valid = to_days(dates, date_format)
+        known = (pid >= 0) & valid
+        result = np.zeros(len(pid), dtype=bool)
+        p, d = pid[known], days[known][:, None]
+        result[known] = ((self.starts[p] <= d) & (d <= self.ends[p])).any(axis=1) & ~self.inactive[p]
+        return result
+
+    def windows(self, partner_code):
+        """Validity windows of one partner as (start, end) datetime64 values; open ends are None."""
+        i = self.codes.get_loc(partner_code)
+        out = []
+        for start, end in zip(self.starts[i], self.ends[i]):
+            if start <= end:
+                out.append((None if start == OPEN_START else np.datetime64(int(start), "D"),
+                            None if end == OPEN_END else np.datetime64(int(end), "D")))
+        return out
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python partnervalidity.py <partner_code> <date> [kriya.db]")
+        sys.exit(1)
+    index = PartnerValidityIndex.from_db(sys.argv[3] if len(sys.argv) > 3 else "kriya.db")
+    print(f"{sys.argv[1]} active on {sys.argv[2]}: {bool(index.active_on([sys.argv[1]], [sys.argv[2]])[0])}")
+    print(f"Windows: {index.windows(sys.argv[1])}")
@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import yaml
+
+PARTNER_ATTRIBUTES = ["Currency_Code", "Country_Code", "Serial_Number_Required", "Reporting_Format", "Tier"]
+# File extension -> Reporting_Format tokens a file of that type satisfies
+FILE_FORMATS = {".csv": ("CSV", "EXCEL"), ".xlsx": ("EXCEL",), ".xls": ("EXCEL",), ".json": ("API",), ".xml": ("API",)}
+ERROR_COLUMN = "error_code"
+UNKNOWN_PARTNER = "unknown_partner"     # always bit 0
+
+DEFAULT_VALIDATION_CONFIG = {
+    "partner_column": "Reporter ID",
+    "chunk_size": 250000,
+    "rules": [
+        {"name": "currency_mismatch", "type": "equals", "column": "Currency", "attribute": "Currency_Code"},
+        {"name": "country_mismatch", "type": "equals", "column": "Country", "attribute": "Country_Code"},
+        {"name": "serial_number_missing", "type": "required_if", "column": "Serial Number",
+         "attribute": "Serial_Number_Required", "when": "Y"},
+        {"name": "reporting_format_mismatch", "type": "context_in", "context": "file_format",
+         "attribute": "Reporting_Format"},
+    ],
+}
+
+
+def load_validation_config(config_path="config.yaml"):
+    """The 'transaction_validation' section of config.yaml, falling back to defaults."""
+    config = dict(DEFAULT_VALIDATION_CONFIG)
+    if config_path and os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            config.update((yaml.safe_load(f) or {}).get("transaction_validation") or {})
+    return config
+
+
+def _normalize(values):
+    return np.asarray(pd.Series(values, dtype="string").fillna("").str.strip().str.upper(), dtype=object)
+
+
+# -------------------------------
+# Partner attribute table (build side of the hash join)
+# -------------------------------
+class PartnerAttributes:
+    """Partner code hash index plus one normalized numpy array per attribute."""
+
+    def __init__(self, master_df, attributes=PARTNER_ATTRIBUTES):
+        master_df = master_df.drop_duplicates("Reporting_Partner_Code", keep="last")
+        self.codes = pd.Index(_normalize(master_df["Reporting_Partner_Code"]))
+        self.values = {a: _normalize(master_df[a]) if a in master_df.columns else np.full(len(self.codes), "", object)
+                       for a in attributes}
+        self._masks = {}
+
+    @classmethod
+    def from_db(cls, db_path="kriya.db", table="HPI_Partner_Master", attributes=PARTNER_ATTRIBUTES):
+        conn = sqlite3.connect(db_path)
+        try:
+            columns = ", ".join(["Reporting_Partner_Code"] + attributes)
+            df = pd.read_sql_query(f"SELECT {columns} FROM {table}", conn)
+        finally:
+            conn.close()
+        return cls(df, attributes)
+
+    @classmethod
+    def from_store(cls, store, attributes=PARTNER_ATTRIBUTES):
+        """Build from a PartnerStore (e.g. an attached partner snapshot) instead of re-reading kriya.db."""
+        self = cls.__new__(cls)
+        self.codes = pd.Index(_normalize(store.partner_codes()))
+        self.values = {}
+        for a in attributes:
+            if a in store.categories:
+                categories = _normalize(store.categories[a])
+                self.values[a] = categories[store.arrays[a]]
+            else:
+                self.values[a] = np.full(len(self.codes), "", object)
+        self._masks = {}
+        return self
+
+    def lookup(self, partner_codes):
+        """Row position of every transaction's partner (-1 = unknown)."""
+        return self.codes.get_indexer(_normalize(partner_codes))
+
+    def mask(self, key, predicate, attribute):
+        """Per-partner boolean computed once per (rule, argument) and reused for every chunk."""
+        if key not in self._masks:
+            self._masks[key] = np.fromiter((predicate(v) for v in self.values[attribute]), dtype=bool,
+                                           count=len(self.codes))
+        return self._masks[key]
+
+
+# -------------------------------
+# Rule engine
+# -------------------------------
+class TransactionValidator:
+    """
+    Evaluates column-level rules over transaction chunks joined to PartnerAttributes.
+    Each rule owns one bit of a uint32 error code (bit 0 = unknown partner); 0 means the row is valid.
+    """
+
+    def __init__(self, attributes, config=None):
+        self.attributes = attributes
+        self.config = dict(DEFAULT_VALIDATION_CONFIG, **(config or {}))
+        self.rules = self.config["rules"]
+        if len(self.rules) > 31:
+            raise ValueError("At most 31 validation rules fit in the error code")
+        self.rule_names = [UNKNOWN_PARTNER] + [r["name"] for r in self.rules]
+
+    def decode(self, error_code):
+        """Rule names set in an error code."""
+        return [name for bit, name in enumerate(self.rule_names) if int(error_code) >> bit & 1]
+
+    def _rule_failures(self, rule, chunk, pid, context):
+        attribute = self.attributes.values[rule["attribute"]][pid]
+        kind = rule["type"]
+        if kind in ("equals", "required_if") and rule["column"] not in chunk.columns:
+            return None
+        if kind == "equals":
+            # Partners without the attribute are not checked
+            return (attribute != "") & (_normalize(chunk[rule["column"]]) != attribute)
+        if kind == "required_if":
+            return (attribute == str(rule.get("when", "Y")).upper()) & (_normalize(chunk[rule["column"]]) == "")
+        if kind == "attribute_in":
+            allowed = {str(v).upper() for v in rule["values"]}
+            return ~self.attributes.mask((rule["name"],), lambda v: v in allowed, rule["attribute"])[pid]
+        if kind == "context_in":
+            value = (context or {}).get(rule["context"]) or ()
+            accepted = frozenset(str(v).upper() for v in ([value] if isinstance(value, str) else value))
+            if not accepted:
+                return None
+            tokens = lambda v: {t.strip() for t in v.replace(",", "/").split("/")}
+            allows = self.attributes.mask((rule["name"], accepted), lambda v: not v or bool(accepted & tokens(v)),
+                                          rule["attribute"])
+            return ~allows[pid]
+        raise ValueError(f"Unknown rule type '{kind}' in rule '{rule['name']}'")
+
+    def validate_chunk(self, chunk, context=None):
+        """uint32 error code per row of a transaction DataFrame."""
+        pid = self.attributes.lookup(chunk[self.config["partner_column"]])
+        known = pid >= 0
+        codes = np.where(known, 0, 1).astype(np.uint32)
+        if not known.any():
+            return codes
+        known_pid = pid[known]
+        known_rows = chunk[known]
+        for bit, rule in enumerate(self.rules, start=1):
+            failed = self._rule_failures(rule, known_rows, known_pid, context)
+            if failed is not None:
+                codes[known] |= np.asarray(failed, dtype=np.uint32) << np.uint32(bit)
+        return codes
+
+    def validate_file(self, csv_path, out_path=None, context=None, on_chunk=None):
+        """
+        Validate a POS/INV CSV in chunks. Writes the file with an appended error_code column
+        when out_path is given and passes every (chunk, codes) to on_chunk (e.g. a summary aggregator);
+        returns {"rows", "invalid_rows", "errors": {rule: count}, "seconds"}.
+        """
+        context = dict(context or {})
+        context.setdefault("file_format", FILE_FORMATS.get(os.path.splitext(csv_path)[1].lower(), ()))
+        start = time.perf_counter()
+        summary = {"file": csv_path, "rows": 0, "invalid_rows": 0, "errors": dict.fromkeys(self.rule_names, 0)}
+        reader = pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=self.config["chunk_size"])
+        for i, chunk in enumerate(reader):
+            codes = self.validate_chunk(chunk, context)
+            if on_chunk is not None:
+                on_chunk(chunk, codes)
+            summary["rows"] += len(codes)
+            summary["invalid_rows"] += int(np.count_nonzero(codes))
+            for bit, name in enumerate(self.rule_names):
+                summary["errors"][name] += int(np.count_nonzero(codes & np.uint32(1 << bit)))
+            if out_path:
+                chunk[ERROR_COLUMN] = codes
+                chunk.to_csv(out_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        summary["seconds"] = round(time.perf_counter() - start, 3)
+        return summary
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python posvalidation.py <pos_or_inv_csv> [kriya.db] [config.yaml]")
+        sys.exit(1)
+    csv_path = sys.argv[1]
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "kriya.db"
+    validator = TransactionValidator(PartnerAttributes.from_db(db_path),
+                                     load_validation_config(sys.argv[3] if len(sys.argv) > 3 else "config.yaml"))
+    out_path = os.path.splitext(csv_path)[0] + "_validated.csv"
+    summary = validator.validate_file(csv_path, out_path)
+    print(f"Validated {summary['rows']} rows in {summary['seconds']}s: {summary['invalid_rows']} invalid.")
+    for name, count in summary["errors"].items():
+        print(f"  {name:<28} {count}")
+    print(f"Rows with error codes written to {out_path}")
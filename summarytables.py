@@ -0,0 +1,211 @@
+import sys
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Rows / amount per (period, file_type, partner, error category)
+PARTNER_SUMMARY_TABLE = "Partner_Error_Summary"
+# The same rolled up per region, for dashboards
+REGION_SUMMARY_TABLE = "Region_Error_Summary"
+# What each source file added, so a re-delivered or re-validated file is retracted before it is re-applied
+CONTRIBUTION_TABLE = "Summary_Contribution"
+
+PARTNER_COLUMN = "Reporter ID"
+DATE_COLUMN = "Transaction Date"
+QUANTITY_COLUMN = "Quantity"
+PRICE_COLUMN = "Unit Price"
+VALID = "valid"                 # error category of rows with error_code 0
+UNMAPPED_REGION = "UNMAPPED"    # partner not in Partner_Master (or without a Region)
+UNKNOWN_PERIOD = "unknown"
+
+KEYS = ["period", "file_type", "partner_code", "region", "error_category"]
+METRICS = ["rows", "amount"]
+
+# Passed to NLSQLTableQueryEngine as context_query_kwargs so the SQL agent prefers the summaries
+TABLE_DESCRIPTIONS = {
+    PARTNER_SUMMARY_TABLE: (
+        "Precomputed transaction counts per period (YYYY-MM of the transaction date), file_type (POS/INV), "
+        "partner_code, region and error_category. error_category is 'valid' for rows without errors or the "
+        "name of a failed validation rule (unknown_partner, currency_mismatch, ...); a row failing several "
+        "rules is counted under each. 'rows' is the number of transactions, 'amount' the sum of "
+        "Quantity * Unit Price. Use this table for questions about mapped vs errored transactions."),
+    REGION_SUMMARY_TABLE: (
+        "The same counts as Partner_Error_Summary summed over partners: period, file_type, region, "
+        "error_category, rows, amount, partners (number of partners contributing)."),
+}
+
+
+def create_summary_tables(conn):
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {PARTNER_SUMMARY_TABLE} (
+        period TEXT NOT NULL, file_type TEXT NOT NULL, partner_code TEXT NOT NULL, region TEXT NOT NULL,
+        error_category TEXT NOT NULL, rows INTEGER NOT NULL, amount REAL NOT NULL,
+        PRIMARY KEY (period, file_type, partner_code, region, error_category)) WITHOUT ROWID""")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{PARTNER_SUMMARY_TABLE}_partner ON {PARTNER_SUMMARY_TABLE} (partner_code)")
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {REGION_SUMMARY_TABLE} (
+        period TEXT NOT NULL, file_type TEXT NOT NULL, region TEXT NOT NULL, error_category TEXT NOT NULL,
+        rows INTEGER NOT NULL, amount REAL NOT NULL, partners INTEGER NOT NULL,
+        PRIMARY KEY (period, file_type, region, error_category)) WITHOUT ROWID""")
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {CONTRIBUTION_TABLE} (
+        source_file TEXT NOT NULL, period TEXT NOT NULL, file_type TEXT NOT NULL, partner_code TEXT NOT NULL,
+        region TEXT NOT NULL, error_category TEXT NOT NULL, rows INTEGER NOT NULL, amount REAL NOT NULL)""")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CONTRIBUTION_TABLE}_file ON {CONTRIBUTION_TABLE} (source_file)")
+
+
+def partner_regions(store=None, db_path="kriya.db", table="HPI_Partner_Master"):
+    """Series partner_code -> Region, from a PartnerStore (e.g. an attached snapshot) or kriya.db."""
+    if store is not None:
+        regions = np.asarray(store.categories.get("Region", [""]), dtype=object)
+        values = regions[store.arrays["Region"]] if "Region" in store.arrays else np.full(len(store), "", object)
+        return pd.Series(values, index=pd.Index(store.partner_codes()).str.upper())
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql_query(f"SELECT Reporting_Partner_Code, Region FROM {table}", conn)
+    finally:
+        conn.close()
+    df = df.drop_duplicates("Reporting_Partner_Code", keep="last")
+    return pd.Series(df["Region"].fillna("").str.strip().values,
+                     index=df["Reporting_Partner_Code"].astype(str).str.strip().str.upper())
+
+
+# -------------------------------
+# Per-file aggregation
+# -------------------------------
+class FileAggregator:
+    """
+    Accumulates one file's (period, partner, region, error category) counts chunk by chunk,
+    e.g. as the on_chunk callback of TransactionValidator.validate_file.
+    """
+
+    def __init__(self, file_type, rule_names, regions):
+        self.file_type = file_type
+        self.rule_names = rule_names
+        self.regions = regions
+        self.parts = []
+
+    def add(self, chunk, codes):
+        partner = chunk[PARTNER_COLUMN].astype(str).str.strip().str.upper()
+        if DATE_COLUMN in chunk.columns:
+            dates = pd.to_datetime(chunk[DATE_COLUMN], errors="coerce")
+            period = dates.dt.strftime("%Y-%m").fillna(UNKNOWN_PERIOD)
+        else:
+            period = pd.Series(UNKNOWN_PERIOD, index=chunk.index)
+        if QUANTITY_COLUMN in chunk.columns and PRICE_COLUMN in chunk.columns:
+            amount = (pd.to_numeric(chunk[QUANTITY_COLUMN], errors="coerce")
+                      * pd.to_numeric(chunk[PRICE_COLUMN], errors="coerce")).fillna(0.0)
+        else:
+            amount = pd.Series(0.0, index=chunk.index)
+        region = self.regions.reindex(partner.values).fillna("").replace("", UNMAPPED_REGION).values
+        base = pd.DataFrame({"period": period.values, "partner_code": partner.values, "region": region,
+                             "amount": amount.values})
+        codes = np.asarray(codes, dtype=np.uint32)
+        categories = [(VALID, codes == 0)] + [(name, (codes >> np.uint32(bit)) & 1 == 1)
+                                              for bit, name in enumerate(self.rule_names)]
+        for name, mask in categories:
+            if not mask.any():
+                continue
+            grouped = (base[mask].groupby(["period", "partner_code", "region"], sort=False)
+                       .agg(rows=("amount", "size"), amount=("amount", "sum")).reset_index())
+            grouped["error_category"] = name
+            self.parts.append(grouped)
+
+    def frame(self):
+        if not self.parts:
+            return pd.DataFrame(columns=KEYS + METRICS)
+        frame = pd.concat(self.parts, ignore_index=True)
+        frame["file_type"] = self.file_type
+        return frame.groupby(KEYS, as_index=False)[METRICS].sum()
+
+
+# -------------------------------
+# Delta application
+# -------------------------------
+def _records(frame):
+    """KEYS + METRICS rows as plain Python tuples for executemany."""
+    return list(zip(*(frame[k].tolist() for k in KEYS), frame["rows"].astype("int64").tolist(),
+                    frame["amount"].astype("float64").tolist()))
+
+
+def apply_file(conn, source_file, frame):
+    """
+    Fold one file's aggregate into the summary tables: its previous contribution (if any) is
+    subtracted and the new one added, so only the touched summary rows change. The caller commits.
+    The write lock is taken before the contribution is read, so concurrent writers wait on
+    the connection timeout instead of failing with "database is locked".
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    create_summary_tables(conn)
+    old = pd.read_sql_query(f"SELECT {', '.join(KEYS + METRICS)} FROM {CONTRIBUTION_TABLE} WHERE source_file = ?",
+                            conn, params=(source_file,))
+    old[METRICS] = -old[METRICS]
+    delta = pd.concat([frame[KEYS + METRICS], old], ignore_index=True).groupby(KEYS, as_index=False)[METRICS].sum()
+    delta = delta[(delta["rows"] != 0) | (delta["amount"].abs() > 1e-9)]
+
+    conn.execute("DROP TABLE IF EXISTS temp.summary_delta")
+    conn.execute("""CREATE TEMP TABLE summary_delta (period TEXT, file_type TEXT, partner_code TEXT, region TEXT,
+        error_category TEXT, rows INTEGER, amount REAL, existed INTEGER DEFAULT 0, emptied INTEGER DEFAULT 0)""")
+    conn.executemany("INSERT INTO summary_delta (period, file_type, partner_code, region, error_category, rows, amount) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     _records(delta))
+    match = (f"p.period = d.period AND p.file_type = d.file_type AND p.partner_code = d.partner_code "
+             f"AND p.region = d.region AND p.error_category = d.error_category")
+
+    # Partner level; the region's partner count moves when a partner row appears or empties
+    conn.execute(f"UPDATE summary_delta AS d SET existed = EXISTS (SELECT 1 FROM {PARTNER_SUMMARY_TABLE} p WHERE {match})")
+    conn.execute(f"""INSERT INTO {PARTNER_SUMMARY_TABLE}
+        SELECT period, file_type, partner_code, region, error_category, rows, amount FROM summary_delta WHERE true
+        ON CONFLICT (period, file_type, partner_code, region, error_category) DO UPDATE SET
+            rows = rows + excluded.rows, amount = amount + excluded.amount""")
+    conn.execute(f"""UPDATE summary_delta AS d SET emptied = 1 WHERE existed AND
+        (SELECT p.rows FROM {PARTNER_SUMMARY_TABLE} p WHERE {match}) <= 0""")
+    conn.execute(f"""DELETE FROM {PARTNER_SUMMARY_TABLE} WHERE (period, file_type, partner_code, region, error_category)
+        IN (SELECT period, file_type, partner_code, region, error_category FROM summary_delta WHERE emptied)""")
+
+    # Region level
+    conn.execute(f"""INSERT INTO {REGION_SUMMARY_TABLE}
+        SELECT period, file_type, region, error_category, SUM(rows), SUM(amount), SUM((NOT existed) - emptied)
+        FROM summary_delta GROUP BY period, file_type, region, error_category
+        ON CONFLICT (period, file_type, region, error_category) DO UPDATE SET
+            rows = rows + excluded.rows, amount = amount + excluded.amount, partners = partners + excluded.partners""")
+    conn.execute(f"""DELETE FROM {REGION_SUMMARY_TABLE} WHERE rows <= 0 AND (period, file_type, region, error_category)
+        IN (SELECT period, file_type, region, error_category FROM summary_delta)""")
+    conn.execute("DROP TABLE temp.summary_delta")
+
+    conn.execute(f"DELETE FROM {CONTRIBUTION_TABLE} WHERE source_file = ?", (source_file,))
+    conn.executemany(f"INSERT INTO {CONTRIBUTION_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     [(source_file, *row) for row in _records(frame)])
+    return len(delta)
+
+
+def summarize_validated_file(csv_path, file_type, rule_names, regions, chunk_size=250000):
+    """Aggregate a *_validated.csv written by posvalidation (error_code column) without re-validating it."""
+    aggregator = FileAggregator(file_type, rule_names, regions)
+    for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_size):
+        aggregator.add(chunk, pd.to_numeric(chunk["error_code"]).to_numpy(dtype=np.uint32))
+    return aggregator.frame()
+
+
+# Example usage
+if __name__ == "__main__":
+    conn = sqlite3.connect("kriya.db")
+    create_summary_tables(conn)
+    if len(sys.argv) > 2 and sys.argv[1] == "apply":
+        import os
+        import filenamevalidation
+        from posvalidation import TransactionValidator, load_validation_config
+        rule_names = TransactionValidator(None, load_validation_config()).rule_names
+        regions = partner_regions()
+        for path in sys.argv[2:]:
+            source_file = os.path.basename(path).replace("_validated.csv", ".csv")
+            frame = summarize_validated_file(path, filenamevalidation.file_type(path) or "POS", rule_names, regions)
+            print(f"{source_file}: {apply_file(conn, source_file, frame)} summary rows changed")
+        conn.commit()
+    else:
+        period = sys.argv[1] if len(sys.argv) > 1 else None
+        query = f"SELECT period, file_type, region, error_category, rows, partners FROM {REGION_SUMMARY_TABLE}"
+        rows = conn.execute(query + (" WHERE period = ?" if period else "") + " ORDER BY 1, 2, 3, 4",
+                            (period,) if period else ()).fetchall()
+        for row in rows:
+            print("  ".join(str(v) for v in row))
+    conn.close()
@@ -2,6 +2,12 @@ import os
 import sqlite3
 import pandas as pd
 from llama_index.core import SimpleDirectoryReader
+import partnervalidity
+import partnerhierarchy
+import partnerrouting
+import partnerstore
+import partnersnapshot
+import arrivaltracker
 
 def find_files_with_partner_master(root_directory):
     """
@@ -90,6 +96,40 @@ def insert_data_into_tables(files):
     conn.commit()
     conn.close()
 
+def read_partner_files(files):
+    """Load Partner_Master and Partner_Master_Flags as string DataFrames (None if not found)."""
+    master, flags = None, None
+    for file_info in files:
+        df = pd.read_csv(file_info['full_path'], dtype=str, keep_default_na=False)
+        if "Flags" in file_info['file_name']:
+            flags = df
+        else:
+            master = df
+    return master, flags
+
+def build_partner_indexes(files):
+    """
+    Derive lookup tables from the partner files once per load and store them in 'kriya'
+    (validity windows parsed from UDF_DATE1..4, Father_ID closure, email/FTP routing keys,
+    POS/INV file expectations),
+    then publish a new partner snapshot for validation workers to hot-swap to.
+    """
+    master, flags = read_partner_files(files)
+    conn = sqlite3.connect("kriya.db")
+    try:
+        if flags is not None:
+            partnervalidity.save_validity_table(conn, partnervalidity.build_validity_frame(flags, master))
+        if master is not None:
+            partnerhierarchy.refresh_hierarchy(conn, master)
+            arrivaltracker.refresh_expectations(conn, master)
+        partnerrouting.save_routing_table(conn, partnerrouting.build_routing_frame(master, flags))
+        conn.commit()
+    finally:
+        conn.close()
+    if master is not None:
+        partnersnapshot.publish(partnerstore.PartnerStore.from_frames(master, flags))
+        partnersnapshot.prune()
+
 
 # Example usage
 if __name__ == "__main__":
@@ -103,6 +143,7 @@ if __name__ == "__main__":
         print(f"Filename: {f['file_name']} | Path: {f['full_path']}")       
         create_database_and_tables(found_files)
         insert_data_into_tables(found_files)
+        build_partner_indexes(found_files)
 
 
 